@@ -1,85 +1,89 @@
-from flask import Flask, render_template, jsonify
-import sqlite3
+from flask import Flask, Response, render_template, request
 import time
 import datetime
-import math
+import hashlib
+import json
+import threading
+from collections import deque
+
+from latency_histogram import LatencyHistogram, prometheus_lines
+from metrics_registry import CONTENT_TYPE, MetricsRegistry
+from reward_engine import REWARD_CALCULATION_INTERVAL, compute_rewards_batch
+from rolling_window import WINDOW_BUCKETS, bucket_of
+from storage import ConnectionPool, get_data_version, get_schema_version, migrate
 
 app = Flask(__name__)
 
-DB_NAME = "transactions.db"
+SNAPSHOT_TTL = 5  # Seconds a metrics snapshot is served before the data version is checked again
+STREAM_POLL_INTERVAL = 1  # Seconds between data version checks of the event stream
+STREAM_KEEPALIVE = 15  # Seconds between keep-alive comments on idle streams
+STREAM_BACKLOG = 32  # Deltas kept for subscribers that fall behind
+DB_POOL_SIZE = 4  # Database connections shared by the request threads
 
-# Constants moved from ap.py for reward calculation
-REWARD_CALCULATION_INTERVAL = 3600  # Calculate rewards every hour (in seconds)
-BASE_REWARD_PER_TX = 0.01  # Base reward tokens per transaction
-UPTIME_REWARD_FACTOR = 0.5  # Additional reward factor for uptime
-MILESTONE_SYNC_REWARD = 0.2  # Reward for being in sync with milestones
-TRANSACTION_VOLUME_THRESHOLD = 100  # Minimum transactions for bonus rewards
-VOLUME_BONUS_MULTIPLIER = 1.2  # Bonus multiplier for high transaction volume
-MAX_LATENCY_MS = 5000  # Maximum acceptable latency in milliseconds
-LATENCY_PENALTY_FACTOR = 0.8  # Penalty factor for high latency
+# Werkzeug serves each request on a new thread, so requests borrow pooled
+# connections instead of opening one per thread
+db_pool = ConnectionPool(size=DB_POOL_SIZE)
 
 def get_node_metrics():
     """Fetch transaction counts and performance metrics for all nodes."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    # Fetch counters
-    cursor.execute("SELECT node_name, count FROM counters")
-    counter_data = {row[0]: row[1] for row in cursor.fetchall()}
-    
-    # Fetch reward balances
-    cursor.execute("SELECT node_name, balance FROM reward_balance")
-    reward_data = {row[0]: row[1] for row in cursor.fetchall()}
-    
-    # Fetch node performance metrics
-    cursor.execute("""
-        SELECT node_name, uptime_seconds, avg_latency, latest_milestone
-        FROM node_metrics
-    """)
-    metrics_data = {}
-    for row in cursor.fetchall():
-        node_name, uptime, latency, milestone = row
-        metrics_data[node_name] = {
-            'uptime_seconds': uptime,
-            'avg_latency': latency,
-            'latest_milestone': milestone
-        }
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+
+        # Fetch counters
+        cursor.execute("SELECT node_name, count FROM counters")
+        counter_data = {row[0]: row[1] for row in cursor.fetchall()}
     
-    # Get recent transactions (last hour)
-    current_time = int(time.time())
-    one_hour_ago = current_time - 3600
-    
-    recent_tx = {}
-    cursor.execute("""
-        SELECT node_name, COUNT(*) 
-        FROM transactions 
-        WHERE timestamp > ?
-        GROUP BY node_name
-    """, (one_hour_ago,))
-    
-    for row in cursor.fetchall():
-        node_name, count = row
-        recent_tx[node_name] = count
-    
-    # Fetch recent rewards
-    cursor.execute("""
-        SELECT node_name, reward_amount, reason, timestamp
-        FROM rewards
-        ORDER BY timestamp DESC
-        LIMIT 20
-    """)
-    
-    rewards_history = []
-    for row in cursor.fetchall():
-        node_name, amount, reason, timestamp = row
-        rewards_history.append({
-            'node_name': node_name,
-            'amount': amount,
-            'reason': reason,
-            'timestamp': datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-        })
+        # Fetch reward balances
+        cursor.execute("SELECT node_name, balance FROM reward_balance")
+        reward_data = {row[0]: row[1] for row in cursor.fetchall()}
+    
+        # Fetch node performance metrics
+        cursor.execute("""
+            SELECT node_name, uptime_seconds, avg_latency, latest_milestone, health_state
+            FROM node_metrics
+        """)
+        metrics_data = {}
+        for row in cursor.fetchall():
+            node_name, uptime, latency, milestone, health_state = row
+            metrics_data[node_name] = {
+                'uptime_seconds': uptime,
+                'avg_latency': latency,
+                'latest_milestone': milestone,
+                'health_state': health_state
+            }
     
-    conn.close()
+        # Get recent transactions (last hour) from the per-minute buckets
+        oldest_bucket = bucket_of(time.time()) - WINDOW_BUCKETS
+    
+        recent_tx = {}
+        cursor.execute("""
+            SELECT c.node_name,
+                   (SELECT COALESCE(SUM(b.count), 0) FROM tx_minute_buckets b
+                    WHERE b.node_name = c.node_name AND b.minute > ?)
+            FROM counters c
+        """, (oldest_bucket,))
+    
+        for row in cursor.fetchall():
+            node_name, count = row
+            recent_tx[node_name] = count
+    
+        # Fetch recent rewards
+        cursor.execute("""
+            SELECT node_name, reward_amount, reason, timestamp
+            FROM rewards
+            ORDER BY timestamp DESC
+            LIMIT 20
+        """)
+    
+        rewards_history = []
+        for row in cursor.fetchall():
+            node_name, amount, reason, timestamp = row
+            rewards_history.append({
+                'node_name': node_name,
+                'amount': amount,
+                'reason': reason,
+                'timestamp': datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            })
     
     # Combine data
     nodes_data = []
@@ -91,122 +95,97 @@ def get_node_metrics():
             'reward_balance': reward_data.get(node_name, 0),
             'uptime_seconds': metrics_data.get(node_name, {}).get('uptime_seconds', 0),
             'avg_latency': metrics_data.get(node_name, {}).get('avg_latency', 0),
-            'latest_milestone': metrics_data.get(node_name, {}).get('latest_milestone', 0)
+            'latest_milestone': metrics_data.get(node_name, {}).get('latest_milestone', 0),
+            'health_state': metrics_data.get(node_name, {}).get('health_state', 'closed')
         }
         nodes_data.append(node_data)
-    
+
     return nodes_data, rewards_history
 
-def calculate_milestone_sync_factor(node_metrics):
-    """Calculate how in-sync the nodes are with milestones."""
-    if not node_metrics:
-        return {}
-    
-    # Find the highest milestone index reported by any node
-    max_milestone = max(node['latest_milestone'] for node in node_metrics if node['latest_milestone'])
-    
-    # Calculate sync factor for each node (1.0 = fully synced, lower = less synced)
-    sync_factors = {}
-    for node in node_metrics:
-        node_name = node['node_name']
-        if max_milestone and node['latest_milestone']:
-            sync_factor = node['latest_milestone'] / max_milestone
-            sync_factors[node_name] = sync_factor
-        else:
-            sync_factors[node_name] = 0
-    
-    return sync_factors
-
-def calculate_latency_factor(avg_latency):
-    """Calculate a factor based on latency (lower latency = higher factor)."""
-    if avg_latency >= MAX_LATENCY_MS:
-        return LATENCY_PENALTY_FACTOR
-    
-    # Linear scale: 1.0 (best) to LATENCY_PENALTY_FACTOR (worst)
-    factor = 1.0 - ((1.0 - LATENCY_PENALTY_FACTOR) * (avg_latency / MAX_LATENCY_MS))
-    return max(LATENCY_PENALTY_FACTOR, factor)
-
-def calculate_uptime_factor(uptime_seconds, interval_seconds):
-    """Calculate uptime factor based on expected interval."""
-    # Cap at 100% for the period
-    uptime_ratio = min(1.0, uptime_seconds / interval_seconds)
-    
-    # Apply UPTIME_REWARD_FACTOR
-    uptime_bonus = 1.0 + (UPTIME_REWARD_FACTOR * uptime_ratio)
-    return uptime_bonus
-
-def calculate_volume_bonus(tx_count):
-    """Calculate bonus for high transaction volume."""
-    if tx_count >= TRANSACTION_VOLUME_THRESHOLD:
-        # Logarithmic scaling for bonus to prevent excessive rewards for very high volume
-        bonus = 1.0 + (VOLUME_BONUS_MULTIPLIER - 1.0) * min(1.0, math.log10(tx_count / TRANSACTION_VOLUME_THRESHOLD + 1))
-        return bonus
-    return 1.0
+def get_latency_metrics():
+    """Summarize the API latency histograms written by the collector.
 
-def calculate_reward_details(nodes_data):
-    """Calculate detailed reward information based on node metrics."""
-    # Calculate milestone sync factors
-    sync_factors = calculate_milestone_sync_factor(nodes_data)
+    Returns {node_name: {endpoint: summary}}; each summary holds the sample
+    count, mean, p50/p95/p99 and the cumulative buckets as [upper_ms, count]
+    pairs, with "+Inf" as the bound of the overflow bucket.
+    """
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT node_name, endpoint, counts, count, sum_ms
+            FROM latency_histograms
+            ORDER BY node_name, endpoint
+        """)
     
-    reward_details = []
+        latency = {}
+        for node_name, endpoint, counts, count, sum_ms in cursor.fetchall():
+            histogram = LatencyHistogram.from_json(counts, count, sum_ms)
+            summary = histogram.summary()
+            summary['buckets'] = [["+Inf" if upper == float('inf') else upper, total]
+                                  for upper, total in histogram.cumulative_buckets()]
+            latency.setdefault(node_name, {})[endpoint] = summary
     
-    # Calculate rewards for each node
-    for node in nodes_data:
-        node_name = node['node_name']
-        metrics = node
-        
-        # Base transaction reward
-        base_reward = metrics['recent_transactions'] * BASE_REWARD_PER_TX
-        
-        # Uptime factor
-        uptime_factor = calculate_uptime_factor(metrics['uptime_seconds'], REWARD_CALCULATION_INTERVAL)
-        
-        # Latency factor (penalty for high latency)
-        latency_factor = calculate_latency_factor(metrics['avg_latency'])
-        
-        # Milestone sync reward
-        sync_factor = sync_factors.get(node_name, 0)
-        sync_reward = MILESTONE_SYNC_REWARD * sync_factor
-        
-        # Volume bonus
-        volume_bonus = calculate_volume_bonus(metrics['recent_transactions'])
-        
-        # Calculate final reward
-        reward = (base_reward * uptime_factor * latency_factor * volume_bonus) + sync_reward
-        reward = round(reward, 4)  # Round to 4 decimal places
-        
-        # Store reason for reward calculation
-        reward_reason = (
-            f"Base: {base_reward:.4f} × "
-            f"Uptime({metrics['uptime_seconds']}s): {uptime_factor:.2f} × "
-            f"Latency({metrics['avg_latency']:.1f}ms): {latency_factor:.2f} × "
-            f"Volume({metrics['recent_transactions']}tx): {volume_bonus:.2f} + "
-            f"Sync({sync_factor:.2f}): {sync_reward:.4f}"
-        )
-        
-        reward_details.append({
-            'node_name': node_name,
-            'reward': reward,
-            'reason': reward_reason,
-            'base_reward': base_reward,
-            'uptime_factor': uptime_factor,
-            'latency_factor': latency_factor,
-            'sync_factor': sync_factor,
-            'sync_reward': sync_reward,
-            'volume_bonus': volume_bonus
-        })
-    
-    return reward_details
+        return latency
 
-@app.route('/')
-def index():
-    """Render the front-end page with node metrics and rewards."""
-    nodes_data, rewards_history = get_node_metrics()
+def get_reward_snapshot():
+    """Fetch the reward breakdown of the latest cycle written by the collector.
+
+    Returns (cycle, reward_details); cycle is None when no reward cycle has
+    been recorded yet.
+    """
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
     
-    # Calculate reward details for each node
-    reward_details = calculate_reward_details(nodes_data)
+        cursor.execute("SELECT id, interval_seconds, timestamp FROM reward_cycles ORDER BY id DESC LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            return None, []
+    
+        cycle = {
+            'id': row[0],
+            'interval_seconds': row[1],
+            'timestamp': row[2]
+        }
     
-    # Calculate system stats
+        cursor.execute("""
+            SELECT node_name, reward, reason, base_reward, uptime_factor,
+                   latency_factor, sync_factor, sync_reward, volume_bonus
+            FROM reward_snapshots
+            WHERE cycle_id = ?
+            ORDER BY node_name
+        """, (cycle['id'],))
+    
+        reward_details = []
+        for row in cursor.fetchall():
+            node_name, reward, reason, base_reward, uptime_factor, latency_factor, sync_factor, sync_reward, volume_bonus = row
+            reward_details.append({
+                'node_name': node_name,
+                'reward': reward,
+                'reason': reason,
+                'base_reward': base_reward,
+                'uptime_factor': uptime_factor,
+                'latency_factor': latency_factor,
+                'sync_factor': sync_factor,
+                'sync_reward': sync_reward,
+                'volume_bonus': volume_bonus
+            })
+    
+        return cycle, reward_details
+
+def calculate_reward_details(nodes_data):
+    """Calculate detailed reward information based on node metrics."""
+    node_metrics = {node['node_name']: node for node in nodes_data}
+    return compute_rewards_batch(node_metrics, REWARD_CALCULATION_INTERVAL).details()
+
+def get_reward_details(nodes_data):
+    """Return the latest reward snapshot, computing one only if none exists yet."""
+    cycle, reward_details = get_reward_snapshot()
+    if cycle is None:
+        reward_details = calculate_reward_details(nodes_data)
+    return reward_details
+
+def calculate_system_stats(nodes_data, updated_at):
+    """Calculate the system-wide figures shown in the dashboard header."""
     total_transactions = sum(node['total_transactions'] for node in nodes_data)
     total_recent_txs = sum(node['recent_transactions'] for node in nodes_data)
     total_rewards = sum(node['reward_balance'] for node in nodes_data)
@@ -218,33 +197,282 @@ def index():
     # Calculate max milestone
     max_milestone = max([node['latest_milestone'] for node in nodes_data]) if nodes_data else 0
     
-    system_stats = {
+    return {
         'total_transactions': total_transactions,
         'recent_transactions': total_recent_txs,
         'total_rewards': total_rewards,
         'avg_latency': avg_system_latency,
         'max_milestone': max_milestone,
-        'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        'timestamp': datetime.datetime.fromtimestamp(updated_at).strftime('%Y-%m-%d %H:%M:%S')
     }
+
+class MetricsSnapshot:
+    """Dashboard data for one collector data version, with its JSON pre-serialized."""
+
+    def __init__(self, version, updated_at, nodes_data, rewards_history, reward_details):
+        self.version = version
+        self.updated_at = updated_at
+        self.nodes_data = nodes_data
+        self.rewards_history = rewards_history
+        self.reward_details = reward_details
+        self.system_stats = calculate_system_stats(nodes_data, updated_at)
+        self.last_modified = datetime.datetime.fromtimestamp(updated_at, datetime.timezone.utc)
+        
+        self.body = json.dumps({
+            'nodes': nodes_data,
+            'rewards': rewards_history,
+            'reward_details': reward_details,
+            'timestamp': updated_at
+        }, separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        self.html = None  # Rendered dashboard page, filled on first request
+
+class MetricsSnapshotCache:
+    """Process-wide cache of the latest MetricsSnapshot.
+
+    Within SNAPSHOT_TTL the cached snapshot is served without touching the
+    database. After that a single-row lookup of the collector's data version
+    decides whether the snapshot is still current; it is only rebuilt when
+    the collector has written new data. Concurrent requests share one rebuild.
+    """
+
+    def __init__(self, ttl=SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._snapshot = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the current snapshot, refreshing it if the data changed."""
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is not None and now - self._checked_at < self.ttl:
+                return self._snapshot
+            
+            with db_pool.connection() as conn:
+                version, updated_at = get_data_version(conn=conn)
+            if self._snapshot is None or self._snapshot.version != version:
+                nodes_data, rewards_history = get_node_metrics()
+                reward_details = get_reward_details(nodes_data)
+                self._snapshot = MetricsSnapshot(version, updated_at or int(time.time()),
+                                                 nodes_data, rewards_history, reward_details)
+            
+            self._checked_at = now
+            return self._snapshot
+
+    def invalidate(self):
+        """Force the next request to check the data version."""
+        with self._lock:
+            self._checked_at = 0
+
+metrics_cache = MetricsSnapshotCache()
+
+def compute_delta(previous, snapshot):
+    """Return the fields that changed between two snapshots, or None if nothing did."""
+    delta = {}
+    
+    previous_nodes = {node['node_name']: node for node in previous.nodes_data}
+    if set(previous_nodes) != {node['node_name'] for node in snapshot.nodes_data}:
+        delta['reload'] = True
     
-    return render_template('index.html', 
-                          nodes=nodes_data, 
-                          rewards_history=rewards_history,
-                          system_stats=system_stats,
-                          reward_details=reward_details)
+    nodes = {}
+    for node in snapshot.nodes_data:
+        old = previous_nodes.get(node['node_name'], {})
+        changed = {field: value for field, value in node.items() if old.get(field) != value}
+        if changed:
+            nodes[node['node_name']] = changed
+    if nodes:
+        delta['nodes'] = nodes
+    
+    stats = {stat: value for stat, value in snapshot.system_stats.items()
+             if previous.system_stats.get(stat) != value}
+    if stats:
+        delta['system_stats'] = stats
+    
+    if previous.reward_details != snapshot.reward_details or previous.rewards_history != snapshot.rewards_history:
+        delta['rewards_changed'] = True
+    
+    if not delta:
+        return None
+    delta['etag'] = f'"{snapshot.etag}"'
+    return delta
+
+def sse_message(event, data, event_id=None):
+    """Format one server-sent event."""
+    message = f"event: {event}\ndata: {data}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
+
+class MetricsBroadcaster:
+    """Pushes snapshot deltas to all connected event-stream clients.
+
+    A single background thread checks the collector's data version every
+    STREAM_POLL_INTERVAL seconds and publishes a delta when it changes, so
+    the database load does not grow with the number of open dashboards.
+    """
+
+    def __init__(self, cache, poll_interval=STREAM_POLL_INTERVAL, backlog=STREAM_BACKLOG):
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self._events = deque(maxlen=backlog)
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def _ensure_started(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="metrics-broadcaster", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        previous = None
+        while True:
+            try:
+                if previous is None:
+                    # First snapshot to diff against; retried until the database can be read
+                    previous = self.cache.get()
+                else:
+                    with db_pool.connection() as conn:
+                        version, _ = get_data_version(conn=conn)
+                    if version != previous.version:
+                        self.cache.invalidate()
+                        snapshot = self.cache.get()
+                        delta = compute_delta(previous, snapshot)
+                        previous = snapshot
+                        if delta is not None:
+                            self.publish('delta', delta)
+            except Exception as e:
+                print(f"[ERROR] Metrics stream update failed: {str(e)}")
+            time.sleep(self.poll_interval)
+
+    def publish(self, event, data):
+        """Queue an event for all subscribers."""
+        with self._condition:
+            self._sequence += 1
+            self._events.append((self._sequence, event, json.dumps(data, separators=(',', ':'))))
+            self._condition.notify_all()
+
+    def subscribe(self, keepalive=STREAM_KEEPALIVE):
+        """Yield server-sent events for one client until it disconnects."""
+        self._ensure_started()
+        
+        snapshot = self.cache.get()
+        yield sse_message('hello', json.dumps({'etag': f'"{snapshot.etag}"'}))
+        
+        with self._condition:
+            seen = self._sequence
+        
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._sequence > seen, timeout=keepalive)
+                pending = [item for item in self._events if item[0] > seen]
+                missed = pending and pending[0][0] > seen + 1
+                seen = self._sequence
+            
+            if missed:
+                # Fell behind the backlog; let the client re-render
+                yield sse_message('delta', json.dumps({'reload': True}))
+            elif pending:
+                for sequence, event, data in pending:
+                    yield sse_message(event, data, sequence)
+            else:
+                yield ": keep-alive\n\n"
+
+metrics_broadcaster = MetricsBroadcaster(metrics_cache)
+
+# Circuit states as gauge values
+HEALTH_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def node_values(field, convert=None):
+    """Return a callback reading one field of every node from the current snapshot."""
+    def collect():
+        return {(node['node_name'],): convert(node[field]) if convert else node[field]
+                for node in metrics_cache.get().nodes_data}
+    return collect
+
+def get_latency_histograms():
+    """Load the API latency histograms written by the collector, keyed by (node_name, endpoint)."""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT node_name, endpoint, counts, count, sum_ms FROM latency_histograms")
+        return {(node_name, endpoint): LatencyHistogram.from_json(counts, count, sum_ms)
+                for node_name, endpoint, counts, count, sum_ms in cursor.fetchall()}
+
+# Node metrics from the database in the Prometheus text format
+dashboard_metrics = MetricsRegistry()
+dashboard_metrics.counter("hornet_node_transactions_total", "Transactions recorded per node", ("node",),
+                          callback=node_values('total_transactions'))
+dashboard_metrics.gauge("hornet_node_recent_transactions", "Transactions recorded per node in the last hour",
+                        ("node",), callback=node_values('recent_transactions'))
+dashboard_metrics.gauge("hornet_node_reward_balance", "Reward balance per node", ("node",),
+                        callback=node_values('reward_balance'))
+dashboard_metrics.gauge("hornet_node_latest_milestone", "Latest milestone reported per node", ("node",),
+                        callback=node_values('latest_milestone'))
+dashboard_metrics.gauge("hornet_node_avg_latency_ms", "Moving average of node_info latency per node", ("node",),
+                        callback=node_values('avg_latency'))
+dashboard_metrics.counter("hornet_node_uptime_seconds_total", "Accumulated uptime per node", ("node",),
+                          callback=node_values('uptime_seconds'))
+dashboard_metrics.gauge("hornet_node_health_state", "Circuit state per node (0 closed, 1 half-open, 2 open)",
+                        ("node",), callback=node_values('health_state', lambda state: HEALTH_STATE_VALUES.get(state, 0)))
+dashboard_metrics.gauge("hornet_data_version", "Collector data version", callback=lambda: metrics_cache.get().version)
+dashboard_metrics.add_collector(lambda: prometheus_lines(
+    "hornet_api_latency_seconds", "Round-trip time of node API calls", get_latency_histograms()))
+
+def conditional_response(body, mimetype, etag, last_modified):
+    """Build a response that answers 304 when the client already has this version."""
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/')
+def index():
+    """Render the front-end page with node metrics and rewards."""
+    snapshot = metrics_cache.get()
+    
+    if snapshot.html is None:
+        snapshot.html = render_template('index.html', 
+                                        nodes=snapshot.nodes_data, 
+                                        rewards_history=snapshot.rewards_history,
+                                        system_stats=snapshot.system_stats,
+                                        reward_details=snapshot.reward_details,
+                                        etag=f'"{snapshot.etag}"')
+    return conditional_response(snapshot.html, 'text/html', f"html-{snapshot.etag}", snapshot.last_modified)
 
 @app.route('/api/metrics')
 def api_metrics():
     """JSON API endpoint for node metrics."""
-    nodes_data, rewards_history = get_node_metrics()
-    reward_details = calculate_reward_details(nodes_data)
-    
-    return jsonify({
-        'nodes': nodes_data,
-        'rewards': rewards_history,
-        'reward_details': reward_details,
-        'timestamp': int(time.time())
-    })
+    snapshot = metrics_cache.get()
+    return conditional_response(snapshot.body, 'application/json', snapshot.etag, snapshot.last_modified)
+
+@app.route('/api/latency')
+def api_latency():
+    """JSON API endpoint for per-node, per-endpoint API latency percentiles and histograms."""
+    with db_pool.connection() as conn:
+        version, updated_at = get_data_version(conn=conn)
+    body = json.dumps({'latency': get_latency_metrics()})
+    return conditional_response(body, 'application/json', f"latency-{version}",
+                                datetime.datetime.fromtimestamp(updated_at, datetime.timezone.utc))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Node metrics and API latency histograms in the Prometheus text exposition format."""
+    return Response(dashboard_metrics.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-sent events stream of metric deltas pushed after each collector update."""
+    response = Response(metrics_broadcaster.subscribe(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Upgrade existing databases in place before serving
+    for version, description in migrate():
+        print(f"[STARTUP] Applied schema migration {version}: {description}")
+    print(f"[STARTUP] Database schema at version {get_schema_version()}")
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
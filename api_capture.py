@@ -0,0 +1,364 @@
+import argparse
+import bisect
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+
+import requests
+from requests.adapters import BaseAdapter
+
+# Capture configuration
+CAPTURE_FLUSH_INTERVAL = 1.0  # Sync the compressed log to disk this often, so a crash loses at most this much (in seconds)
+
+# Replay configuration
+REPLAY_DB_NAME = "replay.db"  # Database written by a replay; recreated on every run
+REPLAY_TOLERANCE = 1e-6  # Largest balance difference accepted when comparing replay results
+POLL_ENDPOINT = "node_info"  # Endpoint tag of the requests that start a poll; the startup request is protocol_parameters
+
+# Milestone index of a utxo-changes path
+UTXO_CHANGES_PATH = re.compile(r"/milestones/by-index/(\d+)/utxo-changes$")
+
+
+class ResponseRecorder:
+    """Append-only, gzip-compressed JSON-lines log of node API responses.
+
+    Each line is one request that reached a node:
+    {"t": unix time, "node": name, "url": node url, "method": "GET",
+    "path": api path, "endpoint": name, "latency_ms": ms,
+    "status": code, "body": response text} for an answer, or
+    "error": exception class name and "message" instead of status and body
+    when the request failed. Every recorder appends a new gzip member, so
+    captures of several collector runs can share one file. The log is
+    synced every flush_interval seconds, so it stays readable up to the
+    last sync if the collector dies.
+    """
+
+    def __init__(self, path, flush_interval=CAPTURE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.records = 0
+        self._file = gzip.open(path, "ab")
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, node_name, node_url, method, path, endpoint, response, latency_ms, error=None):
+        """Append one response, or the error of a request that got none."""
+        entry = {'t': time.time(), 'node': node_name, 'url': node_url, 'method': method, 'path': path,
+                 'endpoint': endpoint, 'latency_ms': round(latency_ms, 3)}
+        if response is not None:
+            entry['status'] = response.status_code
+            entry['body'] = response.content.decode("utf-8", "replace")
+        else:
+            entry['error'] = type(error).__name__
+            entry['message'] = str(error)
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.records += 1
+            now = time.monotonic()
+            if now - self._flushed >= self.flush_interval:
+                self._file.flush(zlib.Z_SYNC_FLUSH)
+                self._flushed = now
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_capture(path):
+    """Yield the records of a capture log in file order.
+
+    A log cut short by a crash ends at its last complete line.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as capture:
+        try:
+            for line in capture:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile):
+            return
+
+
+def load_capture(path):
+    """Return the records of a capture log sorted by time."""
+    return sorted(read_capture(path), key=lambda record: record['t'])
+
+
+def _is_poll(record):
+    return record['endpoint'] == POLL_ENDPOINT and record['method'] == "GET"
+
+
+def _succeeded(record):
+    return record.get('status') == 200
+
+
+def _latest_milestone(record):
+    """Return the latest milestone index of a successful node_info record, else None."""
+    if not _succeeded(record):
+        return None
+    try:
+        return json.loads(record['body']).get("status", {}).get("latestMilestone", {}).get("index")
+    except ValueError:
+        return None
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter answering node requests from captured records.
+
+    The record for a poll is staged with stage() before the poll is
+    replayed, so each node_info request returns exactly the response
+    recorded at that point. Any other request is answered with the first
+    successful record of the same method and path, from whichever node
+    made it, or the first failed one if it never succeeded; requests
+    that were never captured get a 404. Failed records raise their
+    recorded exception. Responses carry the recorded latency_ms.
+    """
+
+    def __init__(self, records):
+        super().__init__()
+        self._node_urls = sorted({record['url'] for record in records}, key=len, reverse=True)
+        self._responses = {}
+        for record in records:
+            key = (record['method'], record['path'])
+            known = self._responses.get(key)
+            if known is None or (_succeeded(record) and not _succeeded(known)):
+                self._responses[key] = record
+        self._staged = {}
+        self._lock = threading.Lock()
+
+    def stage(self, record):
+        """Answer the next request of record's node for record's path with record."""
+        with self._lock:
+            self._staged[(record['url'], record['method'], record['path'])] = record
+
+    def _split(self, url):
+        for node_url in self._node_urls:
+            if url.startswith(node_url):
+                return node_url, url[len(node_url):]
+        return None, url
+
+    def send(self, request, **kwargs):
+        node_url, path = self._split(request.url)
+        with self._lock:
+            record = self._staged.pop((node_url, request.method, path), None)
+        if record is None:
+            record = self._responses.get((request.method, path))
+
+        if record is not None and 'error' in record:
+            error = getattr(requests.exceptions, record['error'], None)
+            if not (isinstance(error, type) and issubclass(error, requests.exceptions.RequestException)):
+                error = requests.exceptions.ConnectionError
+            raise error(record.get('message', ""), request=request)
+
+        response = requests.Response()
+        response.status_code = record['status'] if record is not None else 404
+        response._content = (record['body'] if record is not None else '{"error":"not captured"}').encode("utf-8")
+        response.headers['Content-Type'] = "application/json"
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.latency_ms = record['latency_ms'] if record is not None else 0.0
+        return response
+
+    def close(self):
+        pass
+
+
+def replay_capture(path, speed=None, db_name=REPLAY_DB_NAME):
+    """Feed a capture log back through the collector and return a result summary.
+
+    Every captured node_info response is replayed as a poll_node() call of
+    its node, in recorded order (the collector's startup request for the
+    protocol parameters is tagged protocol_parameters and is no poll); the milestone payloads and other requests
+    the poll makes are answered from the log. Reward cycles run every
+    REWARD_CALCULATION_INTERVAL of recorded time. The collector's clock
+    follows the recorded timestamps, so uptime, rolling transaction counts
+    and rewards come out as they would have for the live traffic.
+
+    speed None replays as fast as possible; otherwise recorded time is
+    played back speed times faster (1 = original speed). Polls run one at
+    a time, milestones are written inline and circuit breakers are off,
+    as requests the breakers suppressed were never captured. Meant to run
+    in a fresh process: the collector's in-memory state is not reset.
+    """
+    import rwd
+    import storage
+    from hornet_client import ClientRegistry
+
+    records = load_capture(path)
+    if not records:
+        raise ValueError(f"No records in capture {path}")
+    nodes = {}
+    for record in records:
+        nodes.setdefault(record['node'], record['url'])
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+
+    adapter = ReplayAdapter(records)
+    saved = (rwd.NODES, rwd.node_clients, rwd.clock, storage.DB_NAME)
+    recorded_time = records[0]['t']
+    rwd.NODES = nodes
+    rwd.node_clients = ClientRegistry(headers=rwd.HEADERS, latency_recorder=rwd.api_latency,
+                                      on_request_error=lambda *error: rwd.record_api_error(*error),
+                                      adapter=adapter)
+    rwd.clock = lambda: recorded_time
+    storage.DB_NAME = db_name
+
+    start_time = records[0]['t']
+    next_reward = start_time + rwd.REWARD_CALCULATION_INTERVAL
+    polls = cycles = 0
+    started = time.perf_counter()
+    try:
+        rwd.init_db()
+        # Uptime counts from the start of the capture, not from when the replay database was created
+        rwd.node_metrics_aggregator.load((node_name, int(start_time), 0, 0.0, 0) for node_name in nodes)
+        for record in records:
+            if not _is_poll(record):
+                continue
+            while record['t'] >= next_reward:
+                recorded_time = next_reward
+                rwd.run_reward_cycle()
+                cycles += 1
+                next_reward += rwd.REWARD_CALCULATION_INTERVAL
+
+            if speed:
+                delay = started + (record['t'] - start_time) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            recorded_time = record['t']
+            adapter.stage(record)
+            rwd.poll_node(record['node'], record['url'])
+            polls += 1
+
+        rwd.flush_node_metrics()
+        balances = rwd.get_reward_balances()
+    finally:
+        rwd.node_clients.close_all()
+        rwd.NODES, rwd.node_clients, rwd.clock, storage.DB_NAME = saved
+    elapsed = time.perf_counter() - started
+
+    recorded_seconds = records[-1]['t'] - start_time
+    return {
+        'capture': str(path),
+        'records': len(records),
+        'polls': polls,
+        'reward_cycles': cycles,
+        'recorded_seconds': round(recorded_seconds, 3),
+        'wall_seconds': round(elapsed, 3),
+        'speedup': round(recorded_seconds / elapsed, 1) if elapsed else None,
+        'milestones': rwd.milestones_ingested_total.total(),
+        'outputs_ingested': rwd.outputs_ingested_total.total(),
+        'outputs_skipped': rwd.outputs_skipped_total.total(),
+        'api_errors': rwd.api_errors_total.total(),
+        'balances': {node_name: balances.get(node_name, 0.0) for node_name in nodes},
+    }
+
+
+def compare_results(result, baseline, tolerance=REPLAY_TOLERANCE):
+    """Return the differences between two replay results as readable lines (empty if they match)."""
+    differences = []
+    for key in ('reward_cycles', 'milestones', 'outputs_ingested'):
+        if result.get(key) != baseline.get(key):
+            differences.append(f"{key}: {baseline.get(key)} -> {result.get(key)}")
+    for node_name in sorted(set(result['balances']) | set(baseline['balances'])):
+        old = baseline['balances'].get(node_name)
+        new = result['balances'].get(node_name)
+        if old is None or new is None or abs(new - old) > tolerance:
+            differences.append(f"balance of {node_name}: {old} -> {new}")
+    return differences
+
+
+def capture_to_trace(records):
+    """Convert capture records to a reward_sim behaviour trace (see reward_sim.load_trace()).
+
+    node_info records become polls (protocol_parameters ones do not), failed ones (errors and non-200
+    answers) with a null latency. Each captured milestone payload becomes
+    a milestone event just before the first poll that reported it.
+    """
+    records = sorted(records, key=lambda record: record['t'])
+    trace, poll_times, reported = [], [], []
+    outputs = {}
+    for record in records:
+        if _is_poll(record):
+            milestone = _latest_milestone(record)
+            trace.append({"type": "poll", "time": record['t'], "node": record['node'],
+                          "latency_ms": record['latency_ms'] if milestone is not None else None,
+                          "milestone": milestone})
+            if milestone is not None and milestone > (reported[-1] if reported else 0):
+                poll_times.append(record['t'])
+                reported.append(milestone)
+        elif _succeeded(record):
+            match = UTXO_CHANGES_PATH.search(record['path'])
+            if match and int(match.group(1)) not in outputs:
+                body = json.loads(record['body'])
+                outputs[int(match.group(1))] = len(body.get("createdOutputs", [])) + len(body.get("consumedOutputs", []))
+
+    for index, count in outputs.items():
+        first = bisect.bisect_left(reported, index)
+        at = poll_times[first] if first < len(poll_times) else records[-1]['t']
+        trace.append({"type": "milestone", "time": at - 1e-6, "index": index, "outputs": count})
+    trace.sort(key=lambda event: event["time"])
+    if records:
+        trace.insert(0, {"type": "start", "time": records[0]['t']})
+        trace.append({"type": "end", "time": records[-1]['t']})
+    return trace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured HORNET API traffic through the collector.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    replay = subcommands.add_parser("replay", help="replay a capture and print the reward results")
+    replay.add_argument("capture", help="capture log written with CAPTURE_FILE")
+    replay.add_argument("--speed", type=float, default=None,
+                        help="playback speed relative to the recording (1 = original); as fast as possible if omitted")
+    replay.add_argument("--db", default=REPLAY_DB_NAME, help="database written by the replay (recreated)")
+    replay.add_argument("--log-level", default="WARNING", help="collector log level during the replay")
+    replay.add_argument("--out", help="write the result as JSON to this file")
+    replay.add_argument("--compare", help="result JSON of an earlier replay; exit with status 1 if the rewards differ")
+    replay.add_argument("--tolerance", type=float, default=REPLAY_TOLERANCE, help="accepted balance difference")
+
+    trace = subcommands.add_parser("trace", help="convert a capture to a reward_sim trace")
+    trace.add_argument("capture", help="capture log written with CAPTURE_FILE")
+    trace.add_argument("out", help="trace file (.jsonl or .jsonl.gz)")
+    args = parser.parse_args()
+
+    if args.command == "trace":
+        from reward_sim import write_trace
+        events = capture_to_trace(read_capture(args.capture))
+        write_trace(args.out, events)
+        print(f"[REPLAY] Wrote {len(events)} trace events to {args.out}")
+        return
+
+    import rwd
+    rwd.log.set_level(args.log_level)
+    result = replay_capture(args.capture, speed=args.speed, db_name=args.db)
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as out:
+            json.dump(result, out, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            differences = compare_results(result, json.load(baseline), args.tolerance)
+        for difference in differences:
+            print(f"[REPLAY] {difference}")
+        print(f"[REPLAY] {'Rewards differ from' if differences else 'Rewards match'} {args.compare}")
+        if differences:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,611 @@
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Scales a database is seeded at: name -> (transactions, nodes)
+SCALES = {
+    "small": (100_000, 4),
+    "medium": (1_000_000, 100),
+    "large": (10_000_000, 1_000),
+    "xlarge": (100_000_000, 10_000),
+}
+
+# Seeding configuration
+BENCH_DIR = "bench"  # Seeded databases, reused by later runs at the same scale
+SEED_BATCH_SIZE = 100_000  # Transactions inserted per seeding transaction
+SEED_DAYS = 7  # Seeded transactions are spread over this many days before now
+SEED_OUTPUTS_PER_MILESTONE = 50  # Transactions per seeded milestone
+SEED_REWARD_CYCLES = 20  # Reward cycles of history seeded per node
+# Tables the collector only appends to; benchmark rows are removed by rowid. Every
+# other table holds a few rows per node and is restored from a copy taken at seeding.
+APPEND_ONLY_TABLES = ("transactions", "rewards", "reward_cycles")
+
+# Benchmark configuration
+BENCH_RESULT_FILE = "bench_results.json"  # Results written by the command line
+INGEST_MILESTONES = 200  # Milestones ingested by each ingestion benchmark
+REWARD_REPEATS = 10  # Reward cycles timed per benchmark
+DASHBOARD_CLIENTS = 8  # Concurrent clients requesting each dashboard endpoint
+DASHBOARD_REQUESTS = 50  # Requests sent by each client per endpoint
+DASHBOARD_WRITE_INTERVAL = 1.0  # Simulated collector writes during the dashboard benchmark (in seconds)
+BENCH_REPEATS = 3  # Runs of each benchmark; every metric is reported as the median over the runs
+REGRESSION_THRESHOLD = 0.25  # Relative change of a metric reported as a regression; short runs vary by 10-20%
+NOISE_FLOOR_MS = 5.0  # Latency changes smaller than this are never reported; scheduler jitter alone reaches a few ms
+
+
+def node_names_for(nodes):
+    return [f"Node-{i + 1}" for i in range(nodes)]
+
+
+def remove_database(db_name):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+
+
+def seeded_scale(db_name):
+    """Return (transactions, nodes) of a completely seeded database at the current schema, or None."""
+    import storage
+
+    if not os.path.exists(db_name):
+        return None
+    conn = sqlite3.connect(db_name)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] != storage.SCHEMA_VERSION:
+            return None
+        conn.execute("SELECT COUNT(*) FROM bench_seed_rowids")
+        return conn.execute("SELECT transactions, nodes FROM bench_seed").fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def seed_database(db_name, transactions, nodes, seed=0):
+    """Create a collector database holding `transactions` rows spread over `nodes` nodes.
+
+    Each seeded milestone of SEED_OUTPUTS_PER_MILESTONE transactions was
+    ingested by one node, round robin, over the last SEED_DAYS days. The
+    node counters, metrics, cursors and balances, SEED_REWARD_CYCLES reward
+    cycles of history and the last hour of minute buckets are seeded to
+    match. The seeded state is saved for restore_seeded_state(). A
+    bench_seed row is written last, so an interrupted seeding is detected
+    and redone.
+    """
+    import storage
+    from rolling_window import bucket_of
+
+    remove_database(db_name)
+    storage.migrate(db_name)
+    conn = storage.get_connection(db_name)
+    conn.execute("PRAGMA synchronous=OFF")
+    rng = random.Random(seed)
+    node_names = node_names_for(nodes)
+    now = int(time.time())
+    first_time = now - SEED_DAYS * 86400
+    milestones = max(1, -(-transactions // SEED_OUTPUTS_PER_MILESTONE))
+    counts = dict.fromkeys(node_names, 0)
+
+    def rows(start, stop):
+        for i in range(start, stop):
+            milestone = i // SEED_OUTPUTS_PER_MILESTONE
+            node_name = node_names[milestone % nodes]
+            counts[node_name] += 1
+            yield (f"0x{i:068x}", node_name, milestone + 1, first_time + milestone * SEED_DAYS * 86400 // milestones)
+
+    for start in range(0, transactions, SEED_BATCH_SIZE):
+        with conn:
+            conn.executemany("INSERT INTO transactions (id, node_name, milestone_index, timestamp) VALUES (?, ?, ?, ?)",
+                             rows(start, min(transactions, start + SEED_BATCH_SIZE)))
+
+    hour_bucket = bucket_of(now)
+    per_minute = max(1, transactions // (SEED_DAYS * 1440 * nodes))
+    with conn:
+        conn.executemany("INSERT INTO counters (node_name, count) VALUES (?, ?)", counts.items())
+        conn.executemany("""
+            INSERT INTO node_metrics (node_name, last_seen, uptime_seconds, avg_latency, latest_milestone)
+            VALUES (?, ?, ?, ?, ?)
+        """, ((node_name, now, rng.randint(SEED_DAYS * 43200, SEED_DAYS * 86400), rng.uniform(5, 200),
+               max(1, milestones - rng.randint(0, 3))) for node_name in node_names))
+        conn.executemany("INSERT INTO milestone_cursors (node_name, last_milestone, updated_at) VALUES (?, ?, ?)",
+                         ((node_name, milestones, now) for node_name in node_names))
+        conn.executemany("INSERT INTO reward_balance (node_name, balance) VALUES (?, ?)",
+                         ((node_name, rng.uniform(0, 1000)) for node_name in node_names))
+        conn.executemany("INSERT INTO rewards (node_name, reward_amount, reason, timestamp) VALUES (?, ?, ?, ?)",
+                         ((node_name, rng.uniform(0, 5), "Seeded reward", now - cycle * 300)
+                          for cycle in range(SEED_REWARD_CYCLES) for node_name in node_names))
+        conn.executemany("INSERT INTO tx_minute_buckets (node_name, minute, count) VALUES (?, ?, ?)",
+                         ((node_name, hour_bucket - minute, rng.randint(0, 2 * per_minute))
+                          for node_name in node_names for minute in range(60)))
+        save_seeded_state(conn)
+        conn.execute("CREATE TABLE bench_seed (transactions INTEGER, nodes INTEGER, seeded_at INTEGER)")
+        conn.execute("INSERT INTO bench_seed VALUES (?, ?, ?)", (transactions, nodes, now))
+    conn.execute(f"PRAGMA synchronous={storage.SYNCHRONOUS}")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    storage.close_connection(db_name)
+
+
+def median_results(runs):
+    """Merge the results of repeated runs of a benchmark into the median of every metric.
+
+    The spread (max - min) of each metric over the runs is kept under
+    'spread', so comparisons can tell a change from the benchmark's own noise.
+    """
+    merged, spread = {}, {}
+    for key, value in runs[0].items():
+        if isinstance(value, dict):
+            merged[key] = median_results([run[key] for run in runs])
+        elif isinstance(value, (int, float)):
+            values = [run[key] for run in runs]
+            merged[key] = round(statistics.median(values), 3)
+            spread[key] = round(max(values) - min(values), 3)
+        else:
+            merged[key] = value
+    if spread:
+        merged['spread'] = spread
+    return merged
+
+
+def latency_stats(samples):
+    """Summarize durations in seconds as mean/p50/p95/p99/max milliseconds."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def random_tx_ids(rng, count):
+    return [f"0x{rng.getrandbits(272):068x}" for _ in range(count)]
+
+
+def collector_tables(conn):
+    return [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'bench_%' ORDER BY name")]
+
+
+def save_seeded_state(conn):
+    """Record the highest rowid of each append-only table and copy every other table."""
+    conn.execute("CREATE TABLE bench_seed_rowids (table_name TEXT PRIMARY KEY, max_rowid INTEGER)")
+    for table in collector_tables(conn):
+        if table in APPEND_ONLY_TABLES:
+            conn.execute(f"INSERT INTO bench_seed_rowids SELECT ?, COALESCE(MAX(rowid), 0) FROM {table}", (table,))
+        else:
+            conn.execute(f"CREATE TABLE bench_seed_{table} AS SELECT * FROM {table}")
+
+
+def restore_seeded_state(conn):
+    """Undo every write since seeding: delete appended rows and rewrite the small tables from their copies.
+
+    Costs time in proportion to the rows benchmarks wrote and the number of
+    nodes, not to the size of the database.
+    """
+    for table in collector_tables(conn):
+        if table in APPEND_ONLY_TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE rowid > "
+                         f"(SELECT max_rowid FROM bench_seed_rowids WHERE table_name = ?)", (table,))
+        else:
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"INSERT INTO {table} SELECT * FROM bench_seed_{table}")
+
+
+def reset_collector():
+    """Return the database to its seeded state and reload the collector's in-memory state from it."""
+    import rwd
+    from storage import transaction
+
+    with transaction() as conn:
+        restore_seeded_state(conn)
+    rwd.reset_state()
+    rwd.init_db()
+
+
+def bench_ingest_add_transaction(node_names, milestones, rng):
+    """Ingest milestones one output at a time through add_transaction()."""
+    import rwd
+
+    durations = []
+    first_milestone = rwd.get_milestone_cursor(node_names[0]) + 1
+    started = time.perf_counter()
+    for i in range(milestones):
+        node_name = node_names[i % len(node_names)]
+        tx_ids = random_tx_ids(rng, SEED_OUTPUTS_PER_MILESTONE)
+        milestone_started = time.perf_counter()
+        for tx_id in tx_ids:
+            rwd.add_transaction(tx_id, node_name, first_milestone + i)
+        durations.append(time.perf_counter() - milestone_started)
+    elapsed = time.perf_counter() - started
+    return {
+        'milestones': milestones,
+        'outputs': milestones * SEED_OUTPUTS_PER_MILESTONE,
+        'outputs_per_second': round(milestones * SEED_OUTPUTS_PER_MILESTONE / elapsed, 1),
+        'milestones_per_second': round(milestones / elapsed, 2),
+        **{f"milestone_{key}": value for key, value in latency_stats(durations).items()},
+    }
+
+
+def bench_ingest_milestone_batch(node_names, milestones, rng):
+    """Ingest milestones the way the pipeline's writer does, WRITER_BATCH_SIZE per write_milestone_batch()."""
+    import rwd
+
+    durations = []
+    first_milestone = rwd.get_milestone_cursor(node_names[0]) + 1
+    items = []
+    for i in range(milestones):
+        node_name = node_names[i % len(node_names)]
+        tx_ids = random_tx_ids(rng, SEED_OUTPUTS_PER_MILESTONE)
+        items.append((node_name, first_milestone + i, tx_ids))
+    started = time.perf_counter()
+    for start in range(0, len(items), rwd.WRITER_BATCH_SIZE):
+        batch_started = time.perf_counter()
+        rwd.write_milestone_batch(items[start:start + rwd.WRITER_BATCH_SIZE])
+        durations.append(time.perf_counter() - batch_started)
+    elapsed = time.perf_counter() - started
+    return {
+        'milestones': milestones,
+        'outputs': milestones * SEED_OUTPUTS_PER_MILESTONE,
+        'outputs_per_second': round(milestones * SEED_OUTPUTS_PER_MILESTONE / elapsed, 1),
+        'milestones_per_second': round(milestones / elapsed, 2),
+        **{f"batch_{key}": value for key, value in latency_stats(durations).items()},
+    }
+
+
+def bench_rewards(repeats):
+    """Time calculate_rewards() alone and a full cycle that also records the rewards."""
+    import rwd
+
+    calculate, cycle = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rwd.calculate_rewards()
+        calculate.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        batch = rwd.calculate_reward_batch()
+        rwd.record_rewards(batch.rewards(), batch.reasons(), batch)
+        cycle.append(time.perf_counter() - started)
+    return {'reward_calculate': latency_stats(calculate), 'reward_cycle': latency_stats(cycle)}
+
+
+def bench_dashboard_rebuild(repeats):
+    """Time dashboard responses that rebuild their snapshot, as after every collector write."""
+    import a1
+    from storage import bump_data_version
+
+    client = a1.app.test_client()
+    results = {}
+    for path in ("/api/metrics", "/"):
+        durations = []
+        for _ in range(repeats):
+            bump_data_version()
+            a1.metrics_cache.invalidate()
+            started = time.perf_counter()
+            response = client.get(path)
+            durations.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} answered {response.status_code}")
+        results[path] = {**latency_stats(durations), 'bytes': len(response.data)}
+    a1.db_pool.close_all()
+    return results
+
+
+def _serve_dashboard(db_name, conn):
+    import storage
+    from werkzeug.serving import make_server
+
+    storage.DB_NAME = db_name
+    import a1
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, a1.app, threaded=True)
+    conn.send(server.port)
+    server.serve_forever()
+
+
+def bench_dashboard_served(db_name, clients, requests_per_client, write_interval):
+    """Measure /api/metrics and / latency under concurrent clients.
+
+    The dashboard is served by a separate process, like in production,
+    while a thread bumps the collector's data version every write_interval
+    seconds so snapshots expire and are rebuilt as they would be live.
+    Returns the results and the dashboard process's peak memory.
+    """
+    import requests
+    from storage import bump_data_version
+
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    server = context.Process(target=_serve_dashboard, args=(db_name, sender))
+    server.start()
+    stop = threading.Event()
+
+    def write():
+        while not stop.wait(write_interval):
+            bump_data_version()
+
+    writer = threading.Thread(target=write, daemon=True)
+    results = {}
+    try:
+        if not receiver.poll(60):
+            raise RuntimeError("Dashboard did not start")
+        base_url = f"http://127.0.0.1:{receiver.recv()}"
+        requests.get(f"{base_url}/", timeout=60)  # Build the first snapshot outside the measurement
+        writer.start()
+
+        def client(path):
+            durations = []
+            with requests.Session() as session:
+                for _ in range(requests_per_client):
+                    started = time.perf_counter()
+                    response = session.get(f"{base_url}{path}", timeout=60)
+                    response.content
+                    durations.append(time.perf_counter() - started)
+            return durations
+
+        for path in ("/api/metrics", "/"):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as executor:
+                durations = [d for samples in executor.map(client, [path] * clients) for d in samples]
+            elapsed = time.perf_counter() - started
+            results[path] = {**latency_stats(durations), 'requests_per_second': round(len(durations) / elapsed, 1)}
+    finally:
+        stop.set()
+        server.terminate()
+        server.join()
+    return results, peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+
+def run_benchmarks(db_name, nodes, options):
+    """Run every benchmark against a seeded database; meant for a fresh process.
+
+    Each benchmark runs options['repeats'] times and reports the median of
+    every metric, so one run disturbed by the scheduler does not decide the
+    result. The database is returned to its seeded state before each run
+    and once more at the end, so no run sees the rows of another and the
+    next invocation starts from the same data.
+    """
+    import rwd
+    import storage
+
+    storage.DB_NAME = db_name
+    rwd.log.set_level("WARNING")
+    node_names = node_names_for(nodes)
+    rwd.NODES = {node_name: f"http://{node_name.lower()}.invalid" for node_name in node_names}
+    rng = random.Random(options['seed'])
+    memory = {'startup_mb': peak_rss_mb()}
+
+    def repeated(benchmark, *args):
+        runs = []
+        for _ in range(options['repeats']):
+            reset_collector()
+            runs.append(benchmark(*args))
+        return median_results(runs)
+
+    def dashboard_served():
+        served, dashboard_mb = bench_dashboard_served(db_name, options['clients'], options['requests'],
+                                                      options['write_interval'])
+        return {**served, 'peak_mb': dashboard_mb}
+
+    try:
+        results = {
+            'ingest_add_transaction': repeated(bench_ingest_add_transaction, node_names, options['milestones'], rng),
+            'ingest_milestone_batch': repeated(bench_ingest_milestone_batch, node_names, options['milestones'], rng),
+        }
+        memory['after_ingest_mb'] = peak_rss_mb()
+
+        results.update(repeated(bench_rewards, options['reward_repeats']))
+        memory['after_rewards_mb'] = peak_rss_mb()
+
+        rebuild = repeated(bench_dashboard_rebuild, options['reward_repeats'])
+        results['dashboard_rebuild_api_metrics'] = rebuild["/api/metrics"]
+        results['dashboard_rebuild_index'] = rebuild["/"]
+        memory['after_dashboard_rebuild_mb'] = peak_rss_mb()
+
+        served = repeated(dashboard_served)
+        results['dashboard_api_metrics'] = served["/api/metrics"]
+        results['dashboard_index'] = served["/"]
+        dashboard_mb = served['peak_mb']
+    finally:
+        reset_collector()
+        storage.close_connection()
+    memory['collector_peak_mb'] = peak_rss_mb()
+    memory['dashboard_peak_mb'] = dashboard_mb
+    results['memory'] = memory
+    return results
+
+
+def _benchmark_process(conn, db_name, nodes, options):
+    try:
+        conn.send(('ok', run_benchmarks(db_name, nodes, options)))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+def run_scale(label, transactions, nodes, options):
+    """Seed (or reuse) the database of a scale and benchmark it in a fresh process."""
+    os.makedirs(options['dir'], exist_ok=True)
+    db_name = os.path.join(options['dir'], f"bench_{transactions}tx_{nodes}n.db")
+    scale = {'transactions': transactions, 'nodes': nodes, 'database': db_name}
+
+    if options['reseed'] or seeded_scale(db_name) != (transactions, nodes):
+        print(f"[BENCH] {label}: seeding {transactions:,} transactions over {nodes:,} nodes into {db_name}")
+        started = time.perf_counter()
+        seed_database(db_name, transactions, nodes, options['seed'])
+        scale['seed_seconds'] = round(time.perf_counter() - started, 1)
+    scale['database_mb'] = round(os.path.getsize(db_name) / 2 ** 20, 1)
+
+    print(f"[BENCH] {label}: running benchmarks")
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    worker = context.Process(target=_benchmark_process, args=(sender, db_name, nodes, options))
+    worker.start()
+    status, payload = receiver.recv()
+    worker.join()
+    if status != 'ok':
+        raise RuntimeError(f"Benchmarks at scale {label} failed: {payload}")
+    scale['results'] = payload
+    return scale
+
+
+def flatten(report, section=None):
+    """Return {"scale.benchmark.metric": value} for every numeric result of a report.
+
+    With section='spread', returns the spread of each metric over the repeated runs instead.
+    """
+    flat = {}
+    for label, scale in report['scales'].items():
+        for benchmark, metrics in scale['results'].items():
+            if section is not None:
+                metrics = metrics.get(section, {})
+            for metric, value in metrics.items():
+                if isinstance(value, (int, float)):
+                    flat[f"{label}.{benchmark}.{metric}"] = value
+    return flat
+
+
+def metric_direction(name):
+    """Return 1 if higher is better, -1 if lower is better, None for metrics not compared.
+
+    Maxima and p99 of short runs are too noisy to gate on.
+    """
+    if name.endswith("_per_second"):
+        return 1
+    if name.endswith(("mean_ms", "p50_ms", "p95_ms", "_mb")):
+        return -1
+    return None
+
+
+def compare_reports(report, baseline, threshold=REGRESSION_THRESHOLD, noise_floor_ms=NOISE_FLOOR_MS):
+    """Compare two reports; returns (regressions, improvements) as (name, old, new, change) tuples.
+
+    A metric counts when it moved by more than threshold relative to the
+    baseline and by more than its spread over the repeated runs of either
+    report; latencies must also have moved by at least noise_floor_ms, as
+    sub-millisecond timings easily double from scheduler jitter alone.
+    """
+    current, previous = flatten(report), flatten(baseline)
+    spread = flatten(report, 'spread')
+    baseline_spread = flatten(baseline, 'spread')
+    regressions, improvements = [], []
+    for name in sorted(set(current) & set(previous)):
+        direction = metric_direction(name)
+        old, new = previous[name], current[name]
+        if direction is None or not old:
+            continue
+        noise = max(spread.get(name, 0), baseline_spread.get(name, 0))
+        if name.endswith("_ms"):
+            noise = max(noise, noise_floor_ms)
+        if abs(new - old) <= noise:
+            continue
+        change = (new - old) / old
+        if change * direction < -threshold:
+            regressions.append((name, old, new, change))
+        elif change * direction > threshold:
+            improvements.append((name, old, new, change))
+    return regressions, improvements
+
+
+def print_scale(label, scale):
+    results = scale['results']
+    print(f"[BENCH] {label} ({scale['transactions']:,} transactions, {scale['nodes']:,} nodes, "
+          f"{scale['database_mb']} MiB):")
+    for benchmark in ('ingest_add_transaction', 'ingest_milestone_batch'):
+        print(f"  {benchmark}: {results[benchmark]['outputs_per_second']:,.0f} outputs/s")
+    for benchmark in ('reward_calculate', 'reward_cycle', 'dashboard_rebuild_api_metrics', 'dashboard_rebuild_index'):
+        print(f"  {benchmark}: p50 {results[benchmark]['p50_ms']} ms, p95 {results[benchmark]['p95_ms']} ms")
+    for benchmark in ('dashboard_api_metrics', 'dashboard_index'):
+        print(f"  {benchmark}: p50 {results[benchmark]['p50_ms']} ms, p95 {results[benchmark]['p95_ms']} ms, "
+              f"{results[benchmark]['requests_per_second']} req/s")
+    memory = results['memory']
+    print(f"  peak memory: collector {memory['collector_peak_mb']} MiB, dashboard {memory['dashboard_peak_mb']} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the collector and dashboard hot paths on seeded databases.")
+    parser.add_argument("--scale", action="append", choices=sorted(SCALES),
+                        help="seeded scale to benchmark (repeatable; default: small)")
+    parser.add_argument("--transactions", type=int, help="custom scale: seeded transactions")
+    parser.add_argument("--nodes", type=int, help="custom scale: seeded nodes")
+    parser.add_argument("--dir", default=BENCH_DIR, help="directory of the seeded databases")
+    parser.add_argument("--reseed", action="store_true", help="seed the databases again even if they exist")
+    parser.add_argument("--milestones", type=int, default=INGEST_MILESTONES, help="milestones per ingestion benchmark")
+    parser.add_argument("--reward-repeats", type=int, default=REWARD_REPEATS, help="timed reward cycles")
+    parser.add_argument("--repeats", type=int, default=BENCH_REPEATS,
+                        help="runs of each benchmark; results are the medians over the runs")
+    parser.add_argument("--clients", type=int, default=DASHBOARD_CLIENTS, help="concurrent dashboard clients")
+    parser.add_argument("--requests", type=int, default=DASHBOARD_REQUESTS, help="requests per client and endpoint")
+    parser.add_argument("--write-interval", type=float, default=DASHBOARD_WRITE_INTERVAL,
+                        help="seconds between simulated collector writes while the dashboard is measured")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated data")
+    parser.add_argument("--out", default=BENCH_RESULT_FILE, help="JSON result file")
+    parser.add_argument("--baseline", help="earlier result file; exit with status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative change reported as a regression (0.1 = 10%%)")
+    parser.add_argument("--noise-floor", type=float, default=NOISE_FLOOR_MS,
+                        help="smallest latency change in milliseconds that is reported")
+    args = parser.parse_args()
+
+    scales = {label: SCALES[label] for label in args.scale or []}
+    if args.transactions or args.nodes:
+        transactions, nodes = args.transactions or SCALES["small"][0], args.nodes or SCALES["small"][1]
+        scales[f"{transactions}tx_{nodes}n"] = (transactions, nodes)
+    if not scales:
+        scales["small"] = SCALES["small"]
+
+    options = {'dir': args.dir, 'reseed': args.reseed, 'milestones': args.milestones,
+               'reward_repeats': args.reward_repeats, 'repeats': max(1, args.repeats), 'clients': args.clients, 'requests': args.requests,
+               'write_interval': args.write_interval, 'seed': args.seed}
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'options': options,
+        },
+        'scales': {},
+    }
+    for label, (transactions, nodes) in scales.items():
+        report['scales'][label] = run_scale(label, transactions, nodes, options)
+        print_scale(label, report['scales'][label])
+
+    with open(args.out, "w") as out:
+        json.dump(report, out, indent=2)
+    print(f"[BENCH] Wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions, improvements = compare_reports(report, json.load(baseline), args.threshold, args.noise_floor)
+        for label, changes in (("Improved", improvements), ("REGRESSION", regressions)):
+            for name, old, new, change in changes:
+                print(f"[BENCH] {label} {name}: {old} -> {new} ({change:+.1%})")
+        print(f"[BENCH] {len(regressions)} regressions beyond {args.threshold:.0%} "
+              f"(and {args.noise_floor:g} ms for latencies) against {args.baseline}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import requests
+
+# Breaker states, as stored in node_metrics.health_state
+CLOSED = "closed"  # Node is healthy, all calls go through
+OPEN = "open"  # Node is failing, calls are rejected without a request
+HALF_OPEN = "half_open"  # Cool-down elapsed, a single probe call decides
+
+# Default breaker configuration
+FAILURE_THRESHOLD = 3  # Consecutive failed calls that open the breaker
+RESET_TIMEOUT = 30  # Seconds an open breaker waits before allowing a probe
+MAX_RESET_TIMEOUT = 600  # Upper bound for the wait after repeated failed probes
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of sending a request to a node whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open health state machine for one node.
+
+    After failure_threshold consecutive failures the breaker opens and calls
+    fail immediately with CircuitOpenError instead of waiting for a timeout.
+    Once the reset timeout has passed, one probe call is let through: only
+    paths in probe_paths qualify (a cheap node_info request), every other
+    call keeps failing fast. A successful probe closes the breaker; a failed
+    one reopens it and doubles the reset timeout, up to max_reset_timeout.
+
+    on_state_change(node_name, old_state, new_state) is called after every
+    transition, outside the breaker's lock.
+    """
+
+    def __init__(self, node_name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 max_reset_timeout=MAX_RESET_TIMEOUT, probe_paths=None, on_state_change=None):
+        self.node_name = node_name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probe_paths = frozenset(probe_paths) if probe_paths else None
+        self.on_state_change = on_state_change
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._current_timeout = reset_timeout
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def restore(self, state, changed_at):
+        """Resume a persisted state; an open or half-open node is probed after the reset timeout."""
+        with self._lock:
+            if state in (OPEN, HALF_OPEN):
+                self.state = OPEN
+                self.opened_at = changed_at
+                self.failures = self.failure_threshold
+
+    def retry_at(self):
+        """Return when an open breaker lets the next probe through (0 when not open)."""
+        with self._lock:
+            return self.opened_at + self._current_timeout if self.state == OPEN else 0.0
+
+    def _transition(self, new_state):
+        old_state, self.state = self.state, new_state
+        return (old_state, new_state) if old_state != new_state else None
+
+    def _notify(self, change):
+        if change is not None and self.on_state_change is not None:
+            self.on_state_change(self.node_name, *change)
+
+    def allow_request(self, path=None):
+        """Return True if a call may be sent now; a True in half-open state is the probe."""
+        change = None
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN:
+                if time.time() < self.opened_at + self._current_timeout:
+                    self.rejected += 1
+                    return False
+                change = self._transition(HALF_OPEN)
+
+            # Half-open: let exactly one qualifying probe through
+            if self._probing or (self.probe_paths is not None and path not in self.probe_paths):
+                allowed = False
+                self.rejected += 1
+            else:
+                allowed = self._probing = True
+
+        self._notify(change)
+        return allowed
+
+    def record_success(self):
+        """Record a successful call; closes the breaker after a good probe."""
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state == CLOSED:
+                return
+            self._current_timeout = self.reset_timeout
+            change = self._transition(CLOSED)
+        self._notify(change)
+
+    def record_failure(self):
+        """Record a failed call; opens the breaker at the threshold or after a failed probe."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self._current_timeout = min(self.max_reset_timeout, self._current_timeout * 2)
+            elif self.state == OPEN or self.failures < self.failure_threshold:
+                return
+            self._probing = False
+            self.opened_at = time.time()
+            change = self._transition(OPEN)
+        self._notify(change)
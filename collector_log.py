@@ -0,0 +1,79 @@
+import sys
+import threading
+import time
+
+# Log levels, lowest first
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+# Logger defaults
+LOG_LEVEL = "INFO"  # Messages below this level are dropped
+LOG_RATE = 5.0  # Messages per second allowed per tag and key once the burst is used up
+LOG_BURST = 20  # Messages per tag and key that may be written back to back
+
+
+class RateLimitedLogger:
+    """Leveled logger writing "[TAG] message" lines, rate limited per tag.
+
+    The tag defaults to the level name, so log.error("...") prints
+    "[ERROR] ...". Each tag (and optional key, e.g. a node name) has a token
+    bucket of `burst` messages refilled at `rate` per second, so a flood of
+    similar lines costs a few writes per second instead of one per event and
+    one noisy node cannot silence the others. Suppressed messages are
+    counted, reported by the next line that gets through, and passed to
+    on_suppressed(tag, count) for metrics. A rate of None disables limiting.
+    """
+
+    def __init__(self, level=LOG_LEVEL, rate=LOG_RATE, burst=LOG_BURST, stream=None, on_suppressed=None):
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.rate = rate
+        self.burst = burst
+        self.stream = stream
+        self.on_suppressed = on_suppressed
+        self._buckets = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def set_level(self, level):
+        self.level = LEVELS[level] if isinstance(level, str) else level
+
+    def enabled(self, level):
+        """Return True if messages of a level would be written."""
+        return LEVELS[level] >= self.level
+
+    def _allow(self, bucket):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(bucket, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[bucket] = (tokens, now)
+                self._suppressed[bucket] = self._suppressed.get(bucket, 0) + 1
+                return False, 0
+            self._buckets[bucket] = (tokens - 1, now)
+            return True, self._suppressed.pop(bucket, 0)
+
+    def log(self, level, message, tag=None, key=None):
+        if LEVELS[level] < self.level:
+            return
+        tag = tag or level
+        if self.rate is not None:
+            allowed, suppressed = self._allow((tag, key))
+            if not allowed:
+                if self.on_suppressed is not None:
+                    self.on_suppressed(tag, 1)
+                return
+            if suppressed:
+                message = f"{message} ({suppressed} similar messages suppressed)"
+        print(f"[{tag}] {message}", file=self.stream or sys.stdout)
+
+    def debug(self, message, tag=None, key=None):
+        self.log("DEBUG", message, tag, key)
+
+    def info(self, message, tag=None, key=None):
+        self.log("INFO", message, tag, key)
+
+    def warning(self, message, tag=None, key=None):
+        self.log("WARNING", message, tag, key)
+
+    def error(self, message, tag=None, key=None):
+        self.log("ERROR", message, tag, key)
@@ -0,0 +1,190 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# Default client configuration
+CONNECT_TIMEOUT = 3  # Timeout for establishing a connection (in seconds)
+READ_TIMEOUT = 10  # Timeout for reading a response (in seconds)
+RETRY_TOTAL = 2  # Retries for failed connections and transient server errors
+RETRY_BACKOFF_FACTOR = 0.2  # Backoff between retries: factor * 2^(retry - 1) seconds
+RETRY_STATUS_CODES = (429, 502, 503, 504)  # Status codes worth retrying
+POOL_MAXSIZE = 4  # Keep-alive connections kept open per node
+
+
+class NodeClient:
+    """HTTP client for a single HORNET node.
+
+    The client owns a requests session, so connections are pooled and kept
+    alive between polls and the default headers are set only once. Every
+    request goes through the same retry and timeout policy: connection
+    errors and 429/502/503/504 answers are retried, read timeouts are not.
+
+    With a circuit breaker, requests to a node that keeps failing raise
+    CircuitOpenError at once instead of waiting for their timeouts.
+    Connection errors, timeouts and 5xx responses count as failures.
+
+    Every response carries its round-trip time in response.latency_ms,
+    measured with perf_counter, and is recorded in latency_recorder under
+    the request's endpoint name (the path if none is given).
+
+    Failed calls are reported to on_request_error(node_name, endpoint,
+    reason), where reason is "circuit_open", the exception class name or
+    "http_<status>" for 4xx/5xx responses.
+
+    Every request that reached the node, answered or not, is passed to
+    on_response(node_name, node_url, method, path, endpoint, response,
+    latency_ms, error), e.g. to capture the traffic for replay. A transport
+    adapter given as adapter replaces the retrying HTTP adapter; responses
+    it returns with a latency_ms attribute keep that latency.
+    """
+
+    def __init__(self, node_name, node_url, headers=None,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 retries=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR,
+                 pool_maxsize=POOL_MAXSIZE, breaker=None, latency_recorder=None, on_request_error=None,
+                 on_response=None, adapter=None):
+        self.node_name = node_name
+        self.node_url = node_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.breaker = breaker
+        self.latency_recorder = latency_recorder
+        self.on_request_error = on_request_error
+        self.on_response = on_response
+
+        if adapter is None:
+            # Reads are never retried: a stalled node would get the whole
+            # read timeout again per retry, past the caller's time budget
+            retry = Retry(
+                total=retries,
+                read=0,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=frozenset(["GET", "POST"]),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=pool_maxsize)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def _timeout(self, timeout=None):
+        """Build the (connect, read) timeout pair, optionally capped by a call budget."""
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        return (min(self.connect_timeout, timeout), min(self.read_timeout, timeout))
+
+    def _report_error(self, endpoint, reason):
+        if self.on_request_error is not None:
+            self.on_request_error(self.node_name, endpoint, reason)
+
+    def _report_response(self, method, path, endpoint, response, latency_ms, error=None):
+        if self.on_response is not None:
+            self.on_response(self.node_name, self.node_url, method, path, endpoint, response, latency_ms, error)
+
+    def request(self, method, path, timeout=None, endpoint=None, **kwargs):
+        """Send a request for an API path on this node through the circuit breaker."""
+        endpoint = endpoint or path
+        if self.breaker is not None and not self.breaker.allow_request(path):
+            self._report_error(endpoint, "circuit_open")
+            raise CircuitOpenError(f"Circuit open for {self.node_name}, request to {path} not sent")
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.node_url}{path}", timeout=self._timeout(timeout), **kwargs)
+        except requests.exceptions.RequestException as e:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            self._report_error(endpoint, type(e).__name__)
+            self._report_response(method, path, endpoint, None, (time.perf_counter() - start) * 1000, e)
+            raise
+        except BaseException:
+            # Any other error still settles the call, or a half-open probe would never finish
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        # Settle the breaker before the reporting hooks, which may raise themselves
+        if self.breaker is not None:
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+        if getattr(response, "latency_ms", None) is None:
+            response.latency_ms = (time.perf_counter() - start) * 1000
+        self._report_response(method, path, endpoint, response, response.latency_ms)
+
+        if self.latency_recorder is not None:
+            self.latency_recorder.observe(self.node_name, endpoint, response.latency_ms)
+        if response.status_code >= 400:
+            self._report_error(endpoint, f"http_{response.status_code}")
+        return response
+
+    def get(self, path, timeout=None, endpoint=None, **kwargs):
+        """Send a GET request for an API path on this node."""
+        return self.request("GET", path, timeout=timeout, endpoint=endpoint, **kwargs)
+
+    def post(self, path, timeout=None, endpoint=None, **kwargs):
+        """Send a POST request for an API path on this node."""
+        return self.request("POST", path, timeout=timeout, endpoint=endpoint, **kwargs)
+
+    def close(self):
+        """Close the pooled connections of this client."""
+        self.session.close()
+
+
+class ClientRegistry:
+    """Thread-safe registry holding one NodeClient per node.
+
+    When breaker_options is given, every node gets a CircuitBreaker built
+    from them; it outlives its client, so a client recreated for a changed
+    URL keeps the node's health state.
+    """
+
+    def __init__(self, headers=None, breaker_options=None, **client_options):
+        self.headers = headers
+        self.breaker_options = breaker_options
+        self.client_options = client_options
+        self._clients = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, node_name):
+        if self.breaker_options is None:
+            return None
+        breaker = self._breakers.get(node_name)
+        if breaker is None:
+            breaker = self._breakers[node_name] = CircuitBreaker(node_name, **self.breaker_options)
+        return breaker
+
+    def breaker(self, node_name):
+        """Return the circuit breaker of a node (None without breaker_options)."""
+        with self._lock:
+            return self._breaker(node_name)
+
+    def get(self, node_name, node_url):
+        """Return the client for a node, creating it on first use."""
+        with self._lock:
+            client = self._clients.get(node_name)
+            if client is None or client.node_url != node_url.rstrip("/"):
+                if client is not None:
+                    client.close()
+                client = NodeClient(node_name, node_url, headers=self.headers,
+                                    breaker=self._breaker(node_name), **self.client_options)
+                self._clients[node_name] = client
+            return client
+
+    def close_all(self):
+        """Close every client in the registry."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
@@ -0,0 +1,190 @@
+import json
+import math
+import threading
+
+from metrics_registry import render_histogram_samples
+
+# Bucket layout, shared by the collector and the dashboard
+MIN_LATENCY_MS = 0.5  # Upper bound of the first bucket
+BUCKET_GROWTH = 2 ** 0.25  # Each bucket is ~19% wider than the previous one
+MAX_LATENCY_MS = 60000  # Latencies above this land in the overflow bucket
+BUCKET_COUNT = math.ceil(math.log(MAX_LATENCY_MS / MIN_LATENCY_MS, BUCKET_GROWTH)) + 2
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_index(latency_ms):
+    """Return the bucket a latency falls into."""
+    if latency_ms <= MIN_LATENCY_MS:
+        return 0
+    index = math.ceil(math.log(latency_ms / MIN_LATENCY_MS, BUCKET_GROWTH))
+    return min(index, BUCKET_COUNT - 1)
+
+
+def bucket_upper_bound(index):
+    """Return the upper bound of a bucket in milliseconds (inf for the overflow bucket)."""
+    if index >= BUCKET_COUNT - 1:
+        return math.inf
+    return MIN_LATENCY_MS * BUCKET_GROWTH ** index
+
+
+class LatencyHistogram:
+    """Latency distribution in fixed log-scaled buckets.
+
+    Bucket bounds grow geometrically, so every latency is stored with the
+    same ~19% relative resolution from sub-millisecond to a minute, in
+    constant memory. Histograms with the same layout can be merged and
+    subtracted, which gives the distribution of any window between two
+    snapshots.
+    """
+
+    __slots__ = ("counts", "count", "sum_ms")
+
+    def __init__(self, counts=None, count=0, sum_ms=0.0):
+        self.counts = list(counts) if counts is not None else [0] * BUCKET_COUNT
+        self.count = count
+        self.sum_ms = sum_ms
+
+    def record(self, latency_ms):
+        self.counts[bucket_index(latency_ms)] += 1
+        self.count += 1
+        self.sum_ms += latency_ms
+
+    def copy(self):
+        return LatencyHistogram(self.counts, self.count, self.sum_ms)
+
+    def merge(self, other):
+        """Add the samples of another histogram to this one."""
+        for index, value in enumerate(other.counts):
+            self.counts[index] += value
+        self.count += other.count
+        self.sum_ms += other.sum_ms
+
+    def since(self, earlier):
+        """Return the histogram of the samples recorded after the snapshot `earlier`."""
+        if earlier is None:
+            return self.copy()
+        return LatencyHistogram([now - then for now, then in zip(self.counts, earlier.counts)],
+                                self.count - earlier.count, self.sum_ms - earlier.sum_ms)
+
+    def percentile(self, percent):
+        """Estimate a percentile by interpolating inside its bucket; None when empty."""
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for index, value in enumerate(self.counts):
+            if not value or seen + value < rank:
+                seen += value
+                continue
+            lower = bucket_upper_bound(index - 1) if index else 0.0
+            upper = bucket_upper_bound(index)
+            if math.isinf(upper):
+                return lower
+            return lower + (upper - lower) * (rank - seen) / value
+        return None
+
+    def mean(self):
+        return self.sum_ms / self.count if self.count else None
+
+    def summary(self, percentiles=PERCENTILES):
+        """Return count, mean and the requested percentiles as a dict."""
+        result = {'count': self.count, 'mean_ms': self.mean()}
+        for percent in percentiles:
+            result[f'p{percent}'] = self.percentile(percent)
+        return result
+
+    def cumulative_buckets(self):
+        """Return (upper_bound_ms, cumulative_count) pairs for the non-empty range."""
+        buckets = []
+        total = 0
+        last = max((index for index, value in enumerate(self.counts) if value), default=-1)
+        for index in range(last + 1):
+            total += self.counts[index]
+            buckets.append((bucket_upper_bound(index), total))
+        return buckets
+
+    def to_json(self):
+        """Serialize the non-empty buckets as {index: count}."""
+        return json.dumps({index: value for index, value in enumerate(self.counts) if value})
+
+    @classmethod
+    def from_json(cls, text, count=0, sum_ms=0.0):
+        histogram = cls(count=count, sum_ms=sum_ms)
+        for index, value in json.loads(text or "{}").items():
+            histogram.counts[min(int(index), BUCKET_COUNT - 1)] += value
+        return histogram
+
+
+def prometheus_lines(name, documentation, histograms):
+    """Render {(node_name, endpoint): LatencyHistogram} as one Prometheus histogram in seconds."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} histogram"]
+    for (node_name, endpoint), histogram in sorted(histograms.items()):
+        buckets = [(upper / 1000, total) for upper, total in histogram.cumulative_buckets()]
+        lines.extend(render_histogram_samples(name, {'node': node_name, 'endpoint': endpoint},
+                                              buckets, histogram.sum_ms / 1000, histogram.count))
+    return lines
+
+
+class LatencyRecorder:
+    """Thread-safe set of latency histograms keyed by (node_name, endpoint).
+
+    Histograms are cumulative. start_window() takes a snapshot, and
+    window() returns what was recorded since, e.g. during one reward cycle.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._window_start = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def observe(self, node_name, endpoint, latency_ms):
+        key = (node_name, endpoint)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.record(latency_ms)
+            self._dirty.add(key)
+
+    def load(self, rows):
+        """Load persisted (node_name, endpoint, counts_json, count, sum_ms) rows."""
+        with self._lock:
+            for node_name, endpoint, counts, count, sum_ms in rows:
+                self._histograms[(node_name, endpoint)] = LatencyHistogram.from_json(counts, count, sum_ms)
+
+    def snapshot(self):
+        """Return a copy of every histogram."""
+        with self._lock:
+            return {key: histogram.copy() for key, histogram in self._histograms.items()}
+
+    def take_dirty(self):
+        """Return copies of the histograms changed since the last call."""
+        with self._lock:
+            dirty = {key: self._histograms[key].copy() for key in self._dirty}
+            self._dirty.clear()
+            return dirty
+
+    def mark_dirty(self, keys):
+        with self._lock:
+            self._dirty.update(keys)
+
+    def start_window(self):
+        """Start a new measurement window at the current state."""
+        with self._lock:
+            self._window_start = {key: histogram.copy() for key, histogram in self._histograms.items()}
+
+    def window(self, endpoint=None):
+        """Return per-node histograms of the current window, merged over endpoints
+        unless one endpoint is selected."""
+        with self._lock:
+            merged = {}
+            for (node_name, key_endpoint), histogram in self._histograms.items():
+                if endpoint is not None and key_endpoint != endpoint:
+                    continue
+                recent = histogram.since(self._window_start.get((node_name, key_endpoint)))
+                if node_name in merged:
+                    merged[node_name].merge(recent)
+                else:
+                    merged[node_name] = recent
+            return merged
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from storage import bump_data_version, transaction
+
+LATENCY_SMOOTHING = 0.2  # Weight of a new latency sample in the moving average (80% old, 20% new)
+
+
+class NodeMetrics:
+    """Live performance metrics of one node, as stored in node_metrics."""
+
+    __slots__ = ("last_seen", "uptime_seconds", "avg_latency", "latest_milestone", "dirty")
+
+    def __init__(self, last_seen, uptime_seconds, avg_latency, latest_milestone):
+        self.last_seen = last_seen
+        self.uptime_seconds = uptime_seconds
+        self.avg_latency = avg_latency
+        self.latest_milestone = latest_milestone
+        self.dirty = False
+
+
+class NodeMetricsAggregator:
+    """In-memory, write-behind copy of the node_metrics table.
+
+    Polls update the metrics here, under a lock, without touching the
+    database; flush() writes every node that changed since the last flush
+    in one transaction. Only nodes loaded from the table are tracked, so an
+    update for a node without a row is ignored, as it was with direct
+    UPDATE statements.
+    """
+
+    def __init__(self, latency_smoothing=LATENCY_SMOOTHING):
+        self.latency_smoothing = latency_smoothing
+        self._nodes = {}
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.rows_flushed = 0
+
+    def load(self, rows):
+        """Load (node_name, last_seen, uptime_seconds, avg_latency, latest_milestone) rows."""
+        with self._lock:
+            for node_name, last_seen, uptime_seconds, avg_latency, latest_milestone in rows:
+                self._nodes[node_name] = NodeMetrics(last_seen, uptime_seconds, avg_latency, latest_milestone)
+
+    def update(self, node_name, latency=None, milestone_index=None, now=None):
+        """Record a poll of a node: uptime since the last poll, a latency sample and its milestone."""
+        current_time = int(time.time()) if now is None else int(now)
+
+        with self._lock:
+            metrics = self._nodes.get(node_name)
+            if metrics is None:
+                return
+
+            # Calculate uptime (time since last check)
+            metrics.uptime_seconds += current_time - metrics.last_seen
+            metrics.last_seen = current_time
+
+            if latency is not None:
+                if metrics.avg_latency > 0:
+                    metrics.avg_latency = (metrics.avg_latency * (1 - self.latency_smoothing)
+                                           + latency * self.latency_smoothing)
+                else:
+                    metrics.avg_latency = latency
+
+            if milestone_index is not None:
+                metrics.latest_milestone = milestone_index
+
+            metrics.dirty = True
+
+    def get(self, node_name):
+        """Return (uptime_seconds, avg_latency, latest_milestone) of a node, or None."""
+        with self._lock:
+            metrics = self._nodes.get(node_name)
+            if metrics is None:
+                return None
+            return metrics.uptime_seconds, metrics.avg_latency, metrics.latest_milestone
+
+    def snapshot(self):
+        """Return (uptime_seconds, avg_latency, latest_milestone) for every tracked node."""
+        with self._lock:
+            return {node_name: (metrics.uptime_seconds, metrics.avg_latency, metrics.latest_milestone)
+                    for node_name, metrics in self._nodes.items()}
+
+    def flush(self):
+        """Write the nodes changed since the last flush in one transaction.
+
+        Returns the number of rows written. If the write fails, the nodes
+        stay dirty and are written by the next flush.
+        """
+        with self._lock:
+            rows = [(metrics.last_seen, metrics.uptime_seconds, metrics.avg_latency,
+                     metrics.latest_milestone, node_name)
+                    for node_name, metrics in self._nodes.items() if metrics.dirty]
+            for metrics in self._nodes.values():
+                metrics.dirty = False
+
+        if not rows:
+            return 0
+
+        try:
+            with transaction() as conn:
+                conn.executemany("""
+                    UPDATE node_metrics
+                    SET last_seen = ?, uptime_seconds = ?, avg_latency = ?, latest_milestone = ?
+                    WHERE node_name = ?
+                """, rows)
+                bump_data_version(conn)
+        except Exception:
+            with self._lock:
+                for row in rows:
+                    metrics = self._nodes.get(row[-1])
+                    if metrics is not None:
+                        metrics.dirty = True
+            raise
+
+        self.flushes += 1
+        self.rows_flushed += len(rows)
+        return len(rows)
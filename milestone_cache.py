@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+
+class MilestoneCache:
+    """Bounded LRU cache for milestone payloads shared by all node pollers.
+
+    All nodes confirm the same milestones, so the first poller asking for a
+    milestone downloads it and every other poller reuses the result. Pollers
+    asking while the download is still running wait for it instead of
+    starting their own. Failed fetches (a None result) are not cached.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, milestone_index, fetch, timeout=None):
+        """Return the cached payload for a milestone, calling fetch() on a miss.
+
+        If another thread is already fetching the milestone, wait up to timeout
+        seconds for it; when that fetch fails or times out, fetch() is called
+        here instead.
+        """
+        with self._lock:
+            if milestone_index in self._entries:
+                self._entries.move_to_end(milestone_index)
+                self.hits += 1
+                return self._entries[milestone_index]
+
+            pending = self._inflight.get(milestone_index)
+            if pending is None:
+                pending = self._inflight[milestone_index] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            pending.wait(timeout)
+            with self._lock:
+                if milestone_index in self._entries:
+                    self._entries.move_to_end(milestone_index)
+                    self.hits += 1
+                    return self._entries[milestone_index]
+                self.misses += 1
+            result = fetch()
+            if result is not None:
+                self.put(milestone_index, result)
+            return result
+
+        try:
+            with self._lock:
+                self.misses += 1
+            result = fetch()
+            if result is not None:
+                self.put(milestone_index, result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(milestone_index, None)
+            pending.set()
+
+    def put(self, milestone_index, payload):
+        """Store a payload, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[milestone_index] = payload
+            self._entries.move_to_end(milestone_index)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached payloads."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
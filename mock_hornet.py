@@ -0,0 +1,731 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default mock node configuration
+MOCK_HOST = "127.0.0.1"  # Interface the mock nodes listen on
+MOCK_BASE_PORT = 14265  # Port of the first mock node; node i listens on MOCK_BASE_PORT + i
+MILESTONE_INTERVAL = 5.0  # Time between two milestones of the mock network (in seconds)
+FIRST_MILESTONE = 1  # Index of the milestone confirmed when the mock network starts
+OUTPUTS_PER_MILESTONE = 20  # Average number of output IDs per milestone (created plus consumed)
+OUTPUTS_SPREAD = 0.25  # Standard deviation of the outputs per milestone, relative to the average
+TIPS_COUNT = 8  # Block IDs returned by the tips endpoint
+STALL_SECONDS = 15  # How long a stalled request hangs, longer than the collector's read timeout
+SIMULATION_DB_NAME = "simulation.db"  # Database written by simulate_collector()
+MQTT_CHECK_DB_NAME = "mqtt_check.db"  # Scratch database of check_milestone_announcements(), recreated by every check
+MOCK_MQTT_BASE_PORT = 11883  # Broker port of the first node when the fleet runs MQTT; node i uses MOCK_MQTT_BASE_PORT + i
+ANNOUNCE_CHECK_INTERVAL = 0.05  # How often a node with a broker checks for a new milestone to announce (in seconds)
+ANNOUNCEMENT_TIMEOUT = 10  # How long check_milestone_announcements() waits for subscriptions and ingestion (in seconds)
+
+# API paths served by the mock nodes, as listed in rwd.API_ENDPOINTS
+INFO_PATH = "/api/core/v2/info"
+UTXO_CHANGES_PREFIX = "/api/core/v2/milestones/by-index/"
+TIPS_PATH = "/api/core/v2/tips"
+BLOCKS_PATH = "/api/core/v2/blocks"
+MILESTONE_TOPIC = "milestone-info/confirmed"  # As in mqtt_feed.MILESTONE_TOPIC
+
+# MQTT 3.1.1 control packet types handled by MockMqttBroker
+MQTT_CONNECT, MQTT_CONNACK, MQTT_PUBLISH = 1, 2, 3
+MQTT_SUBSCRIBE, MQTT_SUBACK, MQTT_UNSUBSCRIBE, MQTT_UNSUBACK = 8, 9, 10, 11
+MQTT_PINGREQ, MQTT_PINGRESP, MQTT_DISCONNECT = 12, 13, 14
+
+
+class LatencyDistribution:
+    """Response delay of a mock node in milliseconds.
+
+    Supported kinds and their parameters:
+    constant(ms), uniform(low_ms, high_ms), exponential(mean_ms) and
+    lognormal(median_ms, sigma). parse("lognormal:20:0.5") reads the
+    "kind:param:..." form used on the command line.
+    """
+
+    KINDS = {"constant": 1, "uniform": 2, "exponential": 1, "lognormal": 2}
+
+    def __init__(self, kind="constant", *params):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind}, expected one of {sorted(self.KINDS)}")
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(f"Latency distribution {kind} takes {self.KINDS[kind]} parameters, got {len(params)}")
+        self.kind = kind
+        self.params = tuple(float(param) for param in params)
+
+    @classmethod
+    def parse(cls, text):
+        kind, *params = text.split(":")
+        return cls(kind, *params)
+
+    def sample(self, rng):
+        """Draw one delay in milliseconds from the random generator rng."""
+        if self.kind == "constant":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        median_ms, sigma = self.params
+        return rng.lognormvariate(math.log(median_ms), sigma) if median_ms > 0 else 0.0
+
+    def __repr__(self):
+        return ":".join([self.kind] + [f"{param:g}" for param in self.params])
+
+
+class NodeProfile:
+    """Behaviour of one mock node: response latency, sync lag and injected failures.
+
+    Failure rates are probabilities per request: error_rate answers 500,
+    drop_rate closes the connection without a response and stall_rate
+    hangs for stall_seconds before answering. During an outage, given as
+    (start, end) seconds since the network started, every request gets 503.
+    """
+
+    def __init__(self, latency=None, milestone_lag=0, error_rate=0.0, drop_rate=0.0, stall_rate=0.0,
+                 stall_seconds=STALL_SECONDS, outages=()):
+        self.latency = latency or LatencyDistribution("constant", 0)
+        self.milestone_lag = milestone_lag
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.outages = tuple(outages)
+
+    def in_outage(self, elapsed):
+        return any(start <= elapsed < end for start, end in self.outages)
+
+
+class MockNetwork:
+    """Milestone sequence shared by all mock nodes.
+
+    The latest milestone follows the clock: one every milestone_interval
+    seconds after start_time. A milestone's payload depends only on the seed
+    and its index, so every node (and every run with the same seed) returns
+    the same output IDs for it, as the nodes of a real network do.
+    """
+
+    def __init__(self, milestone_interval=MILESTONE_INTERVAL, outputs_per_milestone=OUTPUTS_PER_MILESTONE,
+                 outputs_spread=OUTPUTS_SPREAD, first_milestone=FIRST_MILESTONE, seed=0,
+                 start_time=None, clock=time.time):
+        self.milestone_interval = milestone_interval
+        self.outputs_per_milestone = outputs_per_milestone
+        self.outputs_spread = outputs_spread
+        self.first_milestone = first_milestone
+        self.seed = seed
+        self.clock = clock
+        self.start_time = clock() if start_time is None else start_time
+
+    def elapsed(self):
+        return self.clock() - self.start_time
+
+    def latest_milestone(self):
+        return self.first_milestone + max(0, int(self.elapsed() // self.milestone_interval))
+
+    def milestone_timestamp(self, milestone_index):
+        return int(self.start_time + (milestone_index - self.first_milestone) * self.milestone_interval)
+
+    def _digest(self, *parts):
+        return hashlib.blake2b(":".join(str(part) for part in (self.seed,) + parts).encode(), digest_size=32).hexdigest()
+
+    def output_count(self, milestone_index):
+        rng = random.Random(self._digest("count", milestone_index))
+        spread = self.outputs_per_milestone * self.outputs_spread
+        return max(0, round(rng.gauss(self.outputs_per_milestone, spread))) if spread else self.outputs_per_milestone
+
+    def utxo_changes(self, milestone_index):
+        """Return the created and consumed output IDs (34-byte hex, as HORNET reports them) of a milestone."""
+        count = self.output_count(milestone_index)
+        outputs = [f"0x{self._digest('tx', milestone_index, k)}{k % 2:04x}" for k in range(count)]
+        created = outputs[:(count + 1) // 2]
+        consumed = outputs[(count + 1) // 2:]
+        return created, consumed
+
+    def block_id(self, *parts):
+        return f"0x{self._digest('block', *parts)}"
+
+
+class MockMqttBroker:
+    """Minimal MQTT 3.1.1 broker over plain TCP, standing in for a node's milestone feed.
+
+    Supports what MilestoneSubscriber needs: connect, subscribe and
+    unsubscribe to exact topics, QoS 0 publishing and keep-alive pings.
+    Messages are only delivered to clients subscribed at the time of publish().
+    """
+
+    def __init__(self, name, port=0, host=MOCK_HOST):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.published = 0
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f"mqtt://{self.host}:{self.port}"
+
+    @staticmethod
+    def _packet(packet_type, flags, body):
+        length = len(body)
+        header = bytearray([packet_type << 4 | flags])
+        while True:
+            length, digit = divmod(length, 128)
+            header.append(digit | (128 if length else 0))
+            if not length:
+                return bytes(header) + body
+
+    @staticmethod
+    def _read_packet(rfile):
+        """Return (packet_type, body) of the next packet, or None once the client is gone."""
+        first = rfile.read(1)
+        if not first:
+            return None
+        length, shift = 0, 0
+        while True:
+            digit = rfile.read(1)
+            if not digit:
+                return None
+            length |= (digit[0] & 127) << shift
+            shift += 7
+            if not digit[0] & 128:
+                break
+        body = rfile.read(length)
+        return (first[0] >> 4, body) if len(body) == length else None
+
+    @staticmethod
+    def _topics(body, with_qos):
+        """Parse the packet identifier and topic filters of a (un)subscribe packet."""
+        packet_id, offset, topics = body[:2], 2, []
+        while offset < len(body):
+            (size,) = struct.unpack_from("!H", body, offset)
+            topics.append(body[offset + 2:offset + 2 + size].decode("utf-8"))
+            offset += 2 + size + (1 if with_qos else 0)
+        return packet_id, topics
+
+    def _handler(self):
+        broker = self
+
+        class MqttHandler(socketserver.StreamRequestHandler):
+            def setup(self):
+                super().setup()
+                self.send_lock = threading.Lock()
+
+            def send(self, data):
+                with self.send_lock:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+
+            def handle(self):
+                try:
+                    while True:
+                        packet = broker._read_packet(self.rfile)
+                        if packet is None:
+                            return
+                        packet_type, body = packet
+                        if packet_type == MQTT_CONNECT:
+                            self.send(broker._packet(MQTT_CONNACK, 0, b"\x00\x00"))
+                        elif packet_type == MQTT_SUBSCRIBE:
+                            packet_id, topics = broker._topics(body, with_qos=True)
+                            with broker._lock:
+                                for topic in topics:
+                                    broker._subscriptions.setdefault(topic, set()).add(self)
+                            self.send(broker._packet(MQTT_SUBACK, 0, packet_id + b"\x00" * len(topics)))
+                        elif packet_type == MQTT_UNSUBSCRIBE:
+                            packet_id, topics = broker._topics(body, with_qos=False)
+                            with broker._lock:
+                                for topic in topics:
+                                    broker._subscriptions.get(topic, set()).discard(self)
+                            self.send(broker._packet(MQTT_UNSUBACK, 0, packet_id))
+                        elif packet_type == MQTT_PINGREQ:
+                            self.send(broker._packet(MQTT_PINGRESP, 0, b""))
+                        elif packet_type == MQTT_DISCONNECT:
+                            return
+                except OSError:
+                    pass
+                finally:
+                    with broker._lock:
+                        for handlers in broker._subscriptions.values():
+                            handlers.discard(self)
+
+        return MqttHandler
+
+    def subscribers(self, topic):
+        """Return the number of clients subscribed to topic."""
+        with self._lock:
+            return len(self._subscriptions.get(topic, ()))
+
+    def publish(self, topic, payload):
+        """Send a QoS 0 message to every client subscribed to topic; returns the number of recipients."""
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        encoded = topic.encode("utf-8")
+        packet = self._packet(MQTT_PUBLISH, 0, struct.pack("!H", len(encoded)) + encoded + data)
+        with self._lock:
+            handlers = list(self._subscriptions.get(topic, ()))
+            self.published += 1
+        delivered = 0
+        for handler in handlers:
+            try:
+                handler.send(packet)
+                delivered += 1
+            except OSError:
+                pass
+        return delivered
+
+    def start(self):
+        """Start serving from a daemon thread; port 0 picks a free port."""
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name=f"mock-mqtt-{self.name}", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class MockHornetNode:
+    """HTTP server answering the HORNET API calls the collector makes.
+
+    Serves info, milestone UTXO changes, tips and blocks for a MockNetwork,
+    with the latency and failures of its NodeProfile. Requests and injected
+    failures are counted per endpoint and kind. With an mqtt_port, the node
+    also runs a MockMqttBroker and announces every milestone it confirms on
+    MILESTONE_TOPIC, like HORNET's MQTT plugin.
+    """
+
+    def __init__(self, name, network, profile=None, port=MOCK_BASE_PORT, host=MOCK_HOST, seed=0, mqtt_port=None):
+        self.name = name
+        self.network = network
+        self.profile = profile or NodeProfile()
+        self.host = host
+        self.port = port
+        self.requests = {}
+        self.injected = {}
+        self._rng = random.Random(f"{seed}:{name}")
+        self._lock = threading.Lock()
+        self._server = None
+        self.broker = MockMqttBroker(name, mqtt_port, host) if mqtt_port is not None else None
+        self._stop_announcing = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def mqtt_url(self):
+        return self.broker.url if self.broker is not None else None
+
+    def _count(self, table, key):
+        with self._lock:
+            table[key] = table.get(key, 0) + 1
+
+    def _draw(self):
+        """Return the failure to inject into a request (or None) and its delay in seconds."""
+        with self._lock:
+            roll = self._rng.random()
+            delay = self.profile.latency.sample(self._rng) / 1000
+
+        profile = self.profile
+        if profile.in_outage(self.network.elapsed()):
+            return "outage", delay
+        for kind, rate in (("error", profile.error_rate), ("drop", profile.drop_rate), ("stall", profile.stall_rate)):
+            if roll < rate:
+                return kind, delay + (profile.stall_seconds if kind == "stall" else 0)
+            roll -= rate
+        return None, delay
+
+    def latest_milestone(self):
+        return max(self.network.first_milestone, self.network.latest_milestone() - self.profile.milestone_lag)
+
+    def milestone_info(self, milestone_index):
+        return {"index": milestone_index, "timestamp": self.network.milestone_timestamp(milestone_index),
+                "milestoneId": self.network.block_id("milestone", milestone_index)}
+
+    def announce(self, milestone_index):
+        """Publish a confirmed milestone on the node's broker; returns the number of recipients."""
+        return self.broker.publish(MILESTONE_TOPIC, self.milestone_info(milestone_index))
+
+    def _announce_loop(self):
+        announced = None
+        while not self._stop_announcing.wait(ANNOUNCE_CHECK_INTERVAL):
+            latest = self.latest_milestone()
+            if latest != announced:
+                self.announce(latest)
+                announced = latest
+
+    def info(self):
+        milestone = self.milestone_info(self.latest_milestone())
+        return {
+            "name": "HORNET",
+            "version": "2.0.0-mock",
+            "status": {
+                "isHealthy": True,
+                "latestMilestone": milestone,
+                "confirmedMilestone": milestone,
+                "pruningIndex": 0,
+            },
+            "protocol": {
+                "version": 2,
+                "networkName": "mock",
+                "bech32Hrp": "mck",
+                "baseToken": {"name": "MockToken", "tickerSymbol": "MCK", "unit": "MCK", "decimals": 6},
+            },
+        }
+
+    def handle(self, method, path, body):
+        """Return (status, payload, endpoint) for an API request."""
+        if method == "GET" and path == INFO_PATH:
+            return 200, self.info(), "node_info"
+
+        if method == "GET" and path.startswith(UTXO_CHANGES_PREFIX) and path.endswith("/utxo-changes"):
+            try:
+                milestone_index = int(path[len(UTXO_CHANGES_PREFIX):-len("/utxo-changes")])
+            except ValueError:
+                return 400, {"error": {"code": "400", "message": "invalid milestone index"}}, "milestone_utxo_changes"
+            if milestone_index > self.latest_milestone() or milestone_index < self.network.first_milestone:
+                return 404, {"error": {"code": "404", "message": "milestone not found"}}, "milestone_utxo_changes"
+            created, consumed = self.network.utxo_changes(milestone_index)
+            return 200, {"index": milestone_index, "createdOutputs": created,
+                         "consumedOutputs": consumed}, "milestone_utxo_changes"
+
+        if method == "GET" and path == TIPS_PATH:
+            latest = self.latest_milestone()
+            return 200, {"tips": [self.network.block_id("tip", latest, k) for k in range(TIPS_COUNT)]}, "tips"
+
+        if method == "POST" and path == BLOCKS_PATH:
+            block_ids = (body or {}).get("blockIds", [])
+            return 200, {"blocks": [{"blockId": block_id, "protocolVersion": 2, "payload": None}
+                                    for block_id in block_ids]}, "blocks"
+
+        return 404, {"error": {"code": "404", "message": f"{method} {path} not found"}}, "unknown"
+
+    def _handler(self):
+        node = self
+
+        class MockHornetHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like a real node
+
+            def _serve(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+
+                path = self.path.split("?", 1)[0]
+                failure, delay = node._draw()
+                if delay:
+                    time.sleep(delay)
+                status, payload, endpoint = node.handle(method, path, body)
+                node._count(node.requests, endpoint)
+
+                if failure is not None:
+                    node._count(node.injected, failure)
+                    if failure == "drop":
+                        self.close_connection = True
+                        return
+                    if failure == "error":
+                        status, payload = 500, {"error": {"code": "500", "message": "injected failure"}}
+                    elif failure == "outage":
+                        status, payload = 503, {"error": {"code": "503", "message": "node unavailable"}}
+
+                data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, format, *args):
+                pass  # Every poll would print a line
+
+        return MockHornetHandler
+
+    def start(self):
+        """Start serving from a daemon thread."""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name=f"mock-{self.name}", daemon=True).start()
+        if self.broker is not None:
+            self.broker.start()
+            self._stop_announcing.clear()
+            threading.Thread(target=self._announce_loop, name=f"mock-announce-{self.name}", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.broker is not None:
+            self._stop_announcing.set()
+            self.broker.stop()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self):
+        with self._lock:
+            stats = {'requests': dict(self.requests), 'injected': dict(self.injected)}
+        if self.broker is not None:
+            stats['announced'] = self.broker.published
+        return stats
+
+
+class MockFleet:
+    """N mock nodes on consecutive ports, sharing one MockNetwork.
+
+    profiles is a single NodeProfile for every node or a list with one per
+    node. With mqtt_base_port, every node also runs a milestone broker on
+    consecutive ports from there (0 picks free ports). Use as a context
+    manager, or call start() and stop().
+    """
+
+    def __init__(self, count, network=None, profiles=None, base_port=MOCK_BASE_PORT, host=MOCK_HOST,
+                 seed=0, name_prefix="Mock", mqtt_base_port=None):
+        self.network = network or MockNetwork(seed=seed)
+        if profiles is None or isinstance(profiles, NodeProfile):
+            profiles = [profiles] * count
+        if len(profiles) != count:
+            raise ValueError(f"Expected {count} node profiles, got {len(profiles)}")
+        self.nodes = [MockHornetNode(f"{name_prefix}-{i + 1}", self.network, profile, base_port + i, host, seed,
+                                     mqtt_port=None if mqtt_base_port is None else mqtt_base_port and mqtt_base_port + i)
+                      for i, profile in enumerate(profiles)]
+
+    def urls(self):
+        """Return {node_name: url}, in the form of rwd.NODES."""
+        return {node.name: node.url for node in self.nodes}
+
+    def mqtt_urls(self):
+        """Return {node_name: broker_url} of the nodes running a broker, in the form of rwd.MQTT_BROKERS."""
+        return {node.name: node.mqtt_url for node in self.nodes if node.broker is not None}
+
+    def start(self):
+        for node in self.nodes:
+            node.start()
+        return self
+
+    def stop(self):
+        for node in self.nodes:
+            node.stop()
+
+    def stats(self):
+        return {node.name: node.stats() for node in self.nodes}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def ingest_counts(node_names):
+    """Return the collector's cumulative ingestion counters per node; runs report differences of two calls."""
+    import rwd
+
+    return {node_name: {'milestones': rwd.milestones_ingested_total.value(node=node_name),
+                        'outputs_ingested': rwd.outputs_ingested_total.value(node=node_name),
+                        'outputs_skipped': rwd.outputs_skipped_total.value(node=node_name)}
+            for node_name in node_names}
+
+
+def simulate_collector(fleet, duration, db_name=SIMULATION_DB_NAME, metrics_port=None, mqtt=False):
+    """Run the collector against a started fleet for duration seconds and measure its throughput.
+
+    The collector's NODES, metrics port and database are pointed at the fleet
+    and db_name for the run, and it starts from fresh in-memory state
+    (rwd.reset_state()); all of it is restored afterwards. With mqtt, the
+    collector also subscribes to the fleet's brokers. Returns a summary with
+    the milestones and outputs ingested per node and per second, API errors
+    and the pipeline statistics, counted for this run only.
+    """
+    import rwd
+    import storage
+
+    saved = (rwd.NODES, rwd.COLLECTOR_METRICS_PORT, rwd.MQTT_ENABLED, rwd.MQTT_BROKERS, storage.DB_NAME)
+    node_names = fleet.urls()
+    counts_before = ingest_counts(node_names)
+    api_errors_before = rwd.api_errors_total.total()
+    stop_event = threading.Event()
+    timer = threading.Timer(duration, stop_event.set)
+    saved_state = rwd.reset_state()
+    start = time.perf_counter()
+    try:
+        rwd.NODES = node_names
+        rwd.COLLECTOR_METRICS_PORT = metrics_port
+        rwd.MQTT_ENABLED = mqtt
+        rwd.MQTT_BROKERS = fleet.mqtt_urls() if mqtt else {}
+        storage.DB_NAME = db_name
+        rwd.init_db()
+
+        start = time.perf_counter()
+        timer.start()
+        rwd.process_transactions(stop_event)
+    finally:
+        timer.cancel()
+        rwd.restore_state(saved_state)
+        rwd.NODES, rwd.COLLECTOR_METRICS_PORT, rwd.MQTT_ENABLED, rwd.MQTT_BROKERS, storage.DB_NAME = saved
+    elapsed = time.perf_counter() - start
+
+    counts_after = ingest_counts(node_names)
+    nodes = {node_name: {key: counts_after[node_name][key] - value for key, value in counts.items()}
+             for node_name, counts in counts_before.items()}
+    milestones = sum(node['milestones'] for node in nodes.values())
+    outputs = sum(node['outputs_ingested'] + node['outputs_skipped'] for node in nodes.values())
+    return {
+        'duration_seconds': round(elapsed, 3),
+        'nodes': nodes,
+        'milestones_per_second': round(milestones / elapsed, 2),
+        'outputs_per_second': round(outputs / elapsed, 2),
+        'network_milestones': fleet.network.latest_milestone() - fleet.network.first_milestone + 1,
+        'api_errors': rwd.api_errors_total.total() - api_errors_before,
+        'mock_nodes': fleet.stats(),
+    }
+
+
+def check_milestone_announcements(fleet, db_name=MQTT_CHECK_DB_NAME, timeout=ANNOUNCEMENT_TIMEOUT):
+    """Check that milestones announced over MQTT are ingested without waiting for a poll.
+
+    Subscribes the collector to the brokers of a started fleet built with
+    mqtt_base_port, has every node announce its latest milestone and waits
+    until on_milestone_announced() has ingested it. No poll loop runs, so
+    only the announcements can move the milestone cursors. db_name is
+    deleted first and the collector starts from fresh in-memory state, so
+    nothing from an earlier run counts. Returns per node the milestone
+    announced, whether it was ingested, how long that took and how many
+    node_info requests it cost (none when the event is used).
+    """
+    import rwd
+    import storage
+
+    nodes = [node for node in fleet.nodes if node.broker is not None]
+    if not nodes:
+        raise ValueError("The fleet runs no MQTT brokers; create it with mqtt_base_port")
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+
+    saved = (rwd.NODES, rwd.MQTT_BROKERS, storage.DB_NAME)
+    saved_state = rwd.reset_state()
+    executor = ThreadPoolExecutor(max_workers=len(nodes))
+    subscribers = {}
+    try:
+        rwd.NODES = {node.name: node.url for node in nodes}
+        rwd.MQTT_BROKERS = fleet.mqtt_urls()
+        storage.DB_NAME = db_name
+        rwd.init_db()
+
+        subscribers = rwd.start_milestone_subscriptions(executor)
+        if not subscribers:
+            raise RuntimeError("Checking milestone announcements requires the paho-mqtt package")
+        deadline = time.time() + timeout
+        while any(node.broker.subscribers(MILESTONE_TOPIC) == 0 for node in nodes):
+            if time.time() > deadline:
+                raise RuntimeError(f"The collector did not subscribe to every mock broker within {timeout}s")
+            time.sleep(ANNOUNCE_CHECK_INTERVAL)
+
+        pending = {}
+        for node in nodes:
+            milestone = node.latest_milestone()
+            node_info_requests = node.stats()['requests'].get('node_info', 0)
+            node.announce(milestone)
+            pending[node.name] = (node, milestone, node_info_requests, time.perf_counter())
+
+        results = {}
+        while pending and time.time() < deadline:
+            for node_name, (node, milestone, node_info_requests, started) in list(pending.items()):
+                if rwd.get_milestone_cursor(node_name) >= milestone:
+                    results[node_name] = {
+                        'milestone': milestone,
+                        'ingested': True,
+                        'seconds': round(time.perf_counter() - started, 3),
+                        'node_info_requests': node.stats()['requests'].get('node_info', 0) - node_info_requests,
+                    }
+                    del pending[node_name]
+            time.sleep(ANNOUNCE_CHECK_INTERVAL)
+        for node_name, (node, milestone, node_info_requests, started) in pending.items():
+            results[node_name] = {'milestone': milestone, 'ingested': False, 'seconds': None,
+                                  'node_info_requests': node.stats()['requests'].get('node_info', 0) - node_info_requests}
+        return results
+    finally:
+        for subscriber in subscribers.values():
+            subscriber.stop()
+        executor.shutdown(wait=True)
+        rwd.restore_state(saved_state)
+        rwd.NODES, rwd.MQTT_BROKERS, storage.DB_NAME = saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fleet of mock HORNET nodes, optionally with the collector.")
+    parser.add_argument("--nodes", type=int, default=4, help="number of mock nodes")
+    parser.add_argument("--base-port", type=int, default=MOCK_BASE_PORT, help="port of the first node")
+    parser.add_argument("--milestone-interval", type=float, default=MILESTONE_INTERVAL, help="seconds per milestone")
+    parser.add_argument("--outputs", type=int, default=OUTPUTS_PER_MILESTONE, help="average outputs per milestone")
+    parser.add_argument("--latency", type=LatencyDistribution.parse, default=LatencyDistribution("constant", 0),
+                        help="response delay, e.g. constant:5, uniform:5:50, exponential:20, lognormal:20:0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of requests dropped without a response")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="share of requests that hang")
+    parser.add_argument("--lag", type=int, default=0, help="milestones the last node trails the network by")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the milestone payloads and failures")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="run the collector against the fleet for this many seconds; serve only if omitted")
+    parser.add_argument("--db", help=f"database written by the simulated collector ({SIMULATION_DB_NAME}, "
+                                     f"or {MQTT_CHECK_DB_NAME} with --check-mqtt)")
+    parser.add_argument("--mqtt", action="store_true",
+                        help="run a milestone broker per node and let the simulated collector subscribe to it")
+    parser.add_argument("--mqtt-base-port", type=int, default=MOCK_MQTT_BASE_PORT, help="broker port of the first node")
+    parser.add_argument("--check-mqtt", action="store_true",
+                        help="check that announced milestones are ingested without polling, then exit")
+    args = parser.parse_args()
+
+    network = MockNetwork(milestone_interval=args.milestone_interval, outputs_per_milestone=args.outputs,
+                          seed=args.seed)
+    profiles = [NodeProfile(latency=args.latency, error_rate=args.error_rate, drop_rate=args.drop_rate,
+                            stall_rate=args.stall_rate, milestone_lag=args.lag if i == args.nodes - 1 else 0)
+                for i in range(args.nodes)]
+
+    mqtt_base_port = args.mqtt_base_port if args.mqtt or args.check_mqtt else None
+    with MockFleet(args.nodes, network, profiles, base_port=args.base_port, seed=args.seed,
+                   mqtt_base_port=mqtt_base_port) as fleet:
+        for node_name, url in fleet.urls().items():
+            print(f"[MOCK] {node_name} serving at {url}")
+        for node_name, url in fleet.mqtt_urls().items():
+            print(f"[MOCK] {node_name} announcing milestones at {url}")
+
+        if args.check_mqtt:
+            results = check_milestone_announcements(fleet, db_name=args.db or MQTT_CHECK_DB_NAME)
+            print(json.dumps(results, indent=2))
+            if not all(result['ingested'] for result in results.values()):
+                raise SystemExit(1)
+            return
+
+        if args.duration is None:
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                print("\n[SHUTDOWN] Stopping mock nodes...")
+            return
+
+        summary = simulate_collector(fleet, args.duration, db_name=args.db or SIMULATION_DB_NAME, mqtt=args.mqtt)
+        print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
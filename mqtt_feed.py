@@ -0,0 +1,109 @@
+import json
+from urllib.parse import urlparse
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # MQTT support is optional
+    mqtt = None
+
+# HORNET publishes every confirmed milestone on this topic
+MILESTONE_TOPIC = "milestone-info/confirmed"
+MQTT_PATH = "/api/mqtt/v1"
+KEEPALIVE = 30  # Seconds between MQTT keep-alive pings
+RECONNECT_MIN_DELAY = 1  # Seconds before the first reconnect attempt
+RECONNECT_MAX_DELAY = 60  # Upper bound for the reconnect backoff
+
+
+def mqtt_available():
+    """Return True if the optional paho-mqtt dependency is installed."""
+    return mqtt is not None
+
+
+def broker_url_for(node_url, path=MQTT_PATH):
+    """Derive the MQTT-over-WebSocket URL of a HORNET node from its API URL."""
+    parsed = urlparse(node_url)
+    scheme = "wss" if parsed.scheme == "https" else "ws"
+    return f"{scheme}://{parsed.netloc}{path}"
+
+
+def parse_milestone_index(payload):
+    """Extract the milestone index from a milestone-info payload, or None."""
+    try:
+        data = json.loads(payload)
+    except (TypeError, ValueError):
+        return None
+    index = data.get("index") if isinstance(data, dict) else None
+    return index if isinstance(index, int) else None
+
+
+class MilestoneSubscriber:
+    """Subscription to the confirmed-milestone feed of one node.
+
+    broker_url selects the transport: ws:// or wss:// for HORNET's built-in
+    MQTT-over-WebSocket endpoint, or mqtt:// (tcp) for a plain broker such as
+    a local stand-in used in tests. on_milestone(node_name, index) is called
+    from the MQTT network thread and must not block.
+    """
+
+    def __init__(self, node_name, broker_url, on_milestone, topic=MILESTONE_TOPIC, headers=None):
+        if mqtt is None:
+            raise RuntimeError("MQTT mode requires the paho-mqtt package")
+
+        self.node_name = node_name
+        self.broker_url = broker_url
+        self.on_milestone = on_milestone
+        self.topic = topic
+        self.connected = False
+        self.last_index = None
+
+        parsed = urlparse(broker_url)
+        websocket = parsed.scheme in ("ws", "wss")
+        self._host = parsed.hostname
+        self._port = parsed.port or (443 if parsed.scheme == "wss" else 80 if websocket else 1883)
+
+        transport = "websockets" if websocket else "tcp"
+        if hasattr(mqtt, "CallbackAPIVersion"):
+            self._client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, transport=transport)
+        else:
+            self._client = mqtt.Client(transport=transport)
+
+        if websocket:
+            self._client.ws_set_options(path=parsed.path or MQTT_PATH, headers=headers)
+        if parsed.scheme in ("wss", "mqtts"):
+            self._client.tls_set()
+
+        self._client.reconnect_delay_set(RECONNECT_MIN_DELAY, RECONNECT_MAX_DELAY)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._client.on_message = self._on_message
+
+    def _on_connect(self, client, userdata, flags, reason_code, *args):
+        if reason_code == 0:
+            self.connected = True
+            client.subscribe(self.topic)
+            print(f"[MQTT] {self.node_name} - Subscribed to {self.topic}")
+        else:
+            print(f"[ERROR] {self.node_name} - MQTT connection refused: {reason_code}")
+
+    def _on_disconnect(self, client, userdata, *args):
+        if self.connected:
+            print(f"[MQTT] {self.node_name} - Disconnected, falling back to polling")
+        self.connected = False
+
+    def _on_message(self, client, userdata, message):
+        index = parse_milestone_index(message.payload)
+        if index is None:
+            return
+        self.last_index = index
+        self.on_milestone(self.node_name, index)
+
+    def start(self):
+        """Connect in the background and keep reconnecting until stopped."""
+        self._client.connect_async(self._host, self._port, keepalive=KEEPALIVE)
+        self._client.loop_start()
+
+    def stop(self):
+        """Disconnect and stop the network thread."""
+        self._client.disconnect()
+        self._client.loop_stop()
+        self.connected = False
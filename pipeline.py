@@ -0,0 +1,324 @@
+import queue
+import threading
+import time
+
+# Pipeline defaults
+INGEST_QUEUE_SIZE = 256  # Milestone payloads buffered between fetchers and the writer
+WRITER_BATCH_SIZE = 64  # Maximum number of milestones committed in one transaction
+WRITER_MAX_DELAY = 0.5  # Seconds the writer waits to fill a batch before committing
+WRITER_RETRIES = 3  # Attempts for a batch before its milestones are dropped and refetched
+
+
+class StageQueue:
+    """Bounded queue between two pipeline stages, with backpressure statistics.
+
+    A full queue blocks the producing stage, so a slow consumer throttles
+    its producers instead of letting memory grow. The statistics show where
+    the pipeline waits: a queue that is often full needs a faster consumer,
+    an empty one faster producers.
+    """
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.dequeued = 0
+        self.rejected = 0  # Puts that timed out on a full queue
+        self.blocked_puts = 0  # Puts that found the queue full and had to wait
+        self.blocked_seconds = 0.0
+        self.high_water = 0
+
+    def put(self, item, timeout=None):
+        """Add an item, waiting up to timeout seconds for space. Returns False on timeout."""
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            start = time.perf_counter()
+            try:
+                self._queue.put(item, timeout=timeout)
+            except queue.Full:
+                with self._lock:
+                    self.blocked_puts += 1
+                    self.blocked_seconds += time.perf_counter() - start
+                    self.rejected += 1
+                return False
+            with self._lock:
+                self.blocked_puts += 1
+                self.blocked_seconds += time.perf_counter() - start
+
+        with self._lock:
+            self.enqueued += 1
+            self.high_water = max(self.high_water, self._queue.qsize())
+        return True
+
+    def get_batch(self, max_items, max_delay, timeout=None):
+        """Remove up to max_items items.
+
+        Waits up to timeout seconds for the first item, then up to max_delay
+        seconds for more. Returns an empty list if nothing arrived.
+        """
+        try:
+            items = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        batch_deadline = time.monotonic() + max_delay
+        while len(items) < max_items:
+            remaining = batch_deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    items.append(self._queue.get(timeout=remaining))
+                else:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        with self._lock:
+            self.dequeued += len(items)
+        return items
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """Return a snapshot of the queue statistics."""
+        with self._lock:
+            return {
+                'depth': self._queue.qsize(),
+                'capacity': self.maxsize,
+                'high_water': self.high_water,
+                'enqueued': self.enqueued,
+                'dequeued': self.dequeued,
+                'blocked_puts': self.blocked_puts,
+                'blocked_seconds': round(self.blocked_seconds, 3),
+                'rejected': self.rejected,
+            }
+
+
+class MilestoneWriter:
+    """Single writer thread that commits fetched milestones in batches.
+
+    Fetchers submit (node_name, milestone_index, tx_ids) items; the writer
+    drains the queue and hands each batch to write_batch(items), which must
+    write it in one transaction. Keeping all ingestion writes on one thread
+    means SQLite never sees competing writers, and batching amortizes the
+    commit cost over many milestones.
+
+    The highest milestone submitted per node is tracked until it is
+    committed, so fetchers can continue after it instead of downloading
+    milestones that are still queued. If a batch keeps failing, its
+    milestones and everything queued after them for the same nodes are
+    dropped, and later milestones of those nodes are refused until the
+    fetcher starts over from the persisted cursor; the cursor never skips
+    a milestone that was not written.
+    """
+
+    def __init__(self, write_batch, queue_size=INGEST_QUEUE_SIZE, batch_size=WRITER_BATCH_SIZE,
+                 max_delay=WRITER_MAX_DELAY, retries=WRITER_RETRIES, on_error=None):
+        self.write_batch = write_batch
+        self.queue = StageQueue("ingest", queue_size)
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.retries = retries
+        self.on_error = on_error
+        self._pending = {}
+        self._dropped = {}  # First dropped milestone per node, until it is fetched again
+        self._generations = {}  # Bumped per node on every drop; older queued items are discarded
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.batches = 0
+        self.milestones = 0
+        self.failed_batches = 0
+        self.write_seconds = 0.0
+        self.last_batch_size = 0
+
+    def submit(self, node_name, milestone_index, tx_ids, timeout=None):
+        """Queue a fetched milestone for writing.
+
+        Returns False if the queue stayed full, or if earlier milestones of
+        the node were dropped and must be fetched again first.
+        """
+        # Mark the milestone pending before queueing it, so the writer can
+        # never commit it before the mark exists
+        with self._lock:
+            dropped_from = self._dropped.get(node_name)
+            if dropped_from is not None:
+                if milestone_index > dropped_from:
+                    return False
+                del self._dropped[node_name]
+            generation = self._generations.get(node_name, 0)
+            previous = self._pending.get(node_name)
+            if milestone_index > (previous or 0):
+                self._pending[node_name] = milestone_index
+
+        if self.queue.put((node_name, milestone_index, tx_ids, generation), timeout=timeout):
+            return True
+
+        with self._lock:
+            if self._pending.get(node_name) == milestone_index:
+                if previous is None:
+                    del self._pending[node_name]
+                else:
+                    self._pending[node_name] = previous
+        return False
+
+    def pending_milestone(self, node_name):
+        """Return the highest milestone queued for a node but not yet committed, or 0."""
+        with self._lock:
+            return self._pending.get(node_name, 0)
+
+    def _current(self, items):
+        """Discard items queued before their node's last drop and strip the generation."""
+        with self._lock:
+            return [(node_name, milestone_index, tx_ids)
+                    for node_name, milestone_index, tx_ids, generation in items
+                    if generation == self._generations.get(node_name, 0)]
+
+    def _settle(self, items, committed):
+        """Release the pending marks of a batch after it was committed or dropped."""
+        with self._lock:
+            if not committed:
+                for node_name, milestone_index, _ in items:
+                    if node_name not in self._dropped or milestone_index < self._dropped[node_name]:
+                        self._dropped[node_name] = milestone_index
+                for node_name in {item[0] for item in items}:
+                    self._generations[node_name] = self._generations.get(node_name, 0) + 1
+                    self._pending.pop(node_name, None)
+                return
+
+            for node_name, milestone_index, _ in items:
+                pending = self._pending.get(node_name)
+                if pending is not None and pending <= milestone_index:
+                    del self._pending[node_name]
+
+    def _write(self, items):
+        items = self._current(items)
+        if not items:
+            return
+
+        for attempt in range(1, self.retries + 1):
+            start = time.perf_counter()
+            try:
+                self.write_batch(items)
+            except Exception as e:
+                if attempt < self.retries:
+                    time.sleep(0.1 * 2 ** attempt)
+                    continue
+                self.failed_batches += 1
+                self._settle(items, committed=False)
+                if self.on_error is not None:
+                    self.on_error(items, e)
+                return
+            self.write_seconds += time.perf_counter() - start
+            break
+
+        self.batches += 1
+        self.milestones += len(items)
+        self.last_batch_size = len(items)
+        self._settle(items, committed=True)
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.depth() == 0):
+            items = self.queue.get_batch(self.batch_size, self.max_delay, timeout=0.2)
+            if items:
+                self._write(items)
+
+    def start(self):
+        """Start the writer thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Commit everything still queued, then stop the writer thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        """Return the queue and writer statistics."""
+        return {
+            'queue': self.queue.stats(),
+            'batches': self.batches,
+            'milestones': self.milestones,
+            'failed_batches': self.failed_batches,
+            'last_batch_size': self.last_batch_size,
+            'write_seconds': round(self.write_seconds, 3),
+        }
+
+
+class PeriodicScheduler:
+    """Thread that runs maintenance tasks, each on its own interval.
+
+    Tasks run one at a time on the scheduler thread, so a long reward cycle
+    delays the next status report but never the fetchers or the writer.
+    After every run on_task_done(name, duration_seconds, failed) is called.
+    """
+
+    def __init__(self, name="scheduler", on_task_done=None):
+        self.name = name
+        self.on_task_done = on_task_done
+        self._tasks = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, name, interval, func, first_run=None):
+        """Schedule func() every interval seconds, first at first_run (default: one interval from now)."""
+        self._tasks.append({
+            'name': name,
+            'interval': interval,
+            'func': func,
+            'next_run': first_run,
+            'runs': 0,
+            'errors': 0,
+            'last_duration': 0.0,
+        })
+
+    def _run(self):
+        now = time.time()
+        for task in self._tasks:
+            if task['next_run'] is None:
+                task['next_run'] = now + task['interval']
+
+        while not self._stop.is_set():
+            task = min(self._tasks, key=lambda t: t['next_run'])
+            if self._stop.wait(max(0.0, task['next_run'] - time.time())):
+                break
+
+            start = time.perf_counter()
+            failed = False
+            try:
+                task['func']()
+            except Exception as e:
+                failed = True
+                task['errors'] += 1
+                print(f"[ERROR] Scheduled task {task['name']} failed: {str(e)}")
+            task['runs'] += 1
+            task['last_duration'] = time.perf_counter() - start
+            if self.on_task_done is not None:
+                self.on_task_done(task['name'], task['last_duration'], failed)
+            # Skip missed runs instead of running them back to back
+            task['next_run'] = max(task['next_run'] + task['interval'], time.time())
+
+    def start(self):
+        """Start the scheduler thread."""
+        if not self._tasks:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the scheduler after the running task finishes."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        """Return run counts and the last duration of every task."""
+        return {task['name']: {'runs': task['runs'], 'errors': task['errors'],
+                               'last_duration': round(task['last_duration'], 3)}
+                for task in self._tasks}
@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+
+# Scheduler defaults
+DEFAULT_INTERVAL = 5  # Assumed milestone interval until one is observed (in seconds)
+MIN_POLL_INTERVAL = 0.5  # Never poll a node more often than this (in seconds)
+MAX_POLL_INTERVAL = 30  # Poll a node at least this often, even on a quiet network (in seconds)
+POLL_LEAD = 0.25  # Poll this long after a milestone is expected (in seconds)
+INTERVAL_SMOOTHING = 0.3  # Weight of a new sample in the interval estimate
+BACKOFF_BASE = 2  # First retry delay after a failure (in seconds)
+BACKOFF_MAX = 300  # Upper bound for the retry delay (in seconds)
+
+
+def backoff_delay(failures, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    """Return the delay before retry number `failures`: exponential, with jitter.
+
+    The delay doubles per consecutive failure up to maximum, and a random
+    value between half and all of it is used, so nodes that failed together
+    are not retried together.
+    """
+    delay = min(maximum, base * 2 ** max(0, failures - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class NodeSchedule:
+    """Learned milestone cadence and retry state of one node."""
+
+    __slots__ = ("last_index", "last_change", "last_poll", "interval", "next_poll", "failures")
+
+    def __init__(self, interval):
+        self.last_index = None
+        self.last_change = None  # Estimated arrival time of last_index
+        self.last_poll = None
+        self.interval = interval
+        self.next_poll = 0.0
+        self.failures = 0
+
+
+class AdaptivePollScheduler:
+    """Decides when each node is polled next.
+
+    Each node's milestone interval is learned from how often its latest
+    milestone index advances, and the next poll is placed just after the
+    next milestone is expected. A milestone arrived between the last poll
+    that did not see it and the first that did, so its arrival is estimated
+    as the middle of that span; polls that come too early narrow the span.
+    A node that is behind is polled again right away; a failing node backs
+    off exponentially with jitter.
+    """
+
+    def __init__(self, default_interval=DEFAULT_INTERVAL, min_interval=MIN_POLL_INTERVAL,
+                 max_interval=MAX_POLL_INTERVAL, lead=POLL_LEAD, smoothing=INTERVAL_SMOOTHING,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lead = lead
+        self.smoothing = smoothing
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    def _clamp(self, seconds):
+        return min(self.max_interval, max(self.min_interval, seconds))
+
+    def _node(self, node_name):
+        schedule = self._nodes.get(node_name)
+        if schedule is None:
+            schedule = self._nodes[node_name] = NodeSchedule(self.default_interval)
+        return schedule
+
+    def load(self, rows):
+        """Seed the schedule from persisted (node_name, latest_milestone, last_seen) rows.
+
+        The first milestone observed after a restart then yields an interval
+        sample covering the whole time the collector was down.
+        """
+        with self._lock:
+            for node_name, latest_milestone, last_seen in rows:
+                schedule = self._node(node_name)
+                if latest_milestone:
+                    schedule.last_index = latest_milestone
+                    schedule.last_change = last_seen
+
+    def record_success(self, node_name, milestone_index, caught_up=True, now=None):
+        """Record a successful poll that saw milestone_index and schedule the next one."""
+        now = time.time() if now is None else now
+
+        with self._lock:
+            schedule = self._node(node_name)
+            schedule.failures = 0
+
+            if schedule.last_index is None or milestone_index < schedule.last_index:
+                # First observation, or the node was reset
+                schedule.last_index = milestone_index
+                schedule.last_change = now
+            elif milestone_index > schedule.last_index:
+                arrival = now
+                if schedule.last_poll is not None and schedule.last_poll < now:
+                    arrival = (schedule.last_poll + now) / 2
+                if schedule.last_change is not None and arrival > schedule.last_change:
+                    # A sample spanning several milestones counts as several samples
+                    milestones = milestone_index - schedule.last_index
+                    sample = (arrival - schedule.last_change) / milestones
+                    weight = 1 - (1 - self.smoothing) ** milestones
+                    schedule.interval = self._clamp(weight * sample + (1 - weight) * schedule.interval)
+                schedule.last_index = milestone_index
+                schedule.last_change = arrival
+            schedule.last_poll = now
+
+            if not caught_up:
+                # Milestones are still waiting to be fetched
+                schedule.next_poll = now + self.min_interval
+                return schedule.next_poll
+
+            expected = schedule.last_change + schedule.interval + self.lead
+            if expected <= now:
+                # The milestone is late; check again a fraction of an interval later
+                expected = now + schedule.interval / 4
+            schedule.next_poll = now + self._clamp(expected - now)
+            return schedule.next_poll
+
+    def record_failure(self, node_name, now=None):
+        """Record a failed poll and back off before the next attempt."""
+        now = time.time() if now is None else now
+
+        with self._lock:
+            schedule = self._node(node_name)
+            schedule.failures += 1
+            schedule.next_poll = now + backoff_delay(schedule.failures, self.backoff_base, self.backoff_max)
+            return schedule.next_poll
+
+    def defer(self, node_name, until):
+        """Do not poll a node before `until` (e.g. while events cover it)."""
+        with self._lock:
+            schedule = self._node(node_name)
+            schedule.next_poll = max(schedule.next_poll, until)
+
+    def is_due(self, node_name, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._node(node_name).next_poll <= now
+
+    def seconds_until_next(self, node_names, now=None):
+        """Return how long to wait until the first of node_names is due."""
+        now = time.time() if now is None else now
+        with self._lock:
+            next_poll = min((self._node(node_name).next_poll for node_name in node_names), default=now)
+        return max(0.0, next_poll - now)
+
+    def stats(self):
+        """Return the interval estimate, failure count and next poll time per node."""
+        with self._lock:
+            return {node_name: {'interval': round(schedule.interval, 3),
+                                'failures': schedule.failures,
+                                'next_poll': schedule.next_poll}
+                    for node_name, schedule in self._nodes.items()}
@@ -0,0 +1,204 @@
+import argparse
+import os
+import shutil
+import time
+
+import storage
+from storage import get_connection, transaction
+
+# Retention configuration
+RETENTION_DAYS = 30  # Raw transactions and rewards older than this are rolled up
+ARCHIVE_DB_NAME = "{stem}_archive.db"  # Where raw rows are moved, {stem} being the database's name; None deletes them
+RETENTION_BATCH_SIZE = 5000  # Rows moved per transaction
+VACUUM_PAGES = 2000  # Free pages returned to the file system per run
+SECONDS_PER_DAY = 86400
+
+
+def retention_cutoff(now=None, retention_days=RETENTION_DAYS):
+    """Return the unix timestamp (start of a UTC day) before which rows are rolled up."""
+    now = time.time() if now is None else now
+    return (int(now) // SECONDS_PER_DAY - retention_days) * SECONDS_PER_DAY
+
+
+def archive_path(archive_db_name=ARCHIVE_DB_NAME, db_name=None):
+    """Return the archive file of a database.
+
+    A name containing {stem} is placed next to the database, with {stem}
+    replaced by the database's file name without extension, so
+    transactions.db archives to transactions_archive.db and a simulation
+    database never writes into the production archive.
+    """
+    if "{stem}" not in archive_db_name:
+        return archive_db_name
+    db_name = db_name or storage.DB_NAME
+    stem = os.path.splitext(os.path.basename(db_name))[0]
+    return os.path.join(os.path.dirname(db_name), archive_db_name.format(stem=stem))
+
+
+def attach_archive(conn, archive_db_name=ARCHIVE_DB_NAME):
+    """Attach the archive database to a connection and create its tables."""
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if "archive" not in attached:
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path(archive_db_name),))
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive.transactions (
+            id TEXT PRIMARY KEY,
+            node_name TEXT,
+            milestone_index INTEGER,
+            timestamp INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive.rewards (
+            id INTEGER PRIMARY KEY,
+            node_name TEXT,
+            reward_amount REAL,
+            reason TEXT,
+            timestamp INTEGER
+        )
+    """)
+
+
+def _select_batch(conn, table, cutoff, batch_size):
+    """Note the rowids of the next batch of old rows in temp.retention_batch; returns their number."""
+    cursor = conn.cursor()
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS retention_batch (row_id INTEGER PRIMARY KEY)")
+    cursor.execute("DELETE FROM temp.retention_batch")
+    cursor.execute(f"""
+        INSERT INTO temp.retention_batch (row_id)
+        SELECT rowid FROM {table} WHERE timestamp < ? LIMIT ?
+    """, (cutoff, batch_size))
+    return max(cursor.rowcount, 0)
+
+
+def _archive_batch(conn, table):
+    """Copy the selected rows of a table to the archive database."""
+    batch = "rowid IN (SELECT row_id FROM temp.retention_batch)"
+    if table == "transactions":
+        conn.execute(f"""
+            INSERT OR IGNORE INTO archive.transactions (id, node_name, milestone_index, timestamp)
+            SELECT id, node_name, milestone_index, timestamp FROM transactions WHERE {batch}
+        """)
+    else:
+        conn.execute(f"""
+            INSERT OR IGNORE INTO archive.rewards (id, node_name, reward_amount, reason, timestamp)
+            SELECT id, node_name, reward_amount, reason, timestamp FROM rewards WHERE {batch}
+        """)
+
+
+def _roll_up_batch(conn, table):
+    """Aggregate the selected rows of a table into its daily table and delete them."""
+    cursor = conn.cursor()
+    batch = "rowid IN (SELECT row_id FROM temp.retention_batch)"
+
+    if table == "transactions":
+        cursor.execute(f"""
+            INSERT INTO transactions_daily (day, node_name, tx_count)
+            SELECT timestamp / {SECONDS_PER_DAY}, node_name, COUNT(*)
+            FROM transactions WHERE {batch}
+            GROUP BY 1, 2
+            ON CONFLICT(day, node_name) DO UPDATE SET tx_count = tx_count + excluded.tx_count
+        """)
+    else:
+        cursor.execute(f"""
+            INSERT INTO rewards_daily (day, node_name, reward_total, reward_count)
+            SELECT timestamp / {SECONDS_PER_DAY}, node_name, SUM(reward_amount), COUNT(*)
+            FROM rewards WHERE {batch}
+            GROUP BY 1, 2
+            ON CONFLICT(day, node_name) DO UPDATE SET
+                reward_total = reward_total + excluded.reward_total,
+                reward_count = reward_count + excluded.reward_count
+        """)
+
+    cursor.execute(f"DELETE FROM {table} WHERE {batch}")
+    return cursor.rowcount
+
+
+def incremental_vacuum_active(db_name=None):
+    """Return True if the database releases free pages incrementally.
+
+    New databases get the mode from the storage pragmas; files created
+    before it need enable_incremental_vacuum() once.
+    """
+    return get_connection(db_name).execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def enable_incremental_vacuum(db_name=None):
+    """Rebuild the database with VACUUM so incremental auto-vacuum takes effect.
+
+    A maintenance step, never run by the collector: VACUUM rewrites the
+    whole file under an exclusive lock and needs about twice its size in
+    free disk space, so stop the collector and the dashboard first. Returns
+    False if the mode was already active.
+    """
+    db_name = db_name or storage.DB_NAME
+    if incremental_vacuum_active(db_name):
+        return False
+
+    size = os.path.getsize(db_name)
+    free = shutil.disk_usage(os.path.dirname(os.path.abspath(db_name))).free
+    if free < 2 * size:
+        raise RuntimeError(f"Rebuilding {db_name} needs about {2 * size / 2 ** 30:.1f} GiB free disk space, "
+                           f"only {free / 2 ** 30:.1f} GiB available")
+    conn = get_connection(db_name)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def run_retention(now=None, retention_days=RETENTION_DAYS, archive_db_name=ARCHIVE_DB_NAME,
+                  batch_size=RETENTION_BATCH_SIZE, vacuum_pages=VACUUM_PAGES):
+    """Roll raw rows older than the retention horizon into per-day aggregates.
+
+    Rows are moved in batches of batch_size, each in its own transaction, so
+    the collector is never blocked for long. Raw rows are copied to the
+    archive database (see archive_path()) and committed there before they
+    are deleted, or just deleted when archive_db_name is None; a crash in
+    between leaves a row in both files, never in neither. Then up to
+    vacuum_pages free pages are released. Returns a dict with the number of rows rolled up per table.
+    """
+    cutoff = retention_cutoff(now, retention_days)
+    archive = archive_db_name is not None
+    if archive:
+        attach_archive(get_connection(), archive_db_name)
+
+    moved = {"transactions": 0, "rewards": 0}
+    for table in moved:
+        while True:
+            with transaction() as conn:
+                if not _select_batch(conn, table, cutoff, batch_size):
+                    break
+            # The archive is a separate file, so its copy is committed first
+            if archive:
+                with transaction() as conn:
+                    _archive_batch(conn, table)
+            with transaction() as conn:
+                moved[table] += _roll_up_batch(conn, table)
+
+    if vacuum_pages:
+        get_connection().execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retention maintenance for the collector database.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    vacuum = subcommands.add_parser("enable-incremental-vacuum",
+                                    help="rebuild the database once so retention can return free pages to disk")
+    vacuum.add_argument("--db", default=storage.DB_NAME, help="database to rebuild")
+    args = parser.parse_args()
+
+    if args.command == "enable-incremental-vacuum":
+        if incremental_vacuum_active(args.db):
+            print(f"[MAINTENANCE] Incremental vacuum is already active for {args.db}")
+            return
+        print(f"[MAINTENANCE] Rebuilding {args.db} for incremental vacuum; the collector and dashboard must be stopped")
+        started = time.time()
+        enable_incremental_vacuum(args.db)
+        print(f"[MAINTENANCE] Rebuilt {args.db} in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import math
+from collections.abc import Mapping
+
+import numpy as np
+
+from latency_histogram import PERCENTILES as LATENCY_PERCENTILES
+
+# Reward configuration
+REWARD_CALCULATION_INTERVAL = 300  # Calculate rewards every 5 minutes (in seconds)
+BASE_REWARD_PER_TX = 0.01  # Base reward tokens per transaction
+UPTIME_REWARD_FACTOR = 0.5  # Additional reward factor for uptime
+MILESTONE_SYNC_REWARD = 0.2  # Reward for being in sync with milestones
+TRANSACTION_VOLUME_THRESHOLD = 100  # Minimum transactions for bonus rewards
+VOLUME_BONUS_MULTIPLIER = 1.2  # Bonus multiplier for high transaction volume
+MAX_LATENCY_MS = 5000  # Maximum acceptable latency in milliseconds
+LATENCY_PENALTY_FACTOR = 0.8  # Penalty factor for high latency
+
+def calculate_milestone_sync_factor(node_metrics):
+    """Calculate how in-sync the nodes are with milestones."""
+    if not node_metrics:
+        return {}
+    
+    # Find the highest milestone index reported by any node
+    max_milestone = max(metrics['latest_milestone'] for metrics in node_metrics.values() if metrics['latest_milestone'])
+    
+    # Calculate sync factor for each node (1.0 = fully synced, lower = less synced)
+    sync_factors = {}
+    for node_name, metrics in node_metrics.items():
+        if max_milestone and metrics['latest_milestone']:
+            sync_factor = metrics['latest_milestone'] / max_milestone
+            sync_factors[node_name] = sync_factor
+        else:
+            sync_factors[node_name] = 0
+    
+    return sync_factors
+
+def calculate_latency_factor(avg_latency):
+    """Calculate a factor based on latency (lower latency = higher factor)."""
+    if avg_latency >= MAX_LATENCY_MS:
+        return LATENCY_PENALTY_FACTOR
+    
+    # Linear scale: 1.0 (best) to LATENCY_PENALTY_FACTOR (worst)
+    factor = 1.0 - ((1.0 - LATENCY_PENALTY_FACTOR) * (avg_latency / MAX_LATENCY_MS))
+    return max(LATENCY_PENALTY_FACTOR, factor)
+
+def calculate_uptime_factor(uptime_seconds, interval_seconds):
+    """Calculate uptime factor based on expected interval."""
+    # Cap at 100% for the period
+    uptime_ratio = min(1.0, uptime_seconds / interval_seconds)
+    
+    # Apply UPTIME_REWARD_FACTOR
+    uptime_bonus = 1.0 + (UPTIME_REWARD_FACTOR * uptime_ratio)
+    return uptime_bonus
+
+def calculate_volume_bonus(tx_count):
+    """Calculate bonus for high transaction volume."""
+    if tx_count >= TRANSACTION_VOLUME_THRESHOLD:
+        # Logarithmic scaling for bonus to prevent excessive rewards for very high volume
+        bonus = 1.0 + (VOLUME_BONUS_MULTIPLIER - 1.0) * min(1.0, math.log10(tx_count / TRANSACTION_VOLUME_THRESHOLD + 1))
+        return bonus
+    return 1.0
+
+class RewardPolicy:
+    """The reward constants as one object, so alternative policies can be compared side by side.
+
+    Field names are the lower-case names of the module constants; fields
+    not given take the constant's value at construction time.
+    """
+
+    FIELDS = ("reward_calculation_interval", "base_reward_per_tx", "uptime_reward_factor",
+              "milestone_sync_reward", "transaction_volume_threshold", "volume_bonus_multiplier",
+              "max_latency_ms", "latency_penalty_factor")
+
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        unknown = set(values) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown reward policy fields: {', '.join(sorted(unknown))}")
+        for field in self.FIELDS:
+            setattr(self, field, values[field] if field in values else globals()[field.upper()])
+
+    def replace(self, **changes):
+        """Return a copy with some fields changed."""
+        return RewardPolicy(**{**self.as_dict(), **changes})
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __eq__(self, other):
+        return isinstance(other, RewardPolicy) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return "RewardPolicy(" + ", ".join(f"{field}={value!r}" for field, value in self.as_dict().items()) + ")"
+
+    def __getstate__(self):
+        return self.as_dict()
+
+    def __setstate__(self, state):
+        for field, value in state.items():
+            setattr(self, field, value)
+
+def _as_array(values):
+    """Convert a column of metrics to a float array, treating None as 0."""
+    return np.array([0 if value is None else value for value in values], dtype=np.float64)
+
+class RewardReasons(Mapping):
+    """Read-only mapping of node name to reward reason, rendered on access."""
+
+    def __init__(self, batch):
+        self._batch = batch
+
+    def __getitem__(self, node_name):
+        return self._batch.reason(self._batch.index[node_name])
+
+    def __iter__(self):
+        return iter(self._batch.node_names)
+
+    def __len__(self):
+        return len(self._batch.node_names)
+
+class RewardBatch:
+    """Reward factors and final rewards for a fleet of nodes, one array per column."""
+
+    def __init__(self, node_names, recent_tx, uptime, avg_latency, latest_milestone,
+                 interval_seconds=None, latency_percentiles=None, policy=None):
+        self.policy = policy = policy or RewardPolicy()
+        if interval_seconds is None:
+            interval_seconds = policy.reward_calculation_interval
+        self.node_names = list(node_names)
+        self.index = {node_name: i for i, node_name in enumerate(self.node_names)}
+
+        # Inputs are kept as given so reasons render exactly like the scalar path
+        self.recent_tx = list(recent_tx)
+        self.uptime = list(uptime)
+        self.avg_latency = list(avg_latency)
+        self.latest_milestone = list(latest_milestone)
+
+        # Latency percentiles of the cycle ({50: [...], 95: [...], 99: [...]},
+        # NaN for nodes without samples); informational, not part of the formula yet
+        self.latency_percentiles = {
+            percent: np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+            for percent, values in (latency_percentiles or {}).items()
+        }
+
+        tx = _as_array(self.recent_tx)
+        uptime_seconds = _as_array(self.uptime)
+        latency = _as_array(self.avg_latency)
+        milestones = _as_array(self.latest_milestone)
+
+        # Base transaction reward
+        self.base_reward = tx * policy.base_reward_per_tx
+
+        # Uptime factor
+        uptime_ratio = np.minimum(1.0, uptime_seconds / interval_seconds)
+        self.uptime_factor = 1.0 + (policy.uptime_reward_factor * uptime_ratio)
+
+        # Latency factor (penalty for high latency)
+        penalty = policy.latency_penalty_factor
+        scaled = np.maximum(penalty, 1.0 - ((1.0 - penalty) * (latency / policy.max_latency_ms)))
+        self.latency_factor = np.where(latency >= policy.max_latency_ms, penalty, scaled)
+
+        # Milestone sync reward
+        synced = milestones > 0
+        max_milestone = milestones[synced].max() if synced.any() else 0.0
+        if max_milestone:
+            self.sync_factor = np.where(synced, milestones / max_milestone, 0.0)
+        else:
+            self.sync_factor = np.zeros_like(milestones)
+        self.sync_reward = policy.milestone_sync_reward * self.sync_factor
+
+        # Volume bonus
+        threshold = policy.transaction_volume_threshold
+        high_volume = tx >= threshold
+        log_scale = np.log10(np.where(high_volume, tx, 0.0) / threshold + 1)
+        self.volume_bonus = np.where(high_volume,
+                                     1.0 + (policy.volume_bonus_multiplier - 1.0) * np.minimum(1.0, log_scale),
+                                     1.0)
+
+        # Final reward; round() is applied per element to match the scalar path bit for bit
+        raw = (self.base_reward * self.uptime_factor * self.latency_factor * self.volume_bonus) + self.sync_reward
+        self.reward = np.array([round(value, 4) for value in raw.tolist()], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.node_names)
+
+    def rewards(self):
+        """Return the final rewards as a dict of node name to amount."""
+        return dict(zip(self.node_names, self.reward.tolist()))
+
+    def reasons(self):
+        """Return a lazy mapping of node name to reward reason."""
+        return RewardReasons(self)
+
+    def details(self):
+        """Return the per-node factor breakdown as a list of dicts."""
+        columns = zip(self.node_names, self.reward.tolist(), self.base_reward.tolist(),
+                      self.uptime_factor.tolist(), self.latency_factor.tolist(), self.sync_factor.tolist(),
+                      self.sync_reward.tolist(), self.volume_bonus.tolist())
+        details = [
+            {
+                'node_name': node_name,
+                'reward': reward,
+                'reason': self.reason(i),
+                'base_reward': base_reward,
+                'uptime_factor': uptime_factor,
+                'latency_factor': latency_factor,
+                'sync_factor': sync_factor,
+                'sync_reward': sync_reward,
+                'volume_bonus': volume_bonus
+            }
+            for i, (node_name, reward, base_reward, uptime_factor, latency_factor,
+                    sync_factor, sync_reward, volume_bonus) in enumerate(columns)
+        ]
+        for percent, values in self.latency_percentiles.items():
+            for detail, value in zip(details, values.tolist()):
+                detail[f'latency_p{percent}'] = None if np.isnan(value) else value
+        return details
+
+    def reason(self, i):
+        """Render the reward reason of the node at position i."""
+        return (
+            f"Base: {float(self.base_reward[i]):.4f} × "
+            f"Uptime({self.uptime[i]}s): {float(self.uptime_factor[i]):.2f} × "
+            f"Latency({self.avg_latency[i]:.1f}ms): {float(self.latency_factor[i]):.2f} × "
+            f"Volume({self.recent_tx[i]}tx): {float(self.volume_bonus[i]):.2f} + "
+            f"Sync({float(self.sync_factor[i]):.2f}): {float(self.sync_reward[i]):.4f}"
+        )
+
+def compute_rewards_batch(node_metrics, interval_seconds=None, policy=None):
+    """Compute rewards for all nodes in one vectorized pass.
+
+    node_metrics maps node names to the dicts returned by
+    get_node_performance_metrics (recent_transactions, uptime_seconds,
+    avg_latency, latest_milestone, and optionally latency_p50/p95/p99).
+    The constants come from policy (default: the module constants).
+    """
+    names = list(node_metrics)
+    metrics = [node_metrics[name] for name in names]
+    latency_percentiles = {
+        percent: [m.get(f'latency_p{percent}') for m in metrics]
+        for percent in LATENCY_PERCENTILES
+        if any(f'latency_p{percent}' in m for m in metrics)
+    }
+    return RewardBatch(
+        names,
+        [m['recent_transactions'] for m in metrics],
+        [m['uptime_seconds'] for m in metrics],
+        [m['avg_latency'] for m in metrics],
+        [m['latest_milestone'] for m in metrics],
+        interval_seconds=interval_seconds,
+        latency_percentiles=latency_percentiles,
+        policy=policy,
+    )
@@ -0,0 +1,436 @@
+import argparse
+import csv
+import gzip
+import heapq
+import json
+import math
+import random
+import time
+
+import numpy as np
+
+from metrics_aggregator import NodeMetricsAggregator
+from mock_hornet import LatencyDistribution
+from reward_engine import RewardPolicy, compute_rewards_batch
+from rolling_window import RollingWindowCounter
+
+# Default simulation configuration
+SIM_HOURS = 168  # Simulated time per run (one week, in hours)
+MILESTONE_INTERVAL = 5.0  # Time between two milestones of the simulated network (in seconds)
+POLL_INTERVAL = 5.0  # Time between two polls of a node by the simulated collector (in seconds)
+OUTPUTS_PER_MILESTONE = 20  # Average number of outputs confirmed per milestone
+OUTPUTS_SPREAD = 0.25  # Standard deviation of the outputs per milestone, relative to the average
+MAX_BACKFILL_MILESTONES = 1000  # Missed milestones a recovering node backfills, as in rwd.py
+TRAJECTORY_FILE = "reward_trajectories.csv"  # Per-node reward trajectories written by the command line
+
+# Event kinds, in the order they are handled when they fall on the same instant
+MILESTONE, RESPONSE, POLL, FAILURE, RECOVERY, REWARD = range(6)
+
+
+def gini(values):
+    """Return the Gini coefficient of non-negative values (0 = equal, 1 = one node gets everything)."""
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    total = values.sum()
+    if len(values) == 0 or total <= 0:
+        return 0.0
+    ranks = np.arange(1, len(values) + 1)
+    return float((2 * ranks - len(values) - 1) @ values / (len(values) * total))
+
+
+def max_min_ratio(values):
+    """Return max/min of the values; inf when a value is 0 and another is not."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0 or values.max() <= 0:
+        return 1.0
+    return float(values.max() / values.min()) if values.min() > 0 else math.inf
+
+
+class VirtualClock:
+    """Simulated time; stands in for time.time() and only moves when an event is handled."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+
+class SimNode:
+    """Behaviour of one simulated node.
+
+    latency is a LatencyDistribution of response times. failure_rate is the
+    share of polls that fail while the node is up. With mean_uptime set, the
+    node goes down after exponentially distributed up times and comes back
+    after exponentially distributed down times (means in seconds).
+    milestone_lag is how many milestones the node trails the network.
+    """
+
+    def __init__(self, name, latency=None, failure_rate=0.0, mean_uptime=None, mean_downtime=600.0,
+                 milestone_lag=0):
+        self.name = name
+        self.latency = latency or LatencyDistribution("constant", 20)
+        self.failure_rate = failure_rate
+        self.mean_uptime = mean_uptime
+        self.mean_downtime = mean_downtime
+        self.milestone_lag = milestone_lag
+
+
+def synthetic_fleet(count, seed=0):
+    """Return count SimNodes with varied behaviour: log-uniform median latencies
+    from 10 to 1000 ms, occasional failed polls, daily outages and some lag."""
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(count):
+        median_ms = 10 ** rng.uniform(1, 3)
+        nodes.append(SimNode(
+            f"Hornet-{i + 1}",
+            latency=LatencyDistribution("lognormal", median_ms, 0.5),
+            failure_rate=rng.choice((0.0, 0.001, 0.01, 0.05)),
+            mean_uptime=rng.choice((None, 86400.0, 6 * 3600.0)),
+            mean_downtime=rng.choice((60.0, 600.0, 3600.0)),
+            milestone_lag=rng.choice((0, 0, 0, 1, 3)),
+        ))
+    return nodes
+
+
+class SimulationResult:
+    """Reward trajectories of one run: one row per reward cycle, one column per node.
+
+    Besides the rewards, the metrics each cycle was computed from are kept
+    (recent_transactions, uptime_seconds, avg_latency, latest_milestone),
+    so the same dataset can be re-evaluated under other policies.
+    """
+
+    METRICS = ("recent_transactions", "uptime_seconds", "avg_latency", "latest_milestone")
+
+    def __init__(self, node_names, policy, times, rewards, metrics, wall_seconds=0.0):
+        self.node_names = list(node_names)
+        self.policy = policy
+        self.times = np.asarray(times, dtype=np.float64)
+        self.rewards = np.asarray(rewards, dtype=np.float64).reshape(len(self.times), len(self.node_names))
+        self.metrics = {name: np.asarray(values, dtype=np.float64).reshape(self.rewards.shape)
+                        for name, values in metrics.items()}
+        self.wall_seconds = wall_seconds
+
+    def balances(self):
+        """Return the cumulative reward balance of every node after each cycle."""
+        return np.cumsum(self.rewards, axis=0)
+
+    def summary(self):
+        """Return totals per node and the fairness statistics of the final balances."""
+        totals = self.rewards.sum(axis=0)
+        simulated_hours = float(self.times[-1] - self.times[0]) / 3600 if len(self.times) else 0.0
+        return {
+            'policy': self.policy.as_dict(),
+            'cycles': len(self.times),
+            'simulated_hours': round(simulated_hours, 2),
+            'wall_seconds': round(self.wall_seconds, 3),
+            'total_reward': float(totals.sum()),
+            'gini': gini(totals),
+            'max_min_ratio': max_min_ratio(totals),
+            'nodes': dict(zip(self.node_names, totals.tolist())),
+        }
+
+    def trajectory_rows(self, label=None):
+        """Yield one dict per cycle and node, with the reward, balance and input metrics."""
+        balances = self.balances()
+        for cycle, timestamp in enumerate(self.times.tolist()):
+            for i, node_name in enumerate(self.node_names):
+                row = {'policy': label, 'time': timestamp, 'node_name': node_name,
+                       'reward': float(self.rewards[cycle, i]), 'balance': float(balances[cycle, i])}
+                for name in self.METRICS:
+                    row[name] = float(self.metrics[name][cycle, i])
+                yield row
+
+    def save_npz(self, path):
+        """Save the per-cycle metrics and rewards as a columnar .npz dataset."""
+        np.savez_compressed(path, node_names=np.array(self.node_names), times=self.times,
+                            rewards=self.rewards, policy=json.dumps(self.policy.as_dict()),
+                            **self.metrics)
+
+
+def write_trajectories(path, results):
+    """Write the trajectories of {label: SimulationResult} to one CSV file."""
+    fields = ['policy', 'time', 'node_name', 'reward', 'balance'] + list(SimulationResult.METRICS)
+    with open(path, "w", newline="") as output:
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+        for label, result in results.items():
+            writer.writerows(result.trajectory_rows(label))
+
+
+def load_trace(path):
+    """Read a recorded behaviour trace (JSON lines, gzip-compressed if the name ends in .gz).
+
+    Each line is either a confirmed milestone,
+    {"type": "milestone", "time": t, "index": i, "outputs": n},
+    or a poll of a node,
+    {"type": "poll", "time": t, "node": name, "latency_ms": ms or null, "milestone": i or null},
+    where a null latency marks a failed poll. Optional
+    {"type": "start", "time": t} and {"type": "end", "time": t} lines mark
+    where the recording started and stopped.
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt") as trace:
+        return [json.loads(line) for line in trace if line.strip()]
+
+
+def write_trace(path, events):
+    """Write trace events in the format read by load_trace()."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wt") as trace:
+        for event in events:
+            trace.write(json.dumps(event, separators=(",", ":")) + "\n")
+
+
+class RewardSimulation:
+    """Discrete-event simulation of the collector and its reward cycles.
+
+    Events (milestones, polls, poll responses, outages and reward cycles)
+    are handled in time order on a VirtualClock, so a week of network
+    activity takes seconds instead of a week. Polls update the same
+    NodeMetricsAggregator and RollingWindowCounter the collector uses, with
+    the same rules: the first node to ingest a milestone gets its outputs,
+    later nodes skip them as duplicates, and a failed poll records
+    max_latency_ms. The circuit breaker and adaptive polling are not
+    modelled; every node is polled each poll_interval.
+
+    Node behaviour is either synthetic, from SimNode models, or recorded,
+    from a trace (see load_trace()). With record_trace=True a synthetic run
+    keeps its trace in self.trace, so other policies can replay exactly the
+    same behaviour.
+    """
+
+    def __init__(self, nodes=None, policy=None, hours=SIM_HOURS, milestone_interval=MILESTONE_INTERVAL,
+                 poll_interval=POLL_INTERVAL, outputs_per_milestone=OUTPUTS_PER_MILESTONE,
+                 outputs_spread=OUTPUTS_SPREAD, seed=0, trace=None, record_trace=False, start_time=0.0):
+        if nodes is None and trace is None:
+            raise ValueError("Either node models or a trace are required")
+        self.policy = policy or RewardPolicy()
+        self.milestone_interval = milestone_interval
+        self.poll_interval = poll_interval
+        self.outputs_per_milestone = outputs_per_milestone
+        self.outputs_spread = outputs_spread
+        self.trace = trace
+        self.record_trace = record_trace and trace is None
+        self.rng = random.Random(seed)
+        self.clock = VirtualClock(start_time)
+
+        if trace is not None:
+            polls = [event for event in trace if event["type"] == "poll"]
+            self.node_names = sorted({event["node"] for event in polls})
+            self.nodes = {}
+            times = [event["time"] for event in trace]
+            self.start_time = min(times, default=start_time)
+            self.end_time = max(times, default=start_time)
+        else:
+            self.nodes = {node.name: node for node in nodes}
+            self.node_names = list(self.nodes)
+            self.start_time = start_time
+            self.end_time = start_time + hours * 3600
+
+        self.clock.now = self.start_time
+        self.aggregator = NodeMetricsAggregator()
+        self.aggregator.load((node_name, int(self.start_time), 0, 0.0, 0) for node_name in self.node_names)
+        self.recent_tx = RollingWindowCounter()
+        self.cursors = dict.fromkeys(self.node_names, 0)
+        self.up = dict.fromkeys(self.node_names, True)
+        self.latest_milestone = 0
+        self.outputs = {}  # Outputs per confirmed milestone
+        self.claimed = set()  # Milestones some node has ingested
+        self.recorded = []
+        self._events = []
+        self._sequence = 0
+
+    def schedule(self, at, kind, *args):
+        self._sequence += 1
+        heapq.heappush(self._events, (at, kind, self._sequence, args))
+
+    def confirm_milestone(self, index, outputs):
+        self.latest_milestone = max(self.latest_milestone, index)
+        self.outputs[index] = outputs
+        if self.record_trace:
+            self.recorded.append({"type": "milestone", "time": self.clock.now, "index": index, "outputs": outputs})
+
+    def observe_poll(self, node_name, latency_ms, milestone):
+        """Apply a poll response the way poll_node() does: metrics first, then ingestion from the cursor."""
+        now = self.clock.now
+        if self.record_trace:
+            self.recorded.append({"type": "poll", "time": now, "node": node_name,
+                                  "latency_ms": latency_ms, "milestone": milestone})
+        if latency_ms is None:
+            self.aggregator.update(node_name, self.policy.max_latency_ms, None, now=now)
+            return
+        self.aggregator.update(node_name, latency_ms, milestone, now=now)
+        if not milestone:
+            return
+
+        cursor = self.cursors[node_name]
+        if milestone <= cursor:
+            return
+        first_index = cursor + 1 if cursor else milestone
+        first_index = max(first_index, milestone - MAX_BACKFILL_MILESTONES + 1)
+        inserted = 0
+        for index in range(first_index, milestone + 1):
+            if index not in self.claimed and index in self.outputs:
+                self.claimed.add(index)
+                inserted += self.outputs[index]
+        self.cursors[node_name] = milestone
+        if inserted:
+            self.recent_tx.add(node_name, inserted, timestamp=now)
+
+    def reward_cycle(self, times, rewards, metrics):
+        now = self.clock.now
+        node_metrics = {}
+        for node_name in self.node_names:
+            uptime, avg_latency, latest_milestone = self.aggregator.get(node_name)
+            node_metrics[node_name] = {
+                'recent_transactions': self.recent_tx.total(node_name, now),
+                'uptime_seconds': uptime,
+                'avg_latency': avg_latency,
+                'latest_milestone': latest_milestone,
+            }
+        batch = compute_rewards_batch(node_metrics, policy=self.policy)
+        times.append(now)
+        rewards.append(batch.reward.tolist())
+        for name in SimulationResult.METRICS:
+            metrics[name].append([node_metrics[node_name][name] for node_name in self.node_names])
+
+    def _schedule_synthetic(self):
+        self.schedule(self.start_time + self.milestone_interval, MILESTONE)
+        for i, node_name in enumerate(self.node_names):
+            # Spread the first polls over one interval, like a collector started at a random moment
+            self.schedule(self.start_time + self.poll_interval * (i + 1) / len(self.node_names), POLL, node_name)
+            node = self.nodes[node_name]
+            if node.mean_uptime:
+                self.schedule(self.start_time + self.rng.expovariate(1 / node.mean_uptime), FAILURE, node_name)
+
+    def _schedule_trace(self):
+        for event in self.trace:
+            if event["type"] == "milestone":
+                self.schedule(event["time"], MILESTONE, event["index"], event["outputs"])
+            elif event["type"] == "poll":
+                self.schedule(event["time"], RESPONSE, event["node"], event["latency_ms"], event["milestone"])
+
+    def run(self):
+        """Run the simulation to the end and return a SimulationResult."""
+        started = time.perf_counter()
+        times, rewards = [], []
+        metrics = {name: [] for name in SimulationResult.METRICS}
+        rng = self.rng
+        spread = self.outputs_per_milestone * self.outputs_spread
+
+        if self.trace is not None:
+            self._schedule_trace()
+        else:
+            self._schedule_synthetic()
+        if self.record_trace:
+            self.recorded.append({"type": "start", "time": self.start_time})
+        interval = self.policy.reward_calculation_interval
+        self.schedule(self.start_time + interval, REWARD)
+
+        events = self._events
+        end_time = self.end_time
+        while events:
+            at, kind, _, args = heapq.heappop(events)
+            if at > end_time:
+                break
+            self.clock.now = at
+
+            if kind == MILESTONE:
+                if args:
+                    self.confirm_milestone(*args)
+                    continue
+                outputs = max(0, round(rng.gauss(self.outputs_per_milestone, spread))) if spread \
+                    else self.outputs_per_milestone
+                self.confirm_milestone(self.latest_milestone + 1, outputs)
+                self.schedule(at + self.milestone_interval, MILESTONE)
+
+            elif kind == POLL:
+                node_name = args[0]
+                node = self.nodes[node_name]
+                self.schedule(at + self.poll_interval, POLL, node_name)
+                if not self.up[node_name] or rng.random() < node.failure_rate:
+                    self.observe_poll(node_name, None, None)
+                    continue
+                latency_ms = node.latency.sample(rng)
+                milestone = max(0, self.latest_milestone - node.milestone_lag)
+                self.schedule(at + latency_ms / 1000, RESPONSE, node_name, latency_ms, milestone)
+
+            elif kind == RESPONSE:
+                self.observe_poll(*args)
+
+            elif kind == FAILURE:
+                node_name = args[0]
+                self.up[node_name] = False
+                self.schedule(at + rng.expovariate(1 / self.nodes[node_name].mean_downtime), RECOVERY, node_name)
+
+            elif kind == RECOVERY:
+                node_name = args[0]
+                self.up[node_name] = True
+                self.schedule(at + rng.expovariate(1 / self.nodes[node_name].mean_uptime), FAILURE, node_name)
+
+            elif kind == REWARD:
+                self.reward_cycle(times, rewards, metrics)
+                self.schedule(at + interval, REWARD)
+
+        if self.record_trace:
+            self.recorded.append({"type": "end", "time": end_time})
+        return SimulationResult(self.node_names, self.policy, times, rewards, metrics,
+                                wall_seconds=time.perf_counter() - started)
+
+
+def parse_policy(text):
+    """Parse "field=value,field=value" (field names as in RewardPolicy, any case) into a RewardPolicy."""
+    changes = {}
+    for assignment in filter(None, (part.strip() for part in text.split(","))):
+        field, _, value = assignment.partition("=")
+        changes[field.strip().lower()] = float(value)
+    return RewardPolicy(**changes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate reward cycles in virtual time and compare reward policies.")
+    parser.add_argument("--hours", type=float, default=SIM_HOURS, help="simulated hours per run")
+    parser.add_argument("--nodes", type=int, default=4, help="number of synthetic nodes")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the node models and their behaviour")
+    parser.add_argument("--milestone-interval", type=float, default=MILESTONE_INTERVAL, help="seconds per milestone")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL, help="seconds between polls of a node")
+    parser.add_argument("--outputs", type=float, default=OUTPUTS_PER_MILESTONE, help="average outputs per milestone")
+    parser.add_argument("--trace", help="replay a recorded behaviour trace instead of synthetic nodes")
+    parser.add_argument("--policy", action="append", default=[],
+                        help="policy to evaluate, e.g. base_reward_per_tx=0.02,latency_penalty_factor=0.5 "
+                             "(repeatable; the current constants are always included)")
+    parser.add_argument("--out", default=TRAJECTORY_FILE, help="CSV file for the per-node reward trajectories")
+    args = parser.parse_args()
+
+    policies = {"current": RewardPolicy()}
+    for text in args.policy:
+        policies[text] = parse_policy(text)
+
+    if args.trace:
+        trace = load_trace(args.trace)
+    else:
+        # Record the behaviour once, so every policy sees the same network
+        recorder = RewardSimulation(synthetic_fleet(args.nodes, args.seed), hours=args.hours,
+                                    milestone_interval=args.milestone_interval, poll_interval=args.poll_interval,
+                                    outputs_per_milestone=args.outputs, seed=args.seed, record_trace=True)
+        recorder.run()
+        trace = recorder.recorded
+
+    results = {}
+    for label, policy in policies.items():
+        results[label] = RewardSimulation(policy=policy, trace=trace).run()
+        summary = results[label].summary()
+        print(f"[SIM] {label}: {summary['cycles']} cycles over {summary['simulated_hours']}h "
+              f"in {summary['wall_seconds']:.2f}s, total {summary['total_reward']:.2f}, "
+              f"gini {summary['gini']:.3f}, max/min {summary['max_min_ratio']:.2f}")
+        for node_name, total in summary['nodes'].items():
+            print(f"  {node_name}: {total:.4f}")
+
+    write_trajectories(args.out, results)
+    print(f"[SIM] Wrote reward trajectories to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
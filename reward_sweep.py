@@ -0,0 +1,171 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from reward_engine import RewardBatch, RewardPolicy
+from reward_sim import RewardSimulation, gini, load_trace, max_min_ratio, synthetic_fleet
+
+# Default sweep configuration
+SWEEP_RESULT_FILE = "reward_sweep.npz"  # Columnar results written by the command line
+SWEEP_CHUNK_SIZE = 4  # Policies handed to a worker process at a time
+TOP_RESULTS = 5  # Policies printed after a sweep, fairest first
+
+# Dataset of the running worker process, set by _init_worker()
+_dataset = None
+
+
+def load_dataset(path):
+    """Load a sweep dataset.
+
+    A .npz file holds recorded per-cycle metrics, as written by
+    SimulationResult.save_npz(); each policy re-scores those cycles, so
+    reward_calculation_interval only changes the uptime ratio. Any other
+    file is a behaviour trace (see reward_sim.load_trace()), replayed in
+    full for each policy, so the interval also changes the cycle cadence.
+    """
+    if str(path).endswith(".npz"):
+        with np.load(path) as data:
+            return {'kind': 'metrics', 'node_names': data['node_names'].tolist(), 'times': data['times'],
+                    **{name: data[name] for name in ('recent_transactions', 'uptime_seconds',
+                                                     'avg_latency', 'latest_milestone')}}
+    return {'kind': 'trace', 'trace': load_trace(path)}
+
+
+def grid_policies(grid, base=None):
+    """Return a RewardPolicy for every combination of {field: [values]}."""
+    base = base or RewardPolicy()
+    fields = list(grid)
+    return [base.replace(**dict(zip(fields, values))) for values in itertools.product(*(grid[f] for f in fields))]
+
+
+def random_policies(ranges, count, seed=0, base=None):
+    """Return count policies with fields drawn uniformly from {field: (low, high)}."""
+    base = base or RewardPolicy()
+    rng = random.Random(seed)
+    return [base.replace(**{field: rng.uniform(low, high) for field, (low, high) in ranges.items()})
+            for _ in range(count)]
+
+
+def score_metrics(dataset, policy):
+    """Return the total reward per node of recorded cycles re-scored under a policy."""
+    totals = np.zeros(len(dataset['node_names']))
+    for cycle in range(len(dataset['times'])):
+        batch = RewardBatch(dataset['node_names'], dataset['recent_transactions'][cycle].tolist(),
+                            dataset['uptime_seconds'][cycle].tolist(), dataset['avg_latency'][cycle].tolist(),
+                            dataset['latest_milestone'][cycle].tolist(), policy=policy)
+        totals += batch.reward
+    return dataset['node_names'], totals
+
+
+def score_trace(dataset, policy):
+    """Return the total reward per node of a trace replayed under a policy."""
+    result = RewardSimulation(policy=policy, trace=dataset['trace']).run()
+    return result.node_names, result.rewards.sum(axis=0)
+
+
+def evaluate(policy, dataset=None):
+    """Evaluate one policy against the dataset; returns (node_names, totals, seconds)."""
+    dataset = dataset if dataset is not None else _dataset
+    started = time.perf_counter()
+    score = score_metrics if dataset['kind'] == 'metrics' else score_trace
+    node_names, totals = score(dataset, policy)
+    return node_names, np.asarray(totals, dtype=np.float64), time.perf_counter() - started
+
+
+def _init_worker(dataset):
+    global _dataset
+    _dataset = dataset
+
+
+def run_sweep(dataset, policies, workers=None, chunksize=SWEEP_CHUNK_SIZE):
+    """Evaluate policies in parallel on a process pool and return columnar results.
+
+    The dataset is sent to each worker once, at start-up. The result holds
+    one array per policy field, the totals per node (policies x nodes) and
+    the distribution statistics of every policy.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    if workers == 1:
+        outcomes = [evaluate(policy, dataset) for policy in policies]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dataset,)) as executor:
+            outcomes = list(executor.map(evaluate, policies, chunksize=chunksize))
+
+    node_names = outcomes[0][0] if outcomes else []
+    totals = np.array([outcome[1] for outcome in outcomes], dtype=np.float64).reshape(len(outcomes), len(node_names))
+    columns = {field: np.array([getattr(policy, field) for policy in policies], dtype=np.float64)
+               for field in RewardPolicy.FIELDS}
+    return {
+        **columns,
+        'node_names': np.array(node_names),
+        'node_totals': totals,
+        'total_reward': totals.sum(axis=1),
+        'mean_reward': totals.mean(axis=1) if len(node_names) else np.zeros(len(outcomes)),
+        'min_reward': totals.min(axis=1) if len(node_names) else np.zeros(len(outcomes)),
+        'max_reward': totals.max(axis=1) if len(node_names) else np.zeros(len(outcomes)),
+        'gini': np.array([gini(row) for row in totals]),
+        'max_min_ratio': np.array([max_min_ratio(row) for row in totals]),
+        'eval_seconds': np.array([outcome[2] for outcome in outcomes]),
+        'wall_seconds': np.float64(time.perf_counter() - started),
+    }
+
+
+def _parse_values(text):
+    field, _, values = text.partition("=")
+    return field.strip().lower(), values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate many reward policies against one dataset in parallel.")
+    parser.add_argument("--dataset", help="metrics dataset (.npz) or behaviour trace (.jsonl[.gz]); "
+                                          "a synthetic week is simulated if omitted")
+    parser.add_argument("--grid", action="append", default=[],
+                        help="field=v1,v2,... to sweep on a grid (repeatable)")
+    parser.add_argument("--range", action="append", default=[],
+                        help="field=low:high to sample uniformly with --samples (repeatable)")
+    parser.add_argument("--samples", type=int, default=0, help="number of random policies drawn from --range")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random policies and synthetic dataset")
+    parser.add_argument("--nodes", type=int, default=4, help="nodes of the synthetic dataset")
+    parser.add_argument("--hours", type=float, default=168, help="simulated hours of the synthetic dataset")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--out", default=SWEEP_RESULT_FILE, help="columnar .npz result file")
+    args = parser.parse_args()
+
+    if args.dataset:
+        dataset = load_dataset(args.dataset)
+    else:
+        simulation = RewardSimulation(synthetic_fleet(args.nodes, args.seed), hours=args.hours, seed=args.seed)
+        result = simulation.run()
+        dataset = {'kind': 'metrics', 'node_names': result.node_names, 'times': result.times, **result.metrics}
+
+    policies = []
+    if args.grid:
+        policies += grid_policies({field: [float(value) for value in values.split(",")]
+                                   for field, values in map(_parse_values, args.grid)})
+    if args.samples:
+        ranges = {field: tuple(float(bound) for bound in values.split(":"))
+                  for field, values in map(_parse_values, args.range)}
+        policies += random_policies(ranges, args.samples, args.seed)
+    if not policies:
+        policies = [RewardPolicy()]
+
+    results = run_sweep(dataset, policies, workers=args.workers)
+    np.savez_compressed(args.out, **results)
+    print(f"[SWEEP] Evaluated {len(policies)} policies in {float(results['wall_seconds']):.2f}s, wrote {args.out}")
+
+    for i in np.argsort(results['gini'])[:TOP_RESULTS]:
+        changed = {field: float(results[field][i]) for field in RewardPolicy.FIELDS
+                   if results[field][i] != getattr(RewardPolicy(), field)}
+        print(f"  gini {results['gini'][i]:.3f}, max/min {results['max_min_ratio'][i]:.2f}, "
+              f"total {results['total_reward'][i]:.2f}: {json.dumps(changed) if changed else 'current policy'}")
+
+
+if __name__ == "__main__":
+    main()
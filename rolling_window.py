@@ -0,0 +1,71 @@
+import threading
+import time
+
+# Window configuration
+BUCKET_SECONDS = 60  # Width of one bucket (one minute)
+WINDOW_BUCKETS = 60  # Buckets summed for the rolling count (one hour)
+
+
+def bucket_of(timestamp, bucket_seconds=BUCKET_SECONDS):
+    """Return the bucket number a unix timestamp falls into."""
+    return int(timestamp) // bucket_seconds
+
+
+class RollingWindowCounter:
+    """Per-node rolling counts kept in fixed-size ring buffers.
+
+    Every node owns WINDOW_BUCKETS slots; a slot is reused (and reset) once
+    its bucket falls out of the window, so memory and the cost of a rolling
+    total do not depend on how many events were ever counted.
+    """
+
+    def __init__(self, bucket_seconds=BUCKET_SECONDS, window_buckets=WINDOW_BUCKETS):
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self._counts = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _ring(self, node_name):
+        counts = self._counts.get(node_name)
+        if counts is None:
+            counts = self._counts[node_name] = [0] * self.window_buckets
+            self._buckets[node_name] = [-1] * self.window_buckets
+        return counts, self._buckets[node_name]
+
+    def add(self, node_name, count, timestamp=None, bucket=None):
+        """Add count events for a node at a timestamp (default: now) or bucket."""
+        if bucket is None:
+            bucket = bucket_of(time.time() if timestamp is None else timestamp, self.bucket_seconds)
+        slot = bucket % self.window_buckets
+
+        with self._lock:
+            counts, buckets = self._ring(node_name)
+            if buckets[slot] != bucket:
+                if buckets[slot] > bucket:
+                    # Older than the data already in the slot, outside the window
+                    return
+                buckets[slot] = bucket
+                counts[slot] = 0
+            counts[slot] += count
+
+    def total(self, node_name, timestamp=None):
+        """Return the number of events for a node within the window ending at timestamp."""
+        current = bucket_of(time.time() if timestamp is None else timestamp, self.bucket_seconds)
+        oldest = current - self.window_buckets
+
+        with self._lock:
+            counts = self._counts.get(node_name)
+            if counts is None:
+                return 0
+            buckets = self._buckets[node_name]
+            return sum(count for count, bucket in zip(counts, buckets) if oldest < bucket <= current)
+
+    def totals(self, timestamp=None):
+        """Return the rolling totals of all known nodes."""
+        return {node_name: self.total(node_name, timestamp) for node_name in list(self._counts)}
+
+    def load(self, rows):
+        """Seed the counter from (node_name, bucket, count) rows."""
+        for node_name, bucket, count in rows:
+            self.add(node_name, count, bucket=bucket)
@@ -1,8 +1,33 @@
 import requests
 import time
-import sqlite3
 import datetime
-import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitOpenError
+from api_capture import ResponseRecorder
+from collector_log import RateLimitedLogger
+from hornet_client import ClientRegistry
+from latency_histogram import PERCENTILES, LatencyHistogram, LatencyRecorder, prometheus_lines
+from metrics_aggregator import NodeMetricsAggregator
+from metrics_registry import MetricsRegistry, start_http_server
+from milestone_cache import MilestoneCache
+from mqtt_feed import MilestoneSubscriber, broker_url_for, mqtt_available
+from pipeline import MilestoneWriter, PeriodicScheduler
+from poll_scheduler import AdaptivePollScheduler, backoff_delay
+# The scalar reward functions are re-exported for existing callers
+from reward_engine import (
+    REWARD_CALCULATION_INTERVAL,
+    MAX_LATENCY_MS,
+    calculate_latency_factor,
+    calculate_milestone_sync_factor,
+    calculate_uptime_factor,
+    calculate_volume_bonus,
+    compute_rewards_batch,
+)
+from retention import incremental_vacuum_active, run_retention
+from rolling_window import BUCKET_SECONDS, WINDOW_BUCKETS, RollingWindowCounter, bucket_of
+from storage import bump_data_version, get_connection, migrate, transaction
 
 # HORNET Nodes Configuration
 NODES = {
@@ -35,90 +60,297 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
-# Database setup
-DB_NAME = "transactions.db"
+# Polling configuration
+REQUEST_TIMEOUT = 10  # Timeout for a single API request (in seconds)
+NODE_POLL_DEADLINE = 15  # Time budget for polling one node per cycle (in seconds)
+POLL_CYCLE_GRACE = 2  # Time a poll cycle waits past NODE_POLL_DEADLINE before leaving a slow node behind (in seconds)
+MAX_POLL_WORKERS = 16  # Maximum number of nodes polled concurrently
+POLL_INTERVAL = 5  # Assumed milestone interval until a node's cadence is learned (in seconds)
+MIN_POLL_INTERVAL = 0.5  # Shortest delay between two polls of a node (in seconds)
+MAX_POLL_INTERVAL = 30  # Longest delay between two polls of a healthy node (in seconds)
+POLL_LEAD = 0.25  # Poll this long after a node's next milestone is expected (in seconds)
+POLL_BACKOFF_BASE = 2  # First retry delay for a failing node or loop error (in seconds)
+POLL_BACKOFF_MAX = 300  # Maximum retry delay for a failing node or loop error (in seconds)
+MAX_BACKFILL_MILESTONES = 1000  # Maximum number of missed milestones fetched after a gap
+RETENTION_INTERVAL = 3600  # Roll up and archive old rows every hour (in seconds)
+STATUS_REPORT_INTERVAL = 300  # Print a status report every 5 minutes (in seconds)
+NODE_METRICS_FLUSH_INTERVAL = 15  # Write buffered node metrics and latency histograms this often (in seconds)
+REWARD_LATENCY_ENDPOINT = "node_info"  # Endpoint whose latency percentiles are passed to the reward engine
+
+# Ingestion pipeline configuration
+INGEST_QUEUE_SIZE = 256  # Fetched milestones buffered ahead of the database writer
+WRITER_BATCH_SIZE = 64  # Maximum number of milestones committed in one transaction
+WRITER_MAX_DELAY = 0.5  # Time the writer waits to fill a batch (in seconds)
+
+# MQTT configuration
+MQTT_ENABLED = False  # Ingest milestones as soon as nodes announce them (requires paho-mqtt)
+MQTT_BROKERS = {}  # Per-node broker URL overrides, e.g. {"Hornet-1": "mqtt://localhost:1883"}
+MQTT_FALLBACK_POLL_INTERVAL = 60  # Polling interval for nodes with a live subscription (in seconds)
+
+# HTTP client configuration
+HTTP_CONNECT_TIMEOUT = 3  # Timeout for establishing a connection (in seconds)
+HTTP_RETRIES = 2  # Retries for failed connections and transient server errors
+HTTP_BACKOFF_FACTOR = 0.2  # Exponential backoff factor between retries
+HTTP_POOL_SIZE = 4  # Keep-alive connections kept open per node
+
+# Circuit breaker configuration
+BREAKER_FAILURE_THRESHOLD = 3  # Consecutive failed requests before a node's circuit opens
+BREAKER_RESET_TIMEOUT = 30  # Time before an open circuit is probed with node_info (in seconds)
+BREAKER_MAX_RESET_TIMEOUT = 600  # Maximum probe delay after repeated failed probes (in seconds)
+
+# Logging and metrics configuration
+LOG_LEVEL = "INFO"  # Lowest level printed; DEBUG also prints every added and skipped transaction
+LOG_RATE = 5.0  # Log lines per second allowed per tag and node once the burst is used up
+LOG_BURST = 20  # Log lines per tag and node printed back to back before rate limiting starts
+COLLECTOR_METRICS_HOST = "127.0.0.1"  # Interface of the collector's Prometheus endpoint
+COLLECTOR_METRICS_PORT = 9109  # Port of the collector's /metrics endpoint (None disables it)
+
+# API capture configuration
+CAPTURE_FILE = None  # Append every API response to this gzip JSON-lines log for replay (None disables capture)
+
+# Time stamped on collected data (transactions, uptime, rolling counts). A
+# replay substitutes the recorded time; deadlines and scheduling keep using
+# time.time().
+clock = time.time
+
+# Latency histograms of every API call, per node and endpoint
+api_latency = LatencyRecorder()
+
+# Collector internals in the Prometheus text format, served on COLLECTOR_METRICS_PORT
+collector_metrics = MetricsRegistry()
+outputs_ingested_total = collector_metrics.counter(
+    "hornet_outputs_ingested_total", "Outputs written as new transactions", ("node",))
+outputs_skipped_total = collector_metrics.counter(
+    "hornet_outputs_skipped_total", "Outputs skipped as duplicate transactions", ("node",))
+milestones_ingested_total = collector_metrics.counter(
+    "hornet_milestones_ingested_total", "Milestones written with their transactions", ("node",))
+api_errors_total = collector_metrics.counter(
+    "hornet_api_errors_total", "Failed node API calls by reason", ("node", "endpoint", "reason"))
+log_suppressed_total = collector_metrics.counter(
+    "hornet_log_messages_suppressed_total", "Log lines dropped by rate limiting", ("tag",))
+poll_cycle_seconds = collector_metrics.histogram(
+    "hornet_poll_cycle_duration_seconds", "Duration of one poll of the due nodes")
+task_duration_seconds = collector_metrics.histogram(
+    "hornet_task_duration_seconds", "Duration of scheduled maintenance tasks", ("task",))
+db_write_seconds = collector_metrics.histogram(
+    "hornet_db_write_duration_seconds", "Duration of database write transactions", ("operation",))
+
+log = RateLimitedLogger(level=LOG_LEVEL, rate=LOG_RATE, burst=LOG_BURST,
+                        on_suppressed=lambda tag, count: log_suppressed_total.inc(count, tag=tag))
+
+def create_node_clients():
+    """Create the node client registry, with new circuit breakers, recording latencies in api_latency."""
+    return ClientRegistry(
+        headers=HEADERS,
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=REQUEST_TIMEOUT,
+        retries=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        pool_maxsize=HTTP_POOL_SIZE,
+        latency_recorder=api_latency,
+        on_request_error=lambda *error: record_api_error(*error),
+        on_response=lambda *response: record_api_response(*response),
+        breaker_options={
+            'failure_threshold': BREAKER_FAILURE_THRESHOLD,
+            'reset_timeout': BREAKER_RESET_TIMEOUT,
+            'max_reset_timeout': BREAKER_MAX_RESET_TIMEOUT,
+            'probe_paths': (API_ENDPOINTS['node_info'],),
+            'on_state_change': lambda *change: record_node_health(*change),
+        },
+    )
+
+# One pooled keep-alive client per node, shared by all API calls. Requests to
+# a failing node are short-circuited until a node_info probe succeeds.
+node_clients = create_node_clients()
+
+# Milestone payloads shared between nodes
+MILESTONE_CACHE_SIZE = 256  # Maximum number of milestones kept in memory
+milestone_cache = MilestoneCache(maxsize=MILESTONE_CACHE_SIZE)
+
+# Serializes polls of the same node (periodic poll vs. MQTT trigger)
+node_locks = {}
+node_locks_guard = threading.Lock()
 
-# Reward configuration
-REWARD_CALCULATION_INTERVAL = 300  # Calculate rewards every 5 minutes (in seconds)
-BASE_REWARD_PER_TX = 0.01  # Base reward tokens per transaction
-UPTIME_REWARD_FACTOR = 0.5  # Additional reward factor for uptime
-MILESTONE_SYNC_REWARD = 0.2  # Reward for being in sync with milestones
-TRANSACTION_VOLUME_THRESHOLD = 100  # Minimum transactions for bonus rewards
-VOLUME_BONUS_MULTIPLIER = 1.2  # Bonus multiplier for high transaction volume
-MAX_LATENCY_MS = 5000  # Maximum acceptable latency in milliseconds
-LATENCY_PENALTY_FACTOR = 0.8  # Penalty factor for high latency
+# Periodic polls still running after their cycle gave up on them, by node
+straggler_polls = {}
+
+# Live node metrics; written to the node_metrics table by flush_node_metrics()
+node_metrics_aggregator = NodeMetricsAggregator()
+
+# Rolling one-hour transaction counts, mirrored in the tx_minute_buckets table
+recent_tx_counter = RollingWindowCounter(bucket_seconds=BUCKET_SECONDS, window_buckets=WINDOW_BUCKETS)
+
+# Response log written while CAPTURE_FILE is set, opened by process_transactions()
+api_capture = None
+
+# Stages of the ingestion pipeline, created by process_transactions(). Without
+# a writer, milestones are written inline by the thread that fetched them.
+milestone_writer = None
+maintenance_scheduler = None
+
+# In-memory collector state replaced by reset_state()
+STATE_NAMES = ("api_latency", "node_clients", "milestone_cache", "node_locks", "straggler_polls",
+               "node_metrics_aggregator", "recent_tx_counter")
+
+def reset_state():
+    """Replace the collector's in-memory state with new, empty instances.
+
+    Lets a simulation or benchmark run several times in one process without
+    cached milestone payloads, aggregated metrics, rolling counts or breaker
+    states of an earlier run. Call init_db() afterwards to load the state of
+    the current database. Returns the previous state for restore_state().
+    The Prometheus counters are cumulative and are not reset.
+    """
+    global api_latency, node_clients, milestone_cache, node_locks, straggler_polls
+    global node_metrics_aggregator, recent_tx_counter
+    saved = tuple(globals()[name] for name in STATE_NAMES)
+    api_latency = LatencyRecorder()
+    node_clients = create_node_clients()
+    milestone_cache = MilestoneCache(maxsize=MILESTONE_CACHE_SIZE)
+    node_locks = {}
+    straggler_polls = {}
+    node_metrics_aggregator = NodeMetricsAggregator()
+    recent_tx_counter = RollingWindowCounter(bucket_seconds=BUCKET_SECONDS, window_buckets=WINDOW_BUCKETS)
+    return saved
+
+def restore_state(saved):
+    """Close the current node clients and put back the state returned by reset_state()."""
+    node_clients.close_all()
+    globals().update(zip(STATE_NAMES, saved))
+
+# Circuit states as gauge values
+HEALTH_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+def writer_stat(*keys):
+    """Return a statistic of the running milestone writer, or {} (no sample) when it is stopped."""
+    if milestone_writer is None:
+        return {}
+    value = milestone_writer.stats()
+    for key in keys:
+        value = value[key]
+    return value
+
+def node_health_values():
+    """Return the circuit state of every node as {(node_name,): 0 closed, 1 half-open, 2 open}."""
+    values = {}
+    for node_name in NODES.keys():
+        breaker = node_clients.breaker(node_name)
+        if breaker is not None:
+            values[(node_name,)] = HEALTH_STATE_VALUES.get(breaker.state, 0)
+    return values
+
+collector_metrics.gauge("hornet_ingest_queue_depth", "Milestones waiting for the database writer",
+                        callback=lambda: writer_stat('queue', 'depth'))
+collector_metrics.gauge("hornet_ingest_queue_capacity", "Capacity of the ingest queue",
+                        callback=lambda: writer_stat('queue', 'capacity'))
+collector_metrics.gauge("hornet_ingest_queue_high_water", "Deepest the ingest queue has been",
+                        callback=lambda: writer_stat('queue', 'high_water'))
+collector_metrics.counter("hornet_ingest_queue_blocked_seconds_total", "Time fetchers waited on a full ingest queue",
+                          callback=lambda: writer_stat('queue', 'blocked_seconds'))
+collector_metrics.counter("hornet_writer_batches_total", "Batches committed by the milestone writer",
+                          callback=lambda: writer_stat('batches'))
+collector_metrics.counter("hornet_writer_failed_batches_total", "Batches the milestone writer gave up on",
+                          callback=lambda: writer_stat('failed_batches'))
+collector_metrics.gauge("hornet_node_health_state", "Circuit state per node (0 closed, 1 half-open, 2 open)",
+                        ("node",), callback=node_health_values)
+collector_metrics.counter("hornet_milestone_cache_hits_total", "Milestone payloads served from the cache",
+                          callback=lambda: milestone_cache.hits)
+collector_metrics.counter("hornet_milestone_cache_misses_total", "Milestone payloads downloaded from a node",
+                          callback=lambda: milestone_cache.misses)
+collector_metrics.add_collector(lambda: prometheus_lines(
+    "hornet_api_latency_seconds", "Round-trip time of node API calls", api_latency.snapshot()))
 
 def init_db():
-    """Initialize the database with tables for transactions, counters, and rewards."""
-    conn = sqlite3.connect(DB_NAME)
+    """Initialize the database schema and the default rows for all nodes."""
+    for version, description in migrate():
+        print(f"[STARTUP] Applied schema migration {version}: {description}")
+
+    if not incremental_vacuum_active():
+        print("[WARNING] Incremental vacuum is inactive: retention frees no disk space until the database "
+              "is rebuilt once with `python retention.py enable-incremental-vacuum` (collector stopped)")
+
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        # Insert default counter values for nodes if not present
+        for node in NODES.keys():
+            cursor.execute("INSERT OR IGNORE INTO counters (node_name, count) VALUES (?, 0)", (node,))
+            cursor.execute("INSERT OR IGNORE INTO node_metrics (node_name) VALUES (?)", (node,))
+            cursor.execute("INSERT OR IGNORE INTO milestone_cursors (node_name) VALUES (?)", (node,))
+            cursor.execute("INSERT OR IGNORE INTO reward_balance (node_name, balance) VALUES (?, 0)", (node,))
+
+    load_node_metrics()
+    load_latency_histograms()
+    load_recent_tx_counter()
+    restore_node_health()
+
+def load_node_metrics():
+    """Load the persisted node metrics into the in-memory aggregator."""
+    conn = get_connection()
     cursor = conn.cursor()
+    cursor.execute("SELECT node_name, last_seen, uptime_seconds, avg_latency, latest_milestone FROM node_metrics")
+    node_metrics_aggregator.load(cursor.fetchall())
 
-    # Table for transactions - Added explicit timestamp column
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS transactions (
-            id TEXT PRIMARY KEY,
-            node_name TEXT,
-            milestone_index INTEGER,
-            timestamp INTEGER DEFAULT (strftime('%s', 'now'))
-        )
-    """)
+def load_latency_histograms():
+    """Load the persisted latency histograms, so percentiles survive restarts."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT node_name, endpoint, counts, count, sum_ms FROM latency_histograms")
+    api_latency.load(cursor.fetchall())
+    api_latency.start_window()
 
-    # Table for tracking transaction counts per node
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS counters (
-            node_name TEXT PRIMARY KEY,
-            count INTEGER DEFAULT 0
-        )
-    """)
+def load_recent_tx_counter():
+    """Seed the in-memory rolling counter from the persisted minute buckets."""
+    oldest_bucket = bucket_of(clock()) - WINDOW_BUCKETS
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT node_name, minute, count FROM tx_minute_buckets WHERE minute > ?", (oldest_bucket,))
+    recent_tx_counter.load(cursor.fetchall())
 
-    # Table for tracking node performance metrics
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS node_metrics (
-            node_name TEXT PRIMARY KEY,
-            last_seen INTEGER DEFAULT (strftime('%s', 'now')),
-            uptime_seconds INTEGER DEFAULT 0,
-            avg_latency REAL DEFAULT 0,
-            latest_milestone INTEGER DEFAULT 0
-        )
-    """)
+def restore_node_health():
+    """Resume the circuit breaker state persisted for each node."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT node_name, health_state, health_changed_at FROM node_metrics")
+    for node_name, health_state, changed_at in cursor.fetchall():
+        breaker = node_clients.breaker(node_name)
+        if breaker is not None and node_name in NODES:
+            breaker.restore(health_state, changed_at)
 
-    # Table for rewards history
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS rewards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            node_name TEXT,
-            reward_amount REAL,
-            reason TEXT,
-            timestamp INTEGER DEFAULT (strftime('%s', 'now'))
-        )
-    """)
+def record_node_health(node_name, old_state, new_state):
+    """Persist a circuit breaker transition so the dashboard can show it."""
+    log.info(f"{node_name} - Circuit {old_state} -> {new_state}", tag="HEALTH", key=node_name)
+    with transaction() as conn:
+        conn.execute("""
+            UPDATE node_metrics
+            SET health_state = ?, health_changed_at = ?
+            WHERE node_name = ?
+        """, (new_state, int(clock()), node_name))
+        bump_data_version(conn)
 
-    # Table for reward balance
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS reward_balance (
-            node_name TEXT PRIMARY KEY,
-            balance REAL DEFAULT 0
-        )
-    """)
+def record_api_error(node_name, endpoint, reason):
+    """Count a failed API call; called by the node clients."""
+    api_errors_total.inc(node=node_name, endpoint=endpoint, reason=reason)
 
-    # Insert default counter values for nodes if not present
-    for node in NODES.keys():
-        cursor.execute("INSERT OR IGNORE INTO counters (node_name, count) VALUES (?, 0)", (node,))
-        cursor.execute("INSERT OR IGNORE INTO node_metrics (node_name) VALUES (?)", (node,))
-        cursor.execute("INSERT OR IGNORE INTO reward_balance (node_name, balance) VALUES (?, 0)", (node,))
-    
-    conn.commit()
-    conn.close()
+def record_api_response(node_name, node_url, method, path, endpoint, response, latency_ms, error=None):
+    """Append an API response to the capture log, if capture is on; called by the node clients."""
+    capture = api_capture
+    if capture is not None:
+        capture.record(node_name, node_url, method, path, endpoint, response, latency_ms, error)
 
-def get_latest_milestone(node_name, node_url):
+def prune_minute_buckets():
+    """Delete persisted minute buckets that fell out of the rolling window."""
+    oldest_bucket = bucket_of(clock()) - WINDOW_BUCKETS
+    with transaction() as conn:
+        conn.execute("DELETE FROM tx_minute_buckets WHERE minute <= ?", (oldest_bucket,))
+
+def get_latest_milestone(node_name, node_url, timeout=None):
     """Fetch the latest milestone index for a node."""
-    start_time = time.time()
-    url = f"{node_url}{API_ENDPOINTS['node_info']}"
+    client = node_clients.get(node_name, node_url)
     
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        end_time = time.time()
-        latency = (end_time - start_time) * 1000  # Convert to milliseconds
+        response = client.get(API_ENDPOINTS['node_info'], timeout=timeout, endpoint='node_info')
+        latency = response.latency_ms
 
         if response.status_code == 200:
             data = response.json()
@@ -129,72 +361,109 @@ def get_latest_milestone(node_name, node_url):
             
             return milestone_index
         
-        print(f"[ERROR] {node_name} - Failed to fetch latest milestone ({response.status_code}): {response.text}")
+        log.error(f"{node_name} - Failed to fetch latest milestone ({response.status_code}): {response.text}", key=node_name)
         return None
     
+    except CircuitOpenError:
+        # The failures that opened the circuit were already recorded
+        return None
     except requests.exceptions.RequestException as e:
-        print(f"[ERROR] {node_name} - Connection error: {str(e)}")
+        log.error(f"{node_name} - Connection error: {str(e)}", key=node_name)
         update_node_metrics(node_name, MAX_LATENCY_MS, None)  # Mark as high latency
         return None
 
 def update_node_metrics(node_name, latency=None, milestone_index=None):
-    """Update the metrics for a node."""
-    conn = sqlite3.connect(DB_NAME)
+    """Update the metrics for a node.
+
+    The update only changes the in-memory aggregator; flush_node_metrics()
+    writes all changed nodes to the database in one transaction.
+    """
+    node_metrics_aggregator.update(node_name, latency, milestone_index, now=clock())
+
+def flush_node_metrics():
+    """Write the node metrics and latency histograms changed since the last flush to the database."""
+    with db_write_seconds.time(operation="node_metrics"):
+        flushed = node_metrics_aggregator.flush()
+    flush_latency_histograms()
+    return flushed
+
+def flush_latency_histograms():
+    """Write the latency histograms changed since the last flush in one transaction."""
+    dirty = api_latency.take_dirty()
+    if not dirty:
+        return 0
+
+    current_time = int(clock())
+    try:
+        with db_write_seconds.time(operation="latency_histograms"), transaction() as conn:
+            conn.executemany("""
+                INSERT INTO latency_histograms (node_name, endpoint, counts, count, sum_ms, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(node_name, endpoint) DO UPDATE SET
+                    counts = excluded.counts,
+                    count = excluded.count,
+                    sum_ms = excluded.sum_ms,
+                    updated_at = excluded.updated_at
+            """, [(node_name, endpoint, histogram.to_json(), histogram.count, histogram.sum_ms, current_time)
+                  for (node_name, endpoint), histogram in dirty.items()])
+            bump_data_version(conn)
+    except Exception:
+        api_latency.mark_dirty(dirty)
+        raise
+    return len(dirty)
+
+def get_latency_percentiles(endpoint=REWARD_LATENCY_ENDPOINT):
+    """Return {node_name: {'latency_p50': ms, ...}} for the current reward cycle."""
+    window = api_latency.window(endpoint)
+    empty = LatencyHistogram()
+    return {
+        node_name: {f'latency_p{percent}': window.get(node_name, empty).percentile(percent)
+                    for percent in PERCENTILES}
+        for node_name in NODES.keys()
+    }
+
+def get_milestone_cursor(node_name):
+    """Get the index of the last milestone processed for a node."""
+    conn = get_connection()
     cursor = conn.cursor()
-    
-    # Get current timestamp
-    current_time = int(time.time())
-    
-    # Get existing metrics
-    cursor.execute("SELECT last_seen, avg_latency FROM node_metrics WHERE node_name = ?", (node_name,))
+    cursor.execute("SELECT last_milestone FROM milestone_cursors WHERE node_name = ?", (node_name,))
     row = cursor.fetchone()
-    
-    if row:
-        last_seen, avg_latency = row
-        
-        # Calculate uptime (time since last check)
-        time_diff = current_time - last_seen
-        
-        # Update metrics
-        if latency is not None:
-            # Calculate new average latency (simple moving average)
-            if avg_latency > 0:
-                new_avg_latency = (avg_latency * 0.8) + (latency * 0.2)  # 80% old, 20% new
-            else:
-                new_avg_latency = latency
-            
-            cursor.execute("""
-                UPDATE node_metrics 
-                SET last_seen = ?, 
-                    uptime_seconds = uptime_seconds + ?, 
-                    avg_latency = ?
-                WHERE node_name = ?
-            """, (current_time, time_diff, new_avg_latency, node_name))
-        else:
-            cursor.execute("""
-                UPDATE node_metrics 
-                SET last_seen = ?, 
-                    uptime_seconds = uptime_seconds + ?
-                WHERE node_name = ?
-            """, (current_time, time_diff, node_name))
-        
-        # Update milestone index if provided
-        if milestone_index is not None:
-            cursor.execute("""
-                UPDATE node_metrics 
-                SET latest_milestone = ?
-                WHERE node_name = ?
-            """, (milestone_index, node_name))
-    
-    conn.commit()
-    conn.close()
+    return row[0] if row else 0
 
-def get_milestone_utxo_changes(node_name, node_url, milestone_index):
-    """Fetch transactions confirmed by a milestone."""
-    url = f"{node_url}{API_ENDPOINTS['milestone_utxo_changes'].format(milestone_index=milestone_index)}"
+def set_milestone_cursor(node_name, milestone_index, conn=None):
+    """Record the last milestone processed for a node.
+
+    Pass the connection of an open transaction to move the cursor atomically
+    with the milestone's writes.
+    """
+    statement = """
+        INSERT INTO milestone_cursors (node_name, last_milestone, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(node_name) DO UPDATE SET
+            last_milestone = MAX(last_milestone, excluded.last_milestone),
+            updated_at = excluded.updated_at
+    """
+    params = (node_name, milestone_index, int(clock()))
+    if conn is not None:
+        conn.execute(statement, params)
+    else:
+        with transaction() as conn:
+            conn.execute(statement, params)
+
+def get_fetch_cursor(node_name):
+    """Return the milestone fetching resumes after: the cursor, or a later milestone still queued for writing."""
+    last_processed = get_milestone_cursor(node_name)
+    if milestone_writer is not None:
+        last_processed = max(last_processed, milestone_writer.pending_milestone(node_name))
+    return last_processed
+
+def fetch_milestone_utxo_changes(node_name, node_url, milestone_index, timeout=None):
+    """Download the UTXO changes of a milestone from a node, bypassing the cache."""
+    client = node_clients.get(node_name, node_url)
+    path = API_ENDPOINTS['milestone_utxo_changes'].format(milestone_index=milestone_index)
     
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
+        response = client.get(path, timeout=timeout, endpoint='milestone_utxo_changes')
 
         if response.status_code == 200:
             milestone_data = response.json()
@@ -202,29 +471,56 @@ def get_milestone_utxo_changes(node_name, node_url, milestone_index):
             consumed_outputs = milestone_data.get("consumedOutputs", [])
             return created_outputs, consumed_outputs
         
-        print(f"[ERROR] {node_name} - Failed to fetch UTXO changes ({response.status_code}): {response.text}")
-        return None, None
+        log.error(f"{node_name} - Failed to fetch UTXO changes ({response.status_code}): {response.text}", key=node_name)
+        return None
     
     except requests.exceptions.RequestException as e:
-        print(f"[ERROR] {node_name} - Connection error when fetching UTXO changes: {str(e)}")
+        log.error(f"{node_name} - Connection error when fetching UTXO changes: {str(e)}", key=node_name)
+        return None
+
+def get_milestone_utxo_changes(node_name, node_url, milestone_index, timeout=None):
+    """Fetch transactions confirmed by a milestone.
+
+    The payload is shared through milestone_cache, so only the first node to
+    report a milestone downloads it. A timeout covers both waiting for
+    another node's download and fetching it here.
+    """
+    if timeout is None:
+        result = milestone_cache.get_or_fetch(
+            milestone_index,
+            lambda: fetch_milestone_utxo_changes(node_name, node_url, milestone_index),
+            timeout=REQUEST_TIMEOUT,
+        )
+    else:
+        deadline = time.time() + timeout
+
+        def fetch():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            return fetch_milestone_utxo_changes(node_name, node_url, milestone_index, timeout=remaining)
+
+        result = milestone_cache.get_or_fetch(milestone_index, fetch, timeout=timeout)
+    if result is None:
         return None, None
+    return result
 
 def get_node_tips(node_name, node_url):
     """Fetch the current tips from a node."""
-    url = f"{node_url}{API_ENDPOINTS['tips']}"
+    client = node_clients.get(node_name, node_url)
     
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
+        response = client.get(API_ENDPOINTS['tips'], endpoint='tips')
 
         if response.status_code == 200:
             tips_data = response.json()
             return tips_data.get("tips", [])
         
-        print(f"[ERROR] {node_name} - Failed to fetch tips ({response.status_code}): {response.text}")
+        log.error(f"{node_name} - Failed to fetch tips ({response.status_code}): {response.text}", key=node_name)
         return None
     
     except requests.exceptions.RequestException as e:
-        print(f"[ERROR] {node_name} - Connection error when fetching tips: {str(e)}")
+        log.error(f"{node_name} - Connection error when fetching tips: {str(e)}", key=node_name)
         return None
 
 def get_blocks_by_ids(node_name, node_url, block_ids):
@@ -232,59 +528,159 @@ def get_blocks_by_ids(node_name, node_url, block_ids):
     if not block_ids:
         return []
     
-    url = f"{node_url}{API_ENDPOINTS['blocks']}"
+    client = node_clients.get(node_name, node_url)
     
     try:
         # Use POST to fetch multiple blocks
-        response = requests.post(url, headers=HEADERS, json={"blockIds": block_ids}, timeout=10)
+        response = client.post(API_ENDPOINTS['blocks'], json={"blockIds": block_ids}, endpoint='blocks')
 
         if response.status_code == 200:
             return response.json().get("blocks", [])
         
-        print(f"[ERROR] {node_name} - Failed to fetch blocks ({response.status_code}): {response.text}")
+        log.error(f"{node_name} - Failed to fetch blocks ({response.status_code}): {response.text}", key=node_name)
         return []
     
     except requests.exceptions.RequestException as e:
-        print(f"[ERROR] {node_name} - Connection error when fetching blocks: {str(e)}")
+        log.error(f"{node_name} - Connection error when fetching blocks: {str(e)}", key=node_name)
         return []
 
 def transaction_exists(tx_id):
     """Check if a transaction already exists in the database."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT 1 FROM transactions WHERE id = ?", (tx_id,))
     exists = cursor.fetchone() is not None
-    conn.close()
     return exists
 
-def add_transaction(tx_id, node_name, milestone_index):
-    """Add a unique transaction to the database and update the counter."""
-    if not transaction_exists(tx_id):
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
-        # Insert the transaction
-        cursor.execute("INSERT INTO transactions (id, node_name, milestone_index) VALUES (?, ?, ?)", 
-                       (tx_id, node_name, milestone_index))
+def add_transactions(tx_ids, node_name, milestone_index):
+    """Add a milestone's transactions in one database transaction.
 
-        # Update the counter
-        cursor.execute("UPDATE counters SET count = count + 1 WHERE node_name = ?", (node_name,))
-        
-        # Get the updated count
-        cursor.execute("SELECT count FROM counters WHERE node_name = ?", (node_name,))
-        count = cursor.fetchone()[0]
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"[ADDED] {node_name} - Transaction {tx_id} (Total: {count})")
+    Duplicates are ignored by the primary key and the node counter is bumped
+    by the number of rows actually inserted. Returns (inserted, skipped).
+    """
+    if not tx_ids:
+        return 0, 0
+
+    current_time = int(clock())
+    bucket = bucket_of(current_time)
+
+    with db_write_seconds.time(operation="transactions"), transaction() as conn:
+        inserted = insert_transactions(conn, tx_ids, node_name, milestone_index, current_time)
+
+    if inserted:
+        recent_tx_counter.add(node_name, inserted, bucket=bucket)
+
+    return inserted, len(tx_ids) - inserted
 
+def insert_transactions(conn, tx_ids, node_name, milestone_index, current_time):
+    """Insert transactions inside an open transaction; returns the number of new rows.
+
+    The node counter and the rolling window bucket are updated in the same
+    transaction; the in-memory counter is left to the caller, after commit.
+    """
+    cursor = conn.cursor()
+    changes_before = conn.total_changes
+
+    cursor.executemany("INSERT OR IGNORE INTO transactions (id, node_name, milestone_index, timestamp) VALUES (?, ?, ?, ?)",
+                       ((tx_id, node_name, milestone_index, current_time) for tx_id in tx_ids))
+    inserted = conn.total_changes - changes_before
+
+    # Update the counter and the rolling window bucket
+    if inserted:
+        cursor.execute("UPDATE counters SET count = count + ? WHERE node_name = ?", (inserted, node_name))
+        cursor.execute("""
+            INSERT INTO tx_minute_buckets (node_name, minute, count)
+            VALUES (?, ?, ?)
+            ON CONFLICT(node_name, minute) DO UPDATE SET count = count + excluded.count
+        """, (node_name, bucket_of(current_time), inserted))
+
+    return inserted
+
+def write_milestone_batch(items):
+    """Write a batch of fetched (node_name, milestone_index, tx_ids) items in one transaction.
+
+    Each node's milestone cursor moves with its transactions, so a crash
+    never records a milestone as processed without its rows. Called by the
+    pipeline's writer thread.
+    """
+    current_time = int(clock())
+    results = []
+
+    with db_write_seconds.time(operation="milestone_batch"), transaction() as conn:
+        for node_name, milestone_index, tx_ids in items:
+            inserted = insert_transactions(conn, tx_ids, node_name, milestone_index, current_time) if tx_ids else 0
+            set_milestone_cursor(node_name, milestone_index, conn)
+            results.append((node_name, milestone_index, inserted, len(tx_ids) - inserted))
+        bump_data_version(conn)
+
+    bucket = bucket_of(current_time)
+    for node_name, milestone_index, inserted, skipped in results:
+        if inserted:
+            recent_tx_counter.add(node_name, inserted, bucket=bucket)
+        record_milestone_ingested(node_name, milestone_index, inserted, skipped)
+
+def record_milestone_ingested(node_name, milestone_index, inserted, skipped):
+    """Count and log a milestone whose transactions were written."""
+    milestones_ingested_total.inc(node=node_name)
+    if inserted:
+        outputs_ingested_total.inc(inserted, node=node_name)
+    if skipped:
+        outputs_skipped_total.inc(skipped, node=node_name)
+
+    if inserted or skipped:
+        log.info(f"{node_name} - Milestone {milestone_index}: {inserted} added, {skipped} skipped",
+                 tag="INGEST", key=node_name)
     else:
-        print(f"[SKIPPED] {node_name} - Duplicate Transaction {tx_id}")
+        log.info(f"{node_name} - No new transactions for milestone {milestone_index}.", key=node_name)
+
+def on_write_failed(items, error):
+    """Report a batch the writer gave up on; its milestones are fetched again."""
+    milestones = ", ".join(f"{node_name}#{milestone_index}" for node_name, milestone_index, _ in items)
+    log.error(f"Failed to write milestones {milestones}: {str(error)}")
+
+def add_transaction(tx_id, node_name, milestone_index):
+    """Add a unique transaction to the database and update the counter."""
+    inserted, skipped = add_transactions([tx_id], node_name, milestone_index)
+    if inserted:
+        outputs_ingested_total.inc(node=node_name)
+        log.debug(f"{node_name} - Transaction {tx_id}", tag="ADDED", key=node_name)
+    else:
+        outputs_skipped_total.inc(skipped, node=node_name)
+        log.debug(f"{node_name} - Duplicate Transaction {tx_id}", tag="SKIPPED", key=node_name)
+
+def get_all_node_performance_metrics():
+    """Get performance metrics for all configured nodes with a single query."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT c.node_name, c.count, m.uptime_seconds, m.avg_latency, m.latest_milestone
+        FROM counters c
+        JOIN node_metrics m ON m.node_name = c.node_name
+    """)
+    rows = {row[0]: row[1:] for row in cursor.fetchall()}
+    live_metrics = node_metrics_aggregator.snapshot()
+    latency_percentiles = get_latency_percentiles()
+    
+    node_metrics = {}
+    for node_name in NODES.keys():
+        tx_count, uptime, avg_latency, latest_milestone = rows[node_name]
+        # Prefer the live values over the last flushed ones
+        uptime, avg_latency, latest_milestone = live_metrics.get(node_name, (uptime, avg_latency, latest_milestone))
+        node_metrics[node_name] = {
+            'total_transactions': tx_count,
+            'recent_transactions': recent_tx_counter.total(node_name, clock()),
+            'uptime_seconds': uptime,
+            'avg_latency': avg_latency,
+            'latest_milestone': latest_milestone,
+            **latency_percentiles[node_name]
+        }
+    
+    return node_metrics
 
 def get_node_performance_metrics(node_name):
     """Get performance metrics for a specific node."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Get transaction count
@@ -298,18 +694,10 @@ def get_node_performance_metrics(node_name):
         WHERE node_name = ?
     """, (node_name,))
     uptime, avg_latency, latest_milestone = cursor.fetchone()
+    uptime, avg_latency, latest_milestone = node_metrics_aggregator.get(node_name) or (uptime, avg_latency, latest_milestone)
     
-    # Get transaction timestamps for recent period
-    current_time = int(time.time())
-    one_hour_ago = current_time - 3600
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM transactions 
-        WHERE node_name = ? AND timestamp > ?
-    """, (node_name, one_hour_ago))
-    recent_tx_count = cursor.fetchone()[0]
-    
-    conn.close()
+    # Transactions in the last hour, summed from the per-minute buckets
+    recent_tx_count = recent_tx_counter.total(node_name, clock())
     
     return {
         'total_transactions': tx_count,
@@ -319,140 +707,80 @@ def get_node_performance_metrics(node_name):
         'latest_milestone': latest_milestone
     }
 
-def calculate_milestone_sync_factor(node_metrics):
-    """Calculate how in-sync the nodes are with milestones."""
-    if not node_metrics:
-        return {}
-    
-    # Find the highest milestone index reported by any node
-    max_milestone = max(metrics['latest_milestone'] for metrics in node_metrics.values() if metrics['latest_milestone'])
-    
-    # Calculate sync factor for each node (1.0 = fully synced, lower = less synced)
-    sync_factors = {}
-    for node_name, metrics in node_metrics.items():
-        if max_milestone and metrics['latest_milestone']:
-            sync_factor = metrics['latest_milestone'] / max_milestone
-            sync_factors[node_name] = sync_factor
-        else:
-            sync_factors[node_name] = 0
-    
-    return sync_factors
+def calculate_reward_batch():
+    """Calculate the reward factors of all nodes as a RewardBatch."""
+    return compute_rewards_batch(get_all_node_performance_metrics(), REWARD_CALCULATION_INTERVAL)
 
-def calculate_latency_factor(avg_latency):
-    """Calculate a factor based on latency (lower latency = higher factor)."""
-    if avg_latency >= MAX_LATENCY_MS:
-        return LATENCY_PENALTY_FACTOR
-    
-    # Linear scale: 1.0 (best) to LATENCY_PENALTY_FACTOR (worst)
-    factor = 1.0 - ((1.0 - LATENCY_PENALTY_FACTOR) * (avg_latency / MAX_LATENCY_MS))
-    return max(LATENCY_PENALTY_FACTOR, factor)
+def calculate_rewards():
+    """Calculate rewards for all nodes based on their performance.
 
-def calculate_uptime_factor(uptime_seconds, interval_seconds):
-    """Calculate uptime factor based on expected interval."""
-    # Cap at 100% for the period
-    uptime_ratio = min(1.0, uptime_seconds / interval_seconds)
-    
-    # Apply UPTIME_REWARD_FACTOR
-    uptime_bonus = 1.0 + (UPTIME_REWARD_FACTOR * uptime_ratio)
-    return uptime_bonus
+    Returns the rewards and a mapping of reward reasons; the reasons are only
+    rendered when they are looked up.
+    """
+    batch = calculate_reward_batch()
+    return batch.rewards(), batch.reasons()
 
-def calculate_volume_bonus(tx_count):
-    """Calculate bonus for high transaction volume."""
-    if tx_count >= TRANSACTION_VOLUME_THRESHOLD:
-        # Logarithmic scaling for bonus to prevent excessive rewards for very high volume
-        bonus = 1.0 + (VOLUME_BONUS_MULTIPLIER - 1.0) * min(1.0, math.log10(tx_count / TRANSACTION_VOLUME_THRESHOLD + 1))
-        return bonus
-    return 1.0
+def record_rewards(rewards, reasons, batch=None):
+    """Record rewards in the database.
 
-def calculate_rewards():
-    """Calculate rewards for all nodes based on their performance."""
-    node_metrics = {}
-    rewards = {}
-    reward_reasons = {}
-    
-    # Get metrics for all nodes
-    for node_name in NODES.keys():
-        node_metrics[node_name] = get_node_performance_metrics(node_name)
-    
-    # Calculate milestone sync factors
-    sync_factors = calculate_milestone_sync_factor(node_metrics)
+    When the RewardBatch of the cycle is given, its factor breakdown is
+    stored as the latest reward snapshot in the same transaction, so the
+    dashboard can show it without recomputing rewards.
+    """
+    with db_write_seconds.time(operation="rewards"), transaction() as conn:
+        cursor = conn.cursor()
     
-    # Calculate rewards for each node
-    for node_name, metrics in node_metrics.items():
-        # Base transaction reward
-        base_reward = metrics['recent_transactions'] * BASE_REWARD_PER_TX
-        
-        # Uptime factor
-        uptime_factor = calculate_uptime_factor(metrics['uptime_seconds'], REWARD_CALCULATION_INTERVAL)
-        
-        # Latency factor (penalty for high latency)
-        latency_factor = calculate_latency_factor(metrics['avg_latency'])
-        
-        # Milestone sync reward
-        sync_factor = sync_factors.get(node_name, 0)
-        sync_reward = MILESTONE_SYNC_REWARD * sync_factor
+        for node_name, reward_amount in rewards.items():
+            reason = reasons.get(node_name, "Regular reward calculation")
         
-        # Volume bonus
-        volume_bonus = calculate_volume_bonus(metrics['recent_transactions'])
-        
-        # Calculate final reward
-        reward = (base_reward * uptime_factor * latency_factor * volume_bonus) + sync_reward
-        reward = round(reward, 4)  # Round to 4 decimal places
-        
-        rewards[node_name] = reward
+            # Record reward history
+            cursor.execute("""
+                INSERT INTO rewards (node_name, reward_amount, reason)
+                VALUES (?, ?, ?)
+            """, (node_name, reward_amount, reason))
         
-        # Store reason for reward calculation
-        reward_reasons[node_name] = (
-            f"Base: {base_reward:.4f} × "
-            f"Uptime({metrics['uptime_seconds']}s): {uptime_factor:.2f} × "
-            f"Latency({metrics['avg_latency']:.1f}ms): {latency_factor:.2f} × "
-            f"Volume({metrics['recent_transactions']}tx): {volume_bonus:.2f} + "
-            f"Sync({sync_factor:.2f}): {sync_reward:.4f}"
-        )
-    
-    return rewards, reward_reasons
+            # Update balance
+            cursor.execute("""
+                UPDATE reward_balance
+                SET balance = balance + ?
+                WHERE node_name = ?
+            """, (reward_amount, node_name))
 
-def record_rewards(rewards, reasons):
-    """Record rewards in the database."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    for node_name, reward_amount in rewards.items():
-        reason = reasons.get(node_name, "Regular reward calculation")
-        
-        # Record reward history
-        cursor.execute("""
-            INSERT INTO rewards (node_name, reward_amount, reason)
-            VALUES (?, ?, ?)
-        """, (node_name, reward_amount, reason))
-        
-        # Update balance
-        cursor.execute("""
-            UPDATE reward_balance
-            SET balance = balance + ?
-            WHERE node_name = ?
-        """, (reward_amount, node_name))
-    
-    conn.commit()
-    conn.close()
+        if batch is not None:
+            record_reward_snapshot(cursor, batch)
+
+        bump_data_version(conn)
+
+def record_reward_snapshot(cursor, batch):
+    """Replace the stored reward snapshot with the breakdown of a new cycle."""
+    cursor.execute("INSERT INTO reward_cycles (interval_seconds, timestamp) VALUES (?, ?)",
+                   (REWARD_CALCULATION_INTERVAL, int(clock())))
+    cycle_id = cursor.lastrowid
+
+    cursor.execute("DELETE FROM reward_snapshots")
+    cursor.executemany("""
+        INSERT INTO reward_snapshots (node_name, cycle_id, reward, reason, base_reward, uptime_factor,
+                                      latency_factor, sync_factor, sync_reward, volume_bonus)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, ((detail['node_name'], cycle_id, detail['reward'], detail['reason'], detail['base_reward'],
+           detail['uptime_factor'], detail['latency_factor'], detail['sync_factor'],
+           detail['sync_reward'], detail['volume_bonus']) for detail in batch.details()))
+
+    return cycle_id
 
 def get_reward_balances():
     """Get current reward balances for all nodes."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("SELECT node_name, balance FROM reward_balance")
     balances = {row[0]: row[1] for row in cursor.fetchall()}
     
-    conn.close()
     return balances
 
 def print_status_report():
     """Print a status report with current metrics and rewards."""
-    node_metrics = {}
-    for node_name in NODES.keys():
-        node_metrics[node_name] = get_node_performance_metrics(node_name)
-    
+    node_metrics = get_all_node_performance_metrics()
     balances = get_reward_balances()
     
     print("\n" + "="*80)
@@ -476,14 +804,38 @@ def print_status_report():
     for node_name, balance in balances.items():
         print(f"{node_name:<12} | {balance:<12.4f}")
     
+    pipeline_stats = get_pipeline_stats()
+    if pipeline_stats:
+        writer = pipeline_stats['writer']
+        ingest_queue = writer['queue']
+        print("\nPIPELINE:")
+        print("-" * 80)
+        print(f"Ingest queue: {ingest_queue['depth']}/{ingest_queue['capacity']} "
+              f"(high water {ingest_queue['high_water']}, {ingest_queue['blocked_puts']} blocked puts, "
+              f"{ingest_queue['blocked_seconds']:.1f}s blocked, {ingest_queue['rejected']} rejected)")
+        print(f"Writer: {writer['milestones']} milestones in {writer['batches']} batches, "
+              f"{writer['write_seconds']:.1f}s writing, {writer['failed_batches']} failed")
+        for task_name, task in pipeline_stats['scheduler'].items():
+            print(f"Task {task_name}: {task['runs']} runs, {task['errors']} errors, last {task['last_duration']:.2f}s")
+    
     print("="*80 + "\n")
 
+def get_pipeline_stats():
+    """Return the backpressure statistics of the running pipeline, or None."""
+    if milestone_writer is None:
+        return None
+    return {
+        'writer': milestone_writer.stats(),
+        'scheduler': maintenance_scheduler.stats() if maintenance_scheduler is not None else {},
+    }
+
 def get_protocol_parameters(node_name, node_url):
     """Get protocol parameters like token info."""
-    url = f"{node_url}{API_ENDPOINTS['node_info']}"
+    client = node_clients.get(node_name, node_url)
     
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
+        # Tagged apart from polls, so latency percentiles and capture replays only count poll requests
+        response = client.get(API_ENDPOINTS['node_info'], endpoint='protocol_parameters')
 
         if response.status_code == 200:
             data = response.json()
@@ -497,18 +849,253 @@ def get_protocol_parameters(node_name, node_url):
                 "tokenDecimals": base_token.get("decimals", 0)
             }
         
-        print(f"[ERROR] {node_name} - Failed to fetch protocol parameters ({response.status_code}): {response.text}")
+        log.error(f"{node_name} - Failed to fetch protocol parameters ({response.status_code}): {response.text}", key=node_name)
         return None
     
     except requests.exceptions.RequestException as e:
-        print(f"[ERROR] {node_name} - Connection error when fetching protocol parameters: {str(e)}")
+        log.error(f"{node_name} - Connection error when fetching protocol parameters: {str(e)}", key=node_name)
         return None
 
-def process_transactions():
-    """Continuously fetch and process transactions for new milestones."""
-    last_reward_time = time.time()
-    last_report_time = time.time()
-    report_interval = 300  # Print status report every 5 minutes
+def get_node_lock(node_name):
+    """Return the lock that serializes polls of a node."""
+    with node_locks_guard:
+        lock = node_locks.get(node_name)
+        if lock is None:
+            lock = node_locks[node_name] = threading.Lock()
+        return lock
+
+def poll_node(node_name, node_url, milestone=None):
+    """Fetch the milestones a node confirmed since the last poll and ingest them.
+
+    Progress is tracked by the node's milestone cursor: a poll without a new
+    milestone does no further work, and milestones confirmed between two
+    polls are backfilled in order. Every request made for the node shares
+    one NODE_POLL_DEADLINE budget, so a slow node gives up instead of
+    holding back the rest of the cycle. When the latest milestone is already
+    known (announced over MQTT), the node_info request is skipped.
+
+    Returns (latest_milestone, caught_up); latest_milestone is None if the
+    node could not be polled.
+    """
+    with get_node_lock(node_name):
+        return ingest_node_milestones(node_name, node_url, milestone)
+
+def ingest_node_milestones(node_name, node_url, milestone=None):
+    """Ingest all milestones of a node between its cursor and the latest milestone.
+
+    Returns (latest_milestone, caught_up) like poll_node().
+    """
+    deadline = time.time() + NODE_POLL_DEADLINE
+
+    if milestone is None:
+        milestone = get_latest_milestone(node_name, node_url, timeout=max(0.0, deadline - time.time()))
+        if not milestone:
+            breaker = node_clients.breaker(node_name)
+            if breaker is None or breaker.state == CLOSED:
+                log.error(f"{node_name} - Could not retrieve latest milestone index.", key=node_name)
+            return None, False
+    else:
+        update_node_metrics(node_name, None, milestone)
+
+    last_processed = get_fetch_cursor(node_name)
+    if milestone <= last_processed:
+        return milestone, True
+
+    # Start right after the cursor; a fresh node starts at the latest milestone
+    first_index = last_processed + 1 if last_processed else milestone
+    if milestone - first_index >= MAX_BACKFILL_MILESTONES:
+        first_index = milestone - MAX_BACKFILL_MILESTONES + 1
+        log.warning(f"{node_name} - Backfill limited to milestones {first_index}-{milestone}, "
+                    f"skipping {first_index - last_processed - 1} older milestones.", key=node_name)
+
+    for milestone_index in range(first_index, milestone + 1):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            log.error(f"{node_name} - Poll deadline exceeded at milestone {milestone_index}, "
+                      f"resuming on the next poll.", key=node_name)
+            return milestone, False
+
+        created_txns, consumed_txns = get_milestone_utxo_changes(node_name, node_url, milestone_index,
+                                                                 timeout=remaining)
+        if created_txns is None and consumed_txns is None:
+            # Fetch failed; the cursor stays put so the milestone is retried
+            return None, False
+
+        tx_ids = (created_txns or []) + (consumed_txns or [])
+
+        if milestone_writer is not None:
+            # Hand the milestone to the writer; a full queue slows this fetcher down
+            if not milestone_writer.submit(node_name, milestone_index, tx_ids, timeout=max(0.0, deadline - time.time())):
+                log.warning(f"{node_name} - Could not queue milestone {milestone_index} for writing, "
+                            f"resuming on the next poll.", key=node_name)
+                return milestone, False
+            continue
+
+        inserted, skipped = add_transactions(tx_ids, node_name, milestone_index)
+        record_milestone_ingested(node_name, milestone_index, inserted, skipped)
+
+        set_milestone_cursor(node_name, milestone_index)
+
+    return milestone, True
+
+def poll_all_nodes(executor, node_names=None):
+    """Poll nodes concurrently, waiting at most NODE_POLL_DEADLINE + POLL_CYCLE_GRACE.
+
+    All configured nodes are polled unless node_names selects a subset.
+    Returns the (latest_milestone, caught_up) result of every polled node.
+    A node whose poll overruns the cycle counts as failed; its poll is left
+    to finish in the background and the node is skipped until it has.
+    """
+    if node_names is None:
+        node_names = NODES.keys()
+
+    results = {}
+    futures = {}
+    for node_name in node_names:
+        straggler = straggler_polls.get(node_name)
+        if straggler is not None and not straggler.done():
+            results[node_name] = (None, False)
+            continue
+        straggler_polls.pop(node_name, None)
+        futures[executor.submit(poll_node, node_name, NODES[node_name])] = node_name
+
+    done, not_done = wait(futures, timeout=NODE_POLL_DEADLINE + POLL_CYCLE_GRACE)
+    for future in not_done:
+        node_name = futures[future]
+        log.warning(f"{node_name} - Poll still running after {NODE_POLL_DEADLINE + POLL_CYCLE_GRACE}s, "
+                    f"continuing without it.", key=node_name)
+        straggler_polls[node_name] = future
+        results[node_name] = (None, False)
+    for future in done:
+        node_name = futures[future]
+        try:
+            results[node_name] = future.result()
+        except Exception as e:
+            log.error(f"{node_name} - Unexpected error while polling: {str(e)}", key=node_name)
+            results[node_name] = (None, False)
+    return results
+
+def on_milestone_announced(executor, node_name, milestone_index):
+    """Queue ingestion of a milestone a node announced over MQTT."""
+    def ingest():
+        try:
+            poll_node(node_name, NODES[node_name], milestone_index)
+            bump_data_version()
+        except Exception as e:
+            log.error(f"{node_name} - Failed to ingest announced milestone {milestone_index}: {str(e)}", key=node_name)
+
+    executor.submit(ingest)
+
+def start_milestone_subscriptions(executor):
+    """Subscribe to the milestone feed of every node; returns the subscribers."""
+    if not mqtt_available():
+        print("[WARNING] MQTT_ENABLED is set but paho-mqtt is not installed, using polling only")
+        return {}
+
+    subscribers = {}
+    for node_name, node_url in NODES.items():
+        broker_url = MQTT_BROKERS.get(node_name) or broker_url_for(node_url)
+        subscriber = MilestoneSubscriber(
+            node_name, broker_url,
+            lambda name, index: on_milestone_announced(executor, name, index),
+            headers={"Authorization": HEADERS["Authorization"]},
+        )
+        subscriber.start()
+        subscribers[node_name] = subscriber
+    return subscribers
+
+def create_poll_scheduler():
+    """Create the adaptive poll scheduler, seeded with the milestones stored in node_metrics."""
+    poll_scheduler = AdaptivePollScheduler(
+        default_interval=POLL_INTERVAL,
+        min_interval=MIN_POLL_INTERVAL,
+        max_interval=MAX_POLL_INTERVAL,
+        lead=POLL_LEAD,
+        backoff_base=POLL_BACKOFF_BASE,
+        backoff_max=POLL_BACKOFF_MAX,
+    )
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT node_name, latest_milestone, last_seen FROM node_metrics")
+    poll_scheduler.load(row for row in cursor.fetchall() if row[0] in NODES)
+    return poll_scheduler
+
+def nodes_due_for_poll(subscribers, last_polled, current_time, poll_scheduler=None):
+    """Select the nodes to poll.
+
+    Nodes with a live subscription are only polled as a fallback; the others
+    when the poll scheduler says they are due (every cycle without one).
+    """
+    due = []
+    for node_name in NODES.keys():
+        subscriber = subscribers.get(node_name)
+        if subscriber is not None and subscriber.connected:
+            if current_time - last_polled.get(node_name, 0) < MQTT_FALLBACK_POLL_INTERVAL:
+                continue
+        elif poll_scheduler is not None and not poll_scheduler.is_due(node_name, current_time):
+            continue
+        due.append(node_name)
+    return due
+
+def seconds_until_next_poll(subscribers, last_polled, current_time, poll_scheduler):
+    """Return how long the loop can sleep before a node is due."""
+    scheduled = []
+    waits = []
+    for node_name in NODES.keys():
+        subscriber = subscribers.get(node_name)
+        if subscriber is not None and subscriber.connected:
+            waits.append(last_polled.get(node_name, 0) + MQTT_FALLBACK_POLL_INTERVAL - current_time)
+        else:
+            scheduled.append(node_name)
+    if scheduled:
+        waits.append(poll_scheduler.seconds_until_next(scheduled, current_time))
+
+    wait = min(waits, default=MAX_POLL_INTERVAL)
+    if subscribers:
+        # Notice lost subscriptions without waiting for the fallback poll
+        wait = min(wait, POLL_INTERVAL)
+    return min(MAX_POLL_INTERVAL, max(MIN_POLL_INTERVAL, wait))
+
+def run_reward_cycle():
+    """Calculate, record and print the rewards of one cycle."""
+    print("\n[REWARDS] Calculating rewards...")
+    batch = calculate_reward_batch()
+    rewards, reasons = batch.rewards(), batch.reasons()
+    record_rewards(rewards, reasons, batch)
+    api_latency.start_window()
+    prune_minute_buckets()
+    
+    # Print reward details
+    print("[REWARDS] Rewards distributed:")
+    for node_name, reward in rewards.items():
+        print(f"  {node_name}: {reward:.4f} - {reasons[node_name]}")
+
+def run_retention_cycle():
+    """Roll up and archive rows past the retention horizon."""
+    moved = run_retention()
+    if moved['transactions'] or moved['rewards']:
+        print(f"[RETENTION] Archived {moved['transactions']} transactions and {moved['rewards']} rewards")
+
+def process_transactions(stop_event=None):
+    """Continuously fetch and process transactions for new milestones.
+
+    The work runs as a pipeline of independent stages: poller threads fetch
+    milestone payloads, a single writer thread commits them in batches, and
+    a scheduler thread runs reward cycles, retention and status reports on
+    their own cadence. Bounded queues between the stages apply backpressure,
+    so a slow stage throttles the one feeding it instead of stalling all.
+
+    Runs until interrupted, or until stop_event is set when one is given.
+    """
+    global milestone_writer, maintenance_scheduler, api_capture
+    if stop_event is None:
+        stop_event = threading.Event()
+    log.set_level(LOG_LEVEL)
+    
+    # Capture every API response, from the first request on
+    if CAPTURE_FILE:
+        api_capture = ResponseRecorder(CAPTURE_FILE)
+        print(f"[INFO] Capturing API responses to {CAPTURE_FILE}")
     
     # Get protocol parameters at startup
     for node_name, node_url in NODES.items():
@@ -520,53 +1107,94 @@ def process_transactions():
     
     print("[INFO] Starting continuous monitoring loop...")
     
-    while True:
+    # Fetch stage: pollers download milestones and queue them for the writer
+    executor = ThreadPoolExecutor(max_workers=min(MAX_POLL_WORKERS, max(1, len(NODES))),
+                                  thread_name_prefix="poller")
+    
+    # Write stage: one thread commits queued milestones in batches
+    milestone_writer = MilestoneWriter(write_milestone_batch, queue_size=INGEST_QUEUE_SIZE,
+                                       batch_size=WRITER_BATCH_SIZE, max_delay=WRITER_MAX_DELAY,
+                                       on_error=on_write_failed)
+    milestone_writer.start()
+    
+    # Maintenance stage: rewards, retention and reports on their own cadence
+    maintenance_scheduler = PeriodicScheduler(
+        on_task_done=lambda name, duration, failed: task_duration_seconds.observe(duration, task=name))
+    maintenance_scheduler.add("rewards", REWARD_CALCULATION_INTERVAL, run_reward_cycle)
+    maintenance_scheduler.add("retention", RETENTION_INTERVAL, run_retention_cycle, first_run=time.time())
+    maintenance_scheduler.add("status_report", STATUS_REPORT_INTERVAL, print_status_report)
+    maintenance_scheduler.add("metrics_flush", NODE_METRICS_FLUSH_INTERVAL, flush_node_metrics)
+    maintenance_scheduler.start()
+    
+    # Collector internals for Prometheus
+    metrics_server = None
+    if COLLECTOR_METRICS_PORT is not None:
+        try:
+            metrics_server = start_http_server(collector_metrics, COLLECTOR_METRICS_PORT, COLLECTOR_METRICS_HOST)
+            print(f"[INFO] Serving collector metrics on http://{COLLECTOR_METRICS_HOST}:{COLLECTOR_METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"[WARNING] Could not serve collector metrics on port {COLLECTOR_METRICS_PORT}: {str(e)}")
+    
+    # Milestone events trigger ingestion immediately; polling stays as a fallback
+    subscribers = start_milestone_subscriptions(executor) if MQTT_ENABLED else {}
+    last_polled = {}
+    
+    # Each node is polled just after its next milestone is expected
+    poll_scheduler = create_poll_scheduler()
+    loop_failures = 0
+    
+    while not stop_event.is_set():
         try:
             current_time = time.time()
             
-            # Process transactions for each node
-            for node_name, node_url in NODES.items():
-                milestone = get_latest_milestone(node_name, node_url)
-
-                if milestone:
-                    created_txns, consumed_txns = get_milestone_utxo_changes(node_name, node_url, milestone)
-                    
-                    if created_txns or consumed_txns:
-                        for tx in (created_txns or []) + (consumed_txns or []):
-                            add_transaction(tx, node_name, milestone)
+            # Fetch milestones for the due nodes concurrently
+            due_nodes = nodes_due_for_poll(subscribers, last_polled, current_time, poll_scheduler)
+            if due_nodes:
+                with poll_cycle_seconds.time():
+                    results = poll_all_nodes(executor, due_nodes)
+                polled_time = time.time()
+                for node_name, (milestone, caught_up) in results.items():
+                    last_polled[node_name] = current_time
+                    if milestone is None:
+                        poll_scheduler.record_failure(node_name, polled_time)
+                        # Nothing is sent to an open circuit before its probe is allowed
+                        breaker = node_clients.breaker(node_name)
+                        if breaker is not None:
+                            poll_scheduler.defer(node_name, breaker.retry_at())
                     else:
-                        print(f"[INFO] {node_name} - No new transactions for milestone {milestone}.")
-                else:
-                    print(f"[ERROR] {node_name} - Could not retrieve latest milestone index.")
-            
-            # Calculate and distribute rewards periodically
-            if current_time - last_reward_time >= REWARD_CALCULATION_INTERVAL:
-                print("\n[REWARDS] Calculating rewards...")
-                rewards, reasons = calculate_rewards()
-                record_rewards(rewards, reasons)
-                
-                # Print reward details
-                print("[REWARDS] Rewards distributed:")
-                for node_name, reward in rewards.items():
-                    print(f"  {node_name}: {reward:.4f} - {reasons[node_name]}")
-                
-                last_reward_time = current_time
+                        poll_scheduler.record_success(node_name, milestone, caught_up, polled_time)
             
-            # Print periodic status report
-            if current_time - last_report_time >= report_interval:
-                print_status_report()
-                last_report_time = current_time
+            loop_failures = 0
             
-            # Wait before checking again (adjust delay as needed)
-            time.sleep(5)
+            # Sleep until the next node is due
+            stop_event.wait(seconds_until_next_poll(subscribers, last_polled, time.time(), poll_scheduler))
             
         except KeyboardInterrupt:
             print("\n[SHUTDOWN] Received shutdown signal, stopping...")
             break
         except Exception as e:
+            loop_failures += 1
+            delay = backoff_delay(loop_failures, POLL_BACKOFF_BASE, POLL_BACKOFF_MAX)
             print(f"[ERROR] Unexpected error in main loop: {str(e)}")
-            print("[INFO] Continuing after error...")
-            time.sleep(10)  # Wait a bit longer after an error
+            print(f"[INFO] Continuing after error in {delay:.1f}s...")
+            stop_event.wait(delay)  # Back off further while errors repeat
+    
+    # Stop the stages in order, so everything already fetched is still written
+    for subscriber in subscribers.values():
+        subscriber.stop()
+    executor.shutdown(wait=True, cancel_futures=True)
+    milestone_writer.stop()
+    maintenance_scheduler.stop()
+    flush_node_metrics()
+    if metrics_server is not None:
+        metrics_server.shutdown()
+        metrics_server.server_close()
+    if api_capture is not None:
+        api_capture.close()
+        api_capture = None
+    milestone_writer = None
+    maintenance_scheduler = None
+    node_clients.close_all()
 
 # Run the system
 if __name__ == "__main__":
@@ -0,0 +1,359 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Database setup
+DB_NAME = "transactions.db"
+
+# Connection tuning
+BUSY_TIMEOUT = 5  # Seconds to wait for a lock held by another connection
+SYNCHRONOUS = "NORMAL"  # Safe with WAL; commits no longer fsync the main database file
+CACHE_SIZE_KIB = 65536  # Page cache per connection (64 MiB)
+MMAP_SIZE = 268435456  # Memory-mapped I/O window (256 MiB)
+STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+POOL_SIZE = 4  # Connections a ConnectionPool opens at most
+
+_local = threading.local()
+
+# Schema migrations, applied in order. PRAGMA user_version records the last
+# version applied, so existing databases are upgraded in place. A step is
+# either an SQL statement or a callable receiving the connection.
+MIGRATIONS = [
+    (1, "Base tables", [
+        # Table for transactions - Added explicit timestamp column
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT PRIMARY KEY,
+            node_name TEXT,
+            milestone_index INTEGER,
+            timestamp INTEGER DEFAULT (strftime('%s', 'now'))
+        )
+        """,
+        # Table for tracking transaction counts per node
+        """
+        CREATE TABLE IF NOT EXISTS counters (
+            node_name TEXT PRIMARY KEY,
+            count INTEGER DEFAULT 0
+        )
+        """,
+        # Table for tracking node performance metrics
+        """
+        CREATE TABLE IF NOT EXISTS node_metrics (
+            node_name TEXT PRIMARY KEY,
+            last_seen INTEGER DEFAULT (strftime('%s', 'now')),
+            uptime_seconds INTEGER DEFAULT 0,
+            avg_latency REAL DEFAULT 0,
+            latest_milestone INTEGER DEFAULT 0
+        )
+        """,
+        # Table for the last milestone processed per node
+        """
+        CREATE TABLE IF NOT EXISTS milestone_cursors (
+            node_name TEXT PRIMARY KEY,
+            last_milestone INTEGER DEFAULT 0,
+            updated_at INTEGER DEFAULT (strftime('%s', 'now'))
+        )
+        """,
+        # Table for rewards history
+        """
+        CREATE TABLE IF NOT EXISTS rewards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            node_name TEXT,
+            reward_amount REAL,
+            reason TEXT,
+            timestamp INTEGER DEFAULT (strftime('%s', 'now'))
+        )
+        """,
+        # Table for reward balance
+        """
+        CREATE TABLE IF NOT EXISTS reward_balance (
+            node_name TEXT PRIMARY KEY,
+            balance REAL DEFAULT 0
+        )
+        """,
+    ]),
+    (2, "Indexes for time-windowed transaction and reward queries", [
+        # Recent transactions per node (reward cycle and dashboard)
+        "CREATE INDEX IF NOT EXISTS idx_transactions_node_timestamp ON transactions (node_name, timestamp)",
+        # Time range scans across all nodes
+        "CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp)",
+        # Latest rewards (dashboard history)
+        "CREATE INDEX IF NOT EXISTS idx_rewards_timestamp ON rewards (timestamp)",
+    ]),
+    (3, "Per-minute transaction buckets for rolling counts", [
+        """
+        CREATE TABLE IF NOT EXISTS tx_minute_buckets (
+            node_name TEXT,
+            minute INTEGER,
+            count INTEGER DEFAULT 0,
+            PRIMARY KEY (node_name, minute)
+        ) WITHOUT ROWID
+        """,
+        # Seed the buckets with the last hour of existing transactions
+        """
+        INSERT OR IGNORE INTO tx_minute_buckets (node_name, minute, count)
+        SELECT node_name, timestamp / 60, COUNT(*)
+        FROM transactions
+        WHERE timestamp > strftime('%s', 'now') - 3600
+        GROUP BY node_name, timestamp / 60
+        """,
+    ]),
+    (4, "Per-day aggregates for rows past the retention horizon", [
+        """
+        CREATE TABLE IF NOT EXISTS transactions_daily (
+            day INTEGER,
+            node_name TEXT,
+            tx_count INTEGER DEFAULT 0,
+            PRIMARY KEY (day, node_name)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rewards_daily (
+            day INTEGER,
+            node_name TEXT,
+            reward_total REAL DEFAULT 0,
+            reward_count INTEGER DEFAULT 0,
+            PRIMARY KEY (day, node_name)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (5, "Reward cycle snapshots", [
+        """
+        CREATE TABLE IF NOT EXISTS reward_cycles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            interval_seconds INTEGER,
+            timestamp INTEGER DEFAULT (strftime('%s', 'now'))
+        )
+        """,
+        # Factor breakdown of the latest reward cycle, one row per node
+        """
+        CREATE TABLE IF NOT EXISTS reward_snapshots (
+            node_name TEXT PRIMARY KEY,
+            cycle_id INTEGER,
+            reward REAL,
+            reason TEXT,
+            base_reward REAL,
+            uptime_factor REAL,
+            latency_factor REAL,
+            sync_factor REAL,
+            sync_reward REAL,
+            volume_bonus REAL
+        )
+        """,
+    ]),
+    (6, "Collector data version", [
+        """
+        CREATE TABLE IF NOT EXISTS collector_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER DEFAULT 0,
+            updated_at INTEGER DEFAULT (strftime('%s', 'now'))
+        )
+        """,
+        "INSERT OR IGNORE INTO collector_state (key, value) VALUES ('data_version', 0)",
+    ]),
+    (7, "Node health state", [
+        # Circuit breaker state of the node: closed, open or half_open
+        "ALTER TABLE node_metrics ADD COLUMN health_state TEXT DEFAULT 'closed'",
+        "ALTER TABLE node_metrics ADD COLUMN health_changed_at INTEGER DEFAULT 0",
+    ]),
+    (8, "API latency histograms", [
+        # Cumulative log-bucketed latencies per node and endpoint; counts is
+        # a JSON object of non-empty buckets {index: count}
+        """
+        CREATE TABLE IF NOT EXISTS latency_histograms (
+            node_name TEXT,
+            endpoint TEXT,
+            counts TEXT,
+            count INTEGER DEFAULT 0,
+            sum_ms REAL DEFAULT 0,
+            updated_at INTEGER DEFAULT (strftime('%s', 'now')),
+            PRIMARY KEY (node_name, endpoint)
+        ) WITHOUT ROWID
+        """,
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _connect(db_name, check_same_thread=True):
+    """Open a connection and apply the storage pragmas."""
+    conn = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=check_same_thread)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # Only takes effect on new database files
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def get_connection(db_name=None):
+    """Return the persistent connection of the calling thread.
+
+    Each thread keeps one connection per database file for its lifetime, so
+    prepared statements stay cached and no call pays the connect overhead.
+    In WAL mode readers never block the writer and vice versa.
+    """
+    db_name = db_name or DB_NAME
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_name)
+    if conn is None:
+        conn = connections[db_name] = _connect(db_name)
+    return conn
+
+
+@contextmanager
+def transaction(db_name=None):
+    """Run a block of writes in one transaction on the thread's connection.
+
+    The transaction is committed when the block finishes and rolled back if
+    it raises, so a failed write never leaves the connection holding a lock.
+    """
+    conn = get_connection(db_name)
+    with conn:
+        yield conn
+
+
+class ConnectionPool:
+    """Bounded pool of connections shared by short-lived threads.
+
+    get_connection() suits long-lived worker threads. A web server that
+    starts a thread per request would connect and apply the pragmas on
+    every request instead, so request handlers borrow a pooled connection.
+    Up to `size` connections are opened on demand; when all are in use,
+    callers wait for one to be returned.
+    """
+
+    def __init__(self, db_name=None, size=POOL_SIZE):
+        self.db_name = db_name
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if not can_open:
+            return self._idle.get()
+        try:
+            return _connect(self.db_name or DB_NAME, check_same_thread=False)
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close_all(self):
+        """Close the idle connections of the pool."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+def close_connection(db_name=None):
+    """Close the calling thread's connection(s), e.g. before a worker exits."""
+    connections = getattr(_local, "connections", None)
+    if not connections:
+        return
+    names = [db_name] if db_name else list(connections)
+    for name in names:
+        conn = connections.pop(name, None)
+        if conn is not None:
+            conn.close()
+
+
+def get_schema_version(db_name=None):
+    """Return the schema version of the database."""
+    return get_connection(db_name).execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_name=None):
+    """Upgrade the database schema to SCHEMA_VERSION.
+
+    Each migration runs in its own immediate transaction together with the
+    user_version bump, so a failed step leaves the previous version intact
+    and concurrent processes never apply the same migration twice. Returns
+    the list of (version, description) pairs that were applied.
+    """
+    conn = get_connection(db_name)
+    applied = []
+
+    for version, description, steps in MIGRATIONS:
+        if version <= conn.execute("PRAGMA user_version").fetchone()[0]:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if version <= conn.execute("PRAGMA user_version").fetchone()[0]:
+                conn.rollback()
+                continue
+
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        applied.append((version, description))
+
+    return applied
+
+
+def bump_data_version(conn=None):
+    """Mark that the collector has written new data readers should pick up.
+
+    Pass the connection of an open transaction to bump the version atomically
+    with the write; otherwise the bump is committed on its own.
+    """
+    statement = """
+        UPDATE collector_state
+        SET value = value + 1, updated_at = strftime('%s', 'now')
+        WHERE key = 'data_version'
+    """
+    if conn is not None:
+        conn.execute(statement)
+    else:
+        with transaction() as conn:
+            conn.execute(statement)
+
+
+def get_data_version(db_name=None, conn=None):
+    """Return (version, updated_at) of the data written by the collector."""
+    row = (conn or get_connection(db_name)).execute(
+        "SELECT value, updated_at FROM collector_state WHERE key = 'data_version'"
+    ).fetchone()
+    return row if row else (0, 0)